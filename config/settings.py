@@ -8,3 +8,123 @@ LOG_DIR = os.getenv("LOG_DIR", "logs")
 SEND_INTERVAL_MIN = os.getenv("SEND_INTERVAL_MIN")
 USE_AD = os.getenv("USE_AD")
 LOCAL_SERVER = os.getenv("LOCAL_SERVER")
+# Hand files to a co-located local Bot API server as file:// paths on a shared volume
+LOCAL_SERVER_FILE_UPLOAD = int(os.getenv("LOCAL_SERVER_FILE_UPLOAD", 0))
+# Format: "/bot/prefix=/server/prefix", when the volume is mounted at different paths
+LOCAL_SERVER_PATH_MAP = os.getenv("LOCAL_SERVER_PATH_MAP", "")
+_bot_prefix, _, _server_prefix = LOCAL_SERVER_PATH_MAP.partition("=")
+if LOCAL_SERVER_PATH_MAP and not (_bot_prefix and _server_prefix):
+    raise ValueError(
+        f'LOCAL_SERVER_PATH_MAP must look like "/bot/prefix=/server/prefix", got "{LOCAL_SERVER_PATH_MAP}"'
+    )
+
+# Telegram file_id cache for repeated links
+MEDIA_CACHE_TTL = int(os.getenv("MEDIA_CACHE_TTL", 7 * 24 * 60 * 60))
+MEDIA_CACHE_MAX_ENTRIES = int(os.getenv("MEDIA_CACHE_MAX_ENTRIES", 100000))
+
+# Spotify and Apple Music track metadata: kept on disk for the TTL, track IDs that don't
+# resolve for the negative TTL, the most used entries also in memory
+METADATA_CACHE_TTL = int(os.getenv("METADATA_CACHE_TTL", 7 * 24 * 60 * 60))
+METADATA_CACHE_NEGATIVE_TTL = int(os.getenv("METADATA_CACHE_NEGATIVE_TTL", 60 * 60))
+METADATA_CACHE_MAX_ENTRIES = int(os.getenv("METADATA_CACHE_MAX_ENTRIES", 200000))
+METADATA_CACHE_MEMORY_ENTRIES = int(os.getenv("METADATA_CACHE_MEMORY_ENTRIES", 10000))
+
+# Shared aiohttp connection pool
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 10))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_KEEPALIVE_TIMEOUT = int(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 30))
+
+# Download scheduler lanes
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", 16))
+DOWNLOAD_GLOBAL_LIMIT = int(os.getenv("DOWNLOAD_GLOBAL_LIMIT", 8))
+DOWNLOAD_USER_LIMIT = int(os.getenv("DOWNLOAD_USER_LIMIT", 1))
+DOWNLOAD_QUEUE_LIMIT = int(os.getenv("DOWNLOAD_QUEUE_LIMIT", 500))
+DOWNLOAD_SERVICE_DEFAULT_LIMIT = int(os.getenv("DOWNLOAD_SERVICE_DEFAULT_LIMIT", 3))
+# Format: "Youtube=4,Spotify=2"
+DOWNLOAD_SERVICE_LIMITS = {
+    name.strip(): int(limit)
+    for name, limit in (
+        item.split("=", 1) for item in os.getenv("DOWNLOAD_SERVICE_LIMITS", "").split(",") if "=" in item
+    )
+}
+
+# Seconds before expiry at which the Spotify access token is refreshed in the background
+SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN", 5 * 60))
+
+# Shared cover art cache: size limit, how long cover URLs are remembered, embedded cover size in px
+ARTWORK_CACHE_DIR = os.getenv("ARTWORK_CACHE_DIR", "other/artwork")
+ARTWORK_CACHE_MAX_MB = int(os.getenv("ARTWORK_CACHE_MAX_MB", 512))
+ARTWORK_CACHE_URL_TTL = int(os.getenv("ARTWORK_CACHE_URL_TTL", 24 * 60 * 60))
+ARTWORK_EMBED_SIZE = int(os.getenv("ARTWORK_EMBED_SIZE", 1000))
+
+# YouTube Music search: parallel searches (one client each), cached confident matches per track
+MUSIC_SEARCH_WORKERS = int(os.getenv("MUSIC_SEARCH_WORKERS", 5))
+MUSIC_SEARCH_CACHE_TTL = int(os.getenv("MUSIC_SEARCH_CACHE_TTL", 24 * 60 * 60))
+MUSIC_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("MUSIC_SEARCH_CACHE_MAX_ENTRIES", 20000))
+# Matches scored below this (0..1) are reported to the user instead of being downloaded
+MUSIC_MATCH_MIN_CONFIDENCE = float(os.getenv("MUSIC_MATCH_MIN_CONFIDENCE", 0.7))
+
+# Pipelined playlist downloads
+PLAYLIST_WINDOW = int(os.getenv("PLAYLIST_WINDOW", 4))
+PLAYLIST_STATUS_INTERVAL = float(os.getenv("PLAYLIST_STATUS_INTERVAL", 3))
+
+# Import every service in the background once polling has started
+SERVICES_WARM_UP = int(os.getenv("SERVICES_WARM_UP", 1))
+
+# Direct file downloads: parallel Range segments for files of at least this size
+DOWNLOAD_SEGMENTS = int(os.getenv("DOWNLOAD_SEGMENTS", 4))
+DOWNLOAD_SEGMENT_MIN_SIZE = int(os.getenv("DOWNLOAD_SEGMENT_MIN_SIZE", 8 * 1024 * 1024))
+
+# Remux AAC/MP3 audio with ffmpeg stream copy instead of transcoding everything to mp3
+AUDIO_REMUX = int(os.getenv("AUDIO_REMUX", 1))
+
+# Run yt-dlp jobs in worker processes instead of threads, 0 keeps them in threads
+YTDLP_PROCESS_WORKERS = int(os.getenv("YTDLP_PROCESS_WORKERS", 0))
+YTDLP_PROCESS_MAX_TASKS = int(os.getenv("YTDLP_PROCESS_MAX_TASKS", 50))
+
+# /news_spam broadcasts: messages per second over all chats, parallel senders, chats per page.
+# Broadcasts are bulk sends, a BROADCAST_RATE above SEND_BULK_RATE is capped to it
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 20))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 8))
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", 500))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", 5))
+
+# Pacing of outgoing Bot API calls, messages per second
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))
+SEND_BULK_RATE = float(os.getenv("SEND_BULK_RATE", 20))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 1))
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", 20 / 60))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", 3))
+# Flood waits retried transparently, longer waits fail the call
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", 3))
+SEND_MAX_RETRY_AFTER = float(os.getenv("SEND_MAX_RETRY_AFTER", 60))
+
+# Webhook mode, used when WEBHOOK_URL (public https base URL) is set, polling otherwise
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+# Updates handled at the same time, and connections Telegram may open to deliver them
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", 64))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+# Seconds to let running updates and downloads finish on shutdown
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 30))
+
+# Durable download queue: with JOB_QUEUE=1 the bot only enqueues links and worker.py delivers them
+JOB_QUEUE = int(os.getenv("JOB_QUEUE", 0))
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "./database/jobs.sql")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 120))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", 4))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+# Seconds finished jobs are kept
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", 24 * 60 * 60))
+
+# Per-user state kept in memory: entries expire after the TTL (seconds), the least recently
+# used ones are dropped beyond the cap. Running download tasks are never dropped
+USER_TASKS_TTL = int(os.getenv("USER_TASKS_TTL", 60 * 60))
+USER_TASKS_MAX_ENTRIES = int(os.getenv("USER_TASKS_MAX_ENTRIES", 100_000))
+LOCALE_CACHE_TTL = int(os.getenv("LOCALE_CACHE_TTL", 60 * 60))
+LOCALE_CACHE_MAX_ENTRIES = int(os.getenv("LOCALE_CACHE_MAX_ENTRIES", 100_000))
@@ -1,81 +1,156 @@
 # From https://github.com/FlacSy/BotArchitecture
-import aiosqlite
+import asyncio
 import logging
+from typing import Any, Iterable, List, Optional
+
+import aiosqlite
 
 logger = logging.getLogger(__name__)
 
-class SQLiteDatabaseManager:
+class Database:
     """
-    A context manager for managing SQLite database connections and cursors using async/await.
+    Application-scoped SQLite connection.
+
+    One aiosqlite connection is opened at startup with WAL journaling and
+    synchronous=NORMAL, and kept for the lifetime of the bot, so prepared statements
+    are reused from the statement cache. Reads run directly on the connection. Writes
+    go through a queue drained by a single writer task, which executes them in batches
+    and commits once per batch.
 
     Attributes:
-        mode (str): The mode in which the database is operating (e.g., "production").
-        conn (aiosqlite.Connection): The SQLite database connection object.
-        cursor (aiosqlite.Cursor): The SQLite database cursor object.
-
-    Methods:
-        __aenter__: Asynchronously opens a connection to the database and returns a cursor.
-        __aexit__: Asynchronously closes the cursor and the connection, commits any pending transactions,
-                    and handles any exceptions that occurred.
+        path (str): Path to the database file.
+        conn (aiosqlite.Connection): The open connection, None until connect().
     """
 
-    def __init__(self, mode: str = "production"):
+    # Statements kept prepared by sqlite3
+    CACHED_STATEMENTS = 256
+    # Writes committed together at most
+    WRITE_BATCH = 100
+
+    def __init__(self, path: str = "./database/database.sql"):
         """
-        Initializes the SQLiteDatabaseManager instance.
+        Initializes the Database instance.
 
         Args:
-            mode (str): The mode in which the database is operating (e.g., "production"). Defaults to "production".
+            path (str): Path to the database file. Defaults to "./database/database.sql".
         """
-        self.mode = mode
-        self.conn = None
-        self.cursor = None
+        self.path = path
+        self.conn: Optional[aiosqlite.Connection] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
 
-    async def __aenter__(self):
+    async def connect(self) -> None:
         """
-        Asynchronously opens a connection to the SQLite database and returns a cursor.
-
-        Returns:
-            aiosqlite.Cursor: The cursor for interacting with the database.
+        Opens the connection and starts the writer task. Called once at startup.
 
         Raises:
             aiosqlite.Error: If an error occurs while connecting to the database.
         """
         try:
-            self.conn = await aiosqlite.connect("./database/database.sql")
-
-            self.cursor = await self.conn.cursor()
-            logger.info(f"Connected to the database: {self.mode}")
-            return self.cursor
-
+            self.conn = await aiosqlite.connect(self.path, cached_statements=self.CACHED_STATEMENTS)
+            await self.conn.execute("PRAGMA journal_mode=WAL")
+            await self.conn.execute("PRAGMA synchronous=NORMAL")
+            await self.conn.execute("PRAGMA busy_timeout=5000")
         except aiosqlite.Error as e:
             logger.error(f"Error connecting to the database: {e}")
             raise
 
-    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info(f"Connected to the database: {self.path}")
+
+    async def close(self) -> None:
+        """Flushes pending writes and closes the connection."""
+        if self._writer is not None:
+            await self._writes.join()
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+
+        if self.conn is not None:
+            await self.conn.commit()
+            await self.conn.close()
+            self.conn = None
+            logger.info("Database connection closed")
+
+    async def fetchone(self, sql: str, params: Iterable[Any] = ()) -> Optional[aiosqlite.Row]:
         """
-        Asynchronously closes the cursor and the database connection, commits any pending transactions,
-        and logs any exceptions that occurred.
+        Runs a query and returns its first row.
 
         Args:
-            exc_type (type): The type of the exception that was raised, if any.
-            exc_value (Exception): The exception instance, if any.
-            traceback (traceback): The traceback object, if any.
+            sql (str): SQL query.
+            params (Iterable[Any]): Query parameters.
 
         Returns:
-            bool: False, to propagate the exception if one occurred.
+            Optional[aiosqlite.Row]: The first row, or None if there is none.
         """
-        if self.cursor:
-            await self.cursor.close()
-            logger.info("Cursor closed")
-        if self.conn:
-            await self.conn.commit()
-            await self.conn.close()
-            logger.info("Connection closed")
+        async with self.conn.execute(sql, params) as cursor:
+            return await cursor.fetchone()
+
+    async def fetchall(self, sql: str, params: Iterable[Any] = ()) -> List[aiosqlite.Row]:
+        """
+        Runs a query and returns all rows.
+
+        Args:
+            sql (str): SQL query.
+            params (Iterable[Any]): Query parameters.
+
+        Returns:
+            List[aiosqlite.Row]: All rows of the result.
+        """
+        async with self.conn.execute(sql, params) as cursor:
+            return list(await cursor.fetchall())
+
+    async def execute(self, sql: str, params: Iterable[Any] = ()) -> int:
+        """
+        Queues a write and waits until it is committed.
+
+        Args:
+            sql (str): SQL statement.
+            params (Iterable[Any]): Statement parameters.
+
+        Returns:
+            int: Number of rows changed by the statement.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((sql, tuple(params), future))
+        return await future
 
-        if exc_type is not None:
-            logger.error(f"An error occurred: {exc_type}, {exc_value}")
+    async def _write_loop(self) -> None:
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < self.WRITE_BATCH and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
 
-        return False
+            results = []
+            for sql, params, future in batch:
+                try:
+                    cursor = await self.conn.execute(sql, params)
+                    results.append((future, cursor.rowcount, None))
+                    await cursor.close()
+                except Exception as e:
+                    logger.error(f"Database write failed: {e}")
+                    results.append((future, None, e))
+
+            try:
+                await self.conn.commit()
+            except Exception as e:
+                logger.error(f"Database commit failed: {e}")
+                results = [(future, None, e) for future, _rowcount, _error in results]
+
+            for future, rowcount, error in results:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(rowcount)
+
+            for _item in batch:
+                self._writes.task_done()
+
+
+database = Database()
 
 
 async def create_table_settings():
@@ -86,13 +161,112 @@ async def create_table_settings():
         - chat_id (INTEGER PRIMARY KEY): Unique identifier for the chat.
         - lang (TEXT): Language setting for the chat, defaulting to 'en'.
         - anonime_statistic (BOOLEAN): Indicates if anonymous statistics are enabled, defaulting to 0 (False).
+        - is_active (BOOLEAN): 0 once the chat blocked the bot or was deleted, skipped by broadcasts.
+
+    Databases created before is_active existed get the column added.
     """
-    async with SQLiteDatabaseManager() as conn:
-        await conn.execute(
-            """CREATE TABLE IF NOT EXISTS chat_settings (
-                chat_id INTEGER PRIMARY KEY,
-                lang TEXT DEFAULT en,
-                anonime_statistic BOOLEAN DEFAULT 0
-            );
-        """
-        )
+    await database.execute(
+        """CREATE TABLE IF NOT EXISTS chat_settings (
+            chat_id INTEGER PRIMARY KEY,
+            lang TEXT DEFAULT en,
+            anonime_statistic BOOLEAN DEFAULT 0,
+            is_active BOOLEAN DEFAULT 1
+        );
+    """
+    )
+
+    columns = await database.fetchall("PRAGMA table_info(chat_settings)")
+    if "is_active" not in {column[1] for column in columns}:
+        await database.execute("ALTER TABLE chat_settings ADD COLUMN is_active BOOLEAN DEFAULT 1;")
+        logger.info("Added chat_settings.is_active")
+
+
+async def create_table_media_cache():
+    """
+    Creates the 'media_cache' table in the SQLite database if it does not already exist.
+
+    The table includes:
+        - cache_key (TEXT PRIMARY KEY): Canonical URL and format choice.
+        - content (TEXT): JSON list of sent media with their Telegram file_id.
+        - size (INTEGER): Total size of the original files in bytes.
+        - download_time (REAL): Seconds spent downloading the media on a miss.
+        - created_at (REAL): Unix time the entry was stored.
+        - last_used (REAL): Unix time the entry was last served.
+        - hits (INTEGER): Number of times the entry was served.
+    """
+    await database.execute(
+        """CREATE TABLE IF NOT EXISTS media_cache (
+            cache_key TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            size INTEGER DEFAULT 0,
+            download_time REAL DEFAULT 0,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        );
+    """
+    )
+    await database.execute(
+        "CREATE INDEX IF NOT EXISTS media_cache_last_used ON media_cache (last_used);"
+    )
+
+
+async def create_table_broadcasts():
+    """
+    Creates the 'broadcasts' table in the SQLite database if it does not already exist.
+
+    The table includes:
+        - broadcast_id (TEXT PRIMARY KEY): Random identifier of the broadcast.
+        - admin_chat_id (INTEGER): Chat that started the broadcast and gets the report.
+        - text (TEXT): MarkdownV2 message text.
+        - status (TEXT): 'running' or 'done', running broadcasts are resumed at startup.
+        - last_chat_id (INTEGER): Keyset cursor, every chat up to it has been processed.
+        - total (INTEGER): Active chats when the broadcast started.
+        - sent, failed, deactivated (INTEGER): Delivery counters.
+        - started_at, finished_at (REAL): Unix times.
+    """
+    await database.execute(
+        """CREATE TABLE IF NOT EXISTS broadcasts (
+            broadcast_id TEXT PRIMARY KEY,
+            admin_chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            last_chat_id INTEGER,
+            total INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            deactivated INTEGER DEFAULT 0,
+            started_at REAL NOT NULL,
+            finished_at REAL
+        );
+    """
+    )
+
+
+async def create_table_track_metadata():
+    """
+    Creates the 'track_metadata' table in the SQLite database if it does not already exist.
+
+    The table includes:
+        - track_key (TEXT PRIMARY KEY): Service and track ID, e.g. "spotify:4uLU6hMCjMI75M1A2tKUQC".
+        - found (BOOLEAN): 0 for track IDs that didn't resolve, all other columns are NULL then.
+        - artist, title, cover_url, isrc (TEXT): Track metadata.
+        - duration (REAL): Track length in seconds.
+        - expires_at (REAL): Unix time after which the entry is fetched again.
+    """
+    await database.execute(
+        """CREATE TABLE IF NOT EXISTS track_metadata (
+            track_key TEXT PRIMARY KEY,
+            found BOOLEAN NOT NULL,
+            artist TEXT,
+            title TEXT,
+            cover_url TEXT,
+            duration REAL,
+            isrc TEXT,
+            expires_at REAL NOT NULL
+        );
+    """
+    )
+    await database.execute(
+        "CREATE INDEX IF NOT EXISTS track_metadata_expires_at ON track_metadata (expires_at);"
+    )
@@ -1,86 +1,29 @@
-import re
+from typing import Any, Dict, Union
+
 from aiogram import types
 from aiogram.filters import BaseFilter
 
+from utils.register_services import route_url
+
 
 class UrlFilter(BaseFilter):
     """
-    A filter for detecting URLs in a message from various popular platforms.
+    A filter for detecting URLs of the registered services in a message.
 
-    This filter checks if the message contains a URL that matches any of the following patterns:
-        - YouTube (shorts, standard watch URL)
-        - TikTok (short URLs and regular URLs)
-        - SoundCloud (track URLs)
-        - Spotify (track URLs)
-        - Apple Music (album URLs)
-        - Pinterest (pins and board URLs)
-        - Bilibili (video URLs)
-        - Twitter/X (status URLs)
-        - Instagram (posts, reels, and stories)
-        - Pixiv (artworks)
+    Routing is done by the shared URL router built from the service manifest, so
+    the filter has no patterns of its own. On a match the service is loaded if needed
+    and the resolved route is passed to the handler as the `route` argument.
 
     Methods:
-        __call__(message: types.Message) -> bool:
-            Asynchronously checks if the message contains a URL matching any of the patterns.
+        __call__(message: types.Message) -> Union[bool, Dict[str, Any]]:
+            Asynchronously checks if the message contains a URL of a registered service.
     """
 
-    async def __call__(self, message: types.Message) -> bool:
-        if message.text:
-            return any(
-                [
-                    re.match(
-                        r"https?://(?:www\.)?(?:m\.)?(?:youtu\.be/|youtube\.com/(?:shorts/|watch\?v=))([\w-]+)",
-                        message.text,
-                    ),
-                    re.match(
-                        r"https:\/\/music\.youtube\.com\/(?:watch\?v=|playlist\?list=)([a-zA-Z0-9\-_]+)",
-                        message.text,
-                    ),
-                    re.match(
-                        r"https?://(?:www\.)?(?:tiktok\.com/.*|(vm|vt)\.tiktok\.com/.+)",
-                        message.text,
-                    ),
-                    # re.match(r'https?://(?:www\.)?tiktok\.com/.*', message.text),
-                    re.match(
-                        r"^https:\/\/(?:on\.soundcloud\.com\/[a-zA-Z0-9]+|soundcloud\.com\/[^\/]+\/(sets\/[^\/]+|[^\/\?\s]+))(?:\?.*)?$", message.text
-                    ),
-                    re.match(
-                        r"https?://open\.spotify\.com/(track|playlist)/([\w-]+)",
-                        message.text,
-                    ),
-                    re.match(
-                        r"https:\/\/music\.youtube\.com\/(watch\?v=[\w-]+(&[\w=-]+)*|playlist\?list=[\w-]+(&[\w=-]+)*)",
-                        message.text,
-                    ),
-                    re.match(
-                        r"https:\/\/music\.apple\.com\/[\w]{2}\/(song\/([\w-]+)\/(\d+)|album\/([^\/]+)\/(\d+)(\?i=(\d+))?|playlist\/([\w-]+)\/([\w.-]+))",
-                        message.text,
-                    ),
-                    # re.match(r'https?://deezer\.page\.link/([\w-]+)', message.text),
-                    re.match(
-                        r"https?://(?:www\.)?(?:pinterest\.com/[\w/-]+|pin\.it/[A-Za-z0-9]+)",
-                        message.text,
-                    ),
-                    re.match(
-                        r"https?://(?:www\.)?bilibili\.(?:com|tv)/[\w/?=&]+",
-                        message.text,
-                    ),
-                    re.match(
-                        r"https://(?:twitter|x)\.com/\w+/status/\d+", message.text
-                    ),
-                    re.match(
-                        r"https://www\.instagram\.com/(?:p|reel|tv|stories)/([A-Za-z0-9_-]+)/",
-                        message.text,
-                    ),
-                    re.match(
-                        r"https:\/\/www\.pixiv\.net\/(?:[a-z]{2}\/)?artworks\/\d+",
-                        message.text,
-                    ),
-                    re.match(
-                        r"https:\/\/www\.reddit\.com\/r\/[A-Za-z0-9_]+\/(?:comments\/[A-Za-z0-9]+(?:\/[^\/\s?]+)?|s\/[A-Za-z0-9]+)(?:\?[^\s]*)?", 
-                        message.text
-                    ),
-                ]
-            )
-        else:
+    async def __call__(self, message: types.Message) -> Union[bool, Dict[str, Any]]:
+        if not message.text:
+            return False
+
+        route = await route_url(message.text)
+        if route is None:
             return False
+        return {"route": route}
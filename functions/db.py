@@ -1,25 +1,24 @@
-from database.database_manager import SQLiteDatabaseManager
+from typing import List, Optional
+
+from database.database_manager import database
 
 
 async def db_add_chat(chat_id: int, locale: str, anonime_statistic: int) -> None:
-    """Add chat info into database
+    """Add chat info into database, reactivating a chat that had blocked the bot
 
     Args:
         chat_id (int): Chat ID
         locale (str): Localisation, such as: en, ru, etc.
         anonime_statistic (int): Anonime statistic bool
     """
-    async with SQLiteDatabaseManager() as cursor:
-        await cursor.execute(
-            """
-            INSERT INTO chat_settings (chat_id, lang, anonime_statistic)
-            SELECT ?, ?, ?
-            WHERE NOT EXISTS (
-                SELECT 1 FROM chat_settings WHERE chat_id = ?
-            )
-            """,
-            (chat_id, locale, anonime_statistic, chat_id),
-        )
+    await database.execute(
+        """
+        INSERT INTO chat_settings (chat_id, lang, anonime_statistic)
+        VALUES (?, ?, ?)
+        ON CONFLICT(chat_id) DO UPDATE SET is_active = 1
+        """,
+        (chat_id, locale, anonime_statistic),
+    )
 
 
 async def db_change_lang(chat_id: int, lang: str) -> None:
@@ -29,25 +28,14 @@ async def db_change_lang(chat_id: int, lang: str) -> None:
         chat_id (int): User Chat ID
         lang (str): Localisation, such as: en, ru, etc.
     """
-
-    async with SQLiteDatabaseManager() as cursor:
-        await cursor.execute(
-            "SELECT lang FROM chat_settings WHERE chat_id = ?", [chat_id]
-        )
-        row = await cursor.fetchone()
-
-        if row:
-            await cursor.execute(
-                "UPDATE chat_settings SET lang = ? WHERE chat_id = ?", (lang, chat_id)
-            )
-        else:
-            await cursor.execute(
-                """
-                INSERT INTO chat_settings (chat_id, lang, anonime_statistic)
-                SELECT ?, ?, ?
-                """,
-                (chat_id, lang, 0),
-            )
+    await database.execute(
+        """
+        INSERT INTO chat_settings (chat_id, lang, anonime_statistic)
+        VALUES (?, ?, 0)
+        ON CONFLICT(chat_id) DO UPDATE SET lang = excluded.lang
+        """,
+        (chat_id, lang),
+    )
 
 
 async def db_get_lang(chat_id: int) -> str:
@@ -59,13 +47,59 @@ async def db_get_lang(chat_id: int) -> str:
     Returns:
         str: Localisation
     """
-    async with SQLiteDatabaseManager() as cursor:
-        await cursor.execute(
-            "SELECT lang FROM chat_settings WHERE chat_id = ?", [chat_id]
-        )
-        row = await cursor.fetchone()
+    row = await database.fetchone(
+        "SELECT lang FROM chat_settings WHERE chat_id = ?", (chat_id,)
+    )
+
+    if row:
+        return row[0]
+    else:
+        return "en"
+
+
+async def db_deactivate_chat(chat_id: int) -> None:
+    """Mark a chat that blocked the bot or no longer exists, so broadcasts skip it
+
+    Args:
+        chat_id (int): Chat ID
+    """
+    await database.execute(
+        "UPDATE chat_settings SET is_active = 0 WHERE chat_id = ?", (chat_id,)
+    )
+
 
-        if row:
-            return row[0]
-        else:
-            return "en"
+async def db_count_active_chats() -> int:
+    """Count chats that broadcasts are sent to
+
+    Returns:
+        int: Number of active chats
+    """
+    row = await database.fetchone(
+        "SELECT COUNT(*) FROM chat_settings WHERE is_active = 1"
+    )
+    return row[0]
+
+
+async def db_get_active_chats(after: Optional[int], limit: int) -> List[int]:
+    """Get a page of active chat IDs in ascending order
+
+    Keyset pagination on the primary key, so every page is an index range scan.
+
+    Args:
+        after (Optional[int]): Last chat ID of the previous page, None for the first page
+        limit (int): Page size
+
+    Returns:
+        List[int]: Chat IDs
+    """
+    if after is None:
+        rows = await database.fetchall(
+            "SELECT chat_id FROM chat_settings WHERE is_active = 1 ORDER BY chat_id LIMIT ?",
+            (limit,),
+        )
+    else:
+        rows = await database.fetchall(
+            "SELECT chat_id FROM chat_settings WHERE is_active = 1 AND chat_id > ? ORDER BY chat_id LIMIT ?",
+            (after, limit),
+        )
+    return [row[0] for row in rows]
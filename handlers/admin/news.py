@@ -1,5 +1,3 @@
-import asyncio
-import datetime
 import logging
 
 from aiogram import F
@@ -13,17 +11,11 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
     ReplyKeyboardRemove,
 )
-from aiogram.exceptions import (
-    TelegramAPIError,
-    TelegramBadRequest,
-    TelegramNotFound,
-    TelegramRetryAfter,
-)
 from aiogram.utils.i18n import gettext as _
 
 from config.secrets import ADMIN_ID
-from database.database_manager import SQLiteDatabaseManager
 from loader import dp
+from managers.broadcast_manager import broadcaster
 
 logger = logging.getLogger(__name__)
 
@@ -67,65 +59,18 @@ async def proccess_spam_news(message: Message, state: FSMContext) -> None:
 @dp.message(News_Spam.accept_news_spam, F.text.casefold() == "yes")
 async def process_spam_news_to_chats(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
-    bot = message.bot
-    chat_id = message.chat.id
     message_text = data.get("message_text", "")
-
-    await message.answer(_("Mailing list started"), reply_markup=ReplyKeyboardRemove())
     await state.clear()
 
-    start_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    total_chat = 0
-    sucсess_send = 0
-    error_send = 0
-
-    async with SQLiteDatabaseManager() as cursor:
-        await cursor.execute("SELECT DISTINCT chat_id FROM chat_settings")
-        rows = await cursor.fetchall()
-        total_chat = len(rows)
-        success_send = 0
-
-        for row in rows:
-            try:
-                if row[0] == chat_id:
-                    continue
-                await asyncio.sleep(5)
-                await message.bot.send_message(
-                    row[0], message_text, parse_mode=ParseMode.MARKDOWN_V2
-                )
-                success_send += 1
-            except TelegramNotFound:
-                logger.error(f"Chat not found: {row[0]}")
-            except TelegramRetryAfter as e:
-                logger.warning(f"Retry after {e.retry_after} seconds")
-                await asyncio.sleep(e.retry_after)
-            except TelegramBadRequest as e:
-                logger.error(f"Telegram Bad Request: {e}")
-            except TelegramAPIError as e:
-                logger.error(f"Telegram API error: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error: {e}")
-            finally:
-                error_send += 1
-
-    end_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    done_message = _(
-        "The mailing has been completed\n"
-        "Beginning at {start_time}\n"
-        "Ended at {end_time}\n"
-        "Number of chats: {total_chat}\n"
-        "Successfully sent: {sucсess_send}\n"
-        "erros: {error_send}"
-    ).format(
-        start_time=start_time,
-        end_time=end_time,
-        total_chat=total_chat,
-        sucсess_send=sucсess_send,
-        error_send=error_send,
-    )
+    if broadcaster.is_running:
+        await message.answer(
+            _("A mailing is already running"), reply_markup=ReplyKeyboardRemove()
+        )
+        return
 
-    await bot.send_message(chat_id=chat_id, text=done_message)
+    await message.answer(_("Mailing list started"), reply_markup=ReplyKeyboardRemove())
+    broadcast = await broadcaster.start(message.bot, message.chat.id, message_text)
+    logger.info(f"Broadcast {broadcast.broadcast_id} started for {broadcast.total} chats")
 
 
 def escape_markdown(text: str) -> str:
@@ -0,0 +1,92 @@
+import os
+import resource
+
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message
+
+from config.secrets import ADMIN_ID
+from loader import dp
+from managers.broadcast_manager import broadcaster
+from managers.artwork_cache import artwork_cache
+from managers.cache_manager import media_cache
+from managers.download_manager import user_tasks
+from managers.download_scheduler import download_scheduler
+from managers.metadata_cache import metadata_cache
+from managers.send_scheduler import send_scheduler
+from managers.single_flight import download_flights
+from utils.file_downloader import totals as file_totals
+from utils.language_middleware import locale_cache
+from utils.music_search_engine import search_stats
+
+
+def _rss_mb() -> float:
+    """Current resident set size, the peak one where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@dp.message(Command("stats"))
+async def stats_handler(message: Message, state: FSMContext) -> None:
+    if message.from_user.id != ADMIN_ID:
+        return
+
+    # Drop expired entries first so the gauges show the steady-state footprint
+    user_tasks.purge()
+    locale_cache.purge()
+    tasks = user_tasks.stats()
+    locales = locale_cache.stats()
+
+    cache = media_cache.stats()
+    metadata = metadata_cache.stats()
+    search = search_stats()
+    artwork = artwork_cache.stats()
+    scheduler = download_scheduler.stats()
+    flights = download_flights.stats()
+    sends = send_scheduler.stats()
+    broadcasts = "".join(
+        f"\n{broadcast.broadcast_id}: {broadcast.processed}/{broadcast.total}, "
+        f"{broadcast.sent} sent, {broadcast.deactivated} deactivated"
+        for broadcast in broadcaster.stats()
+    ) or "\nNone running"
+
+    await message.answer(
+        "<b>Media cache</b>\n"
+        f"Hits: {cache['hits']}\n"
+        f"Misses: {cache['misses']}\n"
+        f"Hit rate: {cache['hit_rate']:.1%}\n"
+        f"Stored: {cache['stores']}, evicted: {cache['evicted']}\n"
+        f"Saved: {cache['bytes_saved'] / (1024 * 1024):.1f} MB, {cache['seconds_saved']:.0f} s of downloading\n\n"
+        "<b>Track metadata cache</b>\n"
+        f"Hits: {metadata['hits']}, misses: {metadata['misses']}, hit rate: {metadata['hit_rate']:.1%}\n"
+        f"In memory: {metadata['in_memory']}\n\n"
+        "<b>Music search</b>\n"
+        f"Cache hits: {search['hits']}, misses: {search['misses']}, hit rate: {search['hit_rate']:.1%}\n"
+        f"Searches: {search['searches']:.0f} ({search['errors']:.0f} failed), "
+        f"average {search['average_seconds']:.2f} s, cached: {search['cached']}\n"
+        f"Matches: {search['matches']:.0f}, below confidence threshold: {search['uncertain']:.0f}\n\n"
+        "<b>Artwork cache</b>\n"
+        f"Hits: {artwork['hits']}, misses: {artwork['misses']}, hit rate: {artwork['hit_rate']:.1%}\n"
+        f"Covers stored: {artwork['stores']}\n\n"
+        "<b>Download scheduler</b>\n"
+        f"Running: {scheduler['running']}\n"
+        f"Queued: {scheduler['queued']} from {scheduler['users_waiting']} users\n"
+        f"In flight: {flights['in_flight']}, coalesced: {flights['coalesced']} of {flights['started'] + flights['coalesced']}\n\n"
+        "<b>Direct downloads</b>\n"
+        f"Files: {file_totals['files']:.0f} ({file_totals['segmented']:.0f} segmented)\n"
+        f"Average speed: {file_totals['bytes'] / max(file_totals['seconds'], 0.001) / (1024 * 1024):.2f} MB/s\n\n"
+        "<b>Outgoing API calls</b>\n"
+        f"Calls: {sends['requests']:.0f}, flood retries: {sends['retries']:.0f}\n"
+        f"Time spent pacing: {sends['waited']:.0f} s, tracked chats: {sends['chats']:.0f}\n\n"
+        "<b>Memory</b>\n"
+        f"RSS: {_rss_mb():.1f} MB\n"
+        f"User tasks: {tasks['size']}/{tasks['maxsize']}, evicted: {tasks['evicted']}\n"
+        f"Chat languages: {locales['size']}/{locales['maxsize']}, hit rate: {locales['hit_rate']:.1%}, "
+        f"evicted: {locales['evicted']}\n\n"
+        f"<b>Broadcasts</b>{broadcasts}"
+    )
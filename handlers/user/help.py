@@ -5,7 +5,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.i18n import gettext as _
 from .url import TaskManager
 
+from config.settings import JOB_QUEUE
 from loader import dp
+from managers.job_queue import job_queue
 
 
 @dp.message(Command("help"))
@@ -52,6 +54,9 @@ async def cancel_command(message: types.Message, state: FSMContext) -> None:
         return
 
     canceled = TaskManager().cancel_task(user.id)
+    if JOB_QUEUE:
+        # Downloads run in worker.py, which stops them once their lease can't be renewed
+        canceled = await job_queue.cancel(user.id) > 0 or canceled
     if canceled:
         await message.answer(_("Your download has been cancelled."))
     else:
@@ -1,27 +1,58 @@
 import asyncio
-from asyncio import Semaphore
-from collections import defaultdict
-from typing import Optional
+import logging
+import time
+from typing import List, Optional
 
 import aiogram
 from aiogram import types
 from aiogram.utils.i18n import gettext as _
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from config.settings import JOB_QUEUE
 from filters.url_filter import UrlFilter
 from loader import dp
-from managers.download_manager import MediaHandler, TaskManager, user_tasks
+from managers.cache_manager import MediaCache, media_cache
+from managers.download_manager import MediaHandler, TaskManager
+from managers.download_scheduler import download_scheduler
+from managers.job_queue import Job, job_queue
+from managers.playlist_manager import PlaylistDownloader
+from managers.single_flight import download_flights
+from models.media_models import MediaContent
 from utils import get_service_handler, handle_download_error, random_emoji
 from utils.error_handler import BotError, ErrorCode
+from utils.url_router import Route
 
-user_semaphores = defaultdict(lambda: Semaphore(1))
+logger = logging.getLogger(__name__)
 
-async def download_wrapper(user_id: int, coro):
-    async with user_semaphores[user_id]:
+
+async def download_wrapper(
+    user_id: int, service_name: str, message: types.Message, coro, raise_errors: bool = False
+):
+    """
+    Runs a download coroutine in its scheduler slot.
+
+    With raise_errors a refused slot raises its BotError instead of being reported to the
+    user, so worker.py can retry the job.
+    """
+    async def report_position(position: int) -> None:
+        await message.answer(_("Queued, position {position} ⏳").format(position=position))
+
+    try:
+        await download_scheduler.acquire(user_id, service_name, on_queued=report_position)
+    except BaseException as e:
+        coro.close()
+        if not isinstance(e, BotError) or raise_errors:
+            raise
+        await handle_download_error(message, e)
+        return
+
+    try:
         return await coro
+    finally:
+        download_scheduler.release(user_id, service_name)
 
 @dp.message(UrlFilter())
-async def url_handler(message: types.Message) -> None:
+async def url_handler(message: types.Message, route: Route) -> None:
     """Handle incoming URL messages and manage downloads."""
     if not message.from_user:
         return
@@ -30,10 +61,8 @@ async def url_handler(message: types.Message) -> None:
 
     user_id = message.from_user.id
 
-    url = message.text
-    if not url:
-        return
-    service = get_service_handler(url)
+    url = route.url
+    service = route.service
 
     if service.name == "Youtube":
         markup = InlineKeyboardBuilder()
@@ -43,9 +72,11 @@ async def url_handler(message: types.Message) -> None:
         await message.reply(
             _("Choose a format to download:"), reply_markup=markup.as_markup()
         )
+    elif JOB_QUEUE:
+        await enqueue_download(message, url, user_id)
     else:
         coro = handle_playlist_download(service, url, message) if service.is_playlist(url) else handle_single_download(service, url, message)
-        task = asyncio.create_task(download_wrapper(user_id, coro))
+        task = asyncio.create_task(download_wrapper(user_id, service.name, message, coro))
 
         TaskManager().add_task(user_id, task)
 
@@ -62,7 +93,7 @@ async def format_choice_handler(callback_query: types.CallbackQuery):
     url = message.reply_to_message.text
     assert url, "URL is not found"
 
-    service = get_service_handler(url)
+    service = await get_service_handler(url)
 
     if service.name != "Youtube":
         await message.edit_text(
@@ -70,31 +101,76 @@ async def format_choice_handler(callback_query: types.CallbackQuery):
         )
         return
 
+    if JOB_QUEUE:
+        await enqueue_download(message.reply_to_message, url, user_id, format_choice=choice)
+        await message.delete()
+        return
+
     coro = handle_single_download(service, url, message, format_choice=f"{choice}:{user_id}")
-    task = asyncio.create_task(download_wrapper(user_id, coro))
+    task = asyncio.create_task(download_wrapper(user_id, service.name, message, coro))
 
     TaskManager().add_task(user_id, task)
     await message.delete()
 
 
+async def enqueue_download(
+    message: types.Message, url: str, user_id: int, format_choice: Optional[str] = None
+) -> None:
+    """Hands the download to worker.py through the job queue, replies go to `message`."""
+    job_id = await job_queue.enqueue(Job(
+        url=url,
+        chat_id=message.chat.id,
+        chat_type=message.chat.type,
+        user_id=user_id,
+        message_id=message.message_id,
+        format_choice=format_choice,
+    ))
+    logger.info(f"Queued job {job_id} for {url}")
+
+
 async def handle_single_download(
-    service, url: str, message: types.Message, format_choice: Optional[str] = None
+    service,
+    url: str,
+    message: types.Message,
+    format_choice: Optional[str] = None,
+    raise_errors: bool = False,
 ) -> None:
-    """Handle download of a single media item."""
-    user_id = 0
+    """
+    Handle download of a single media item.
+
+    With raise_errors failures are raised as BotError instead of being reported, unless
+    part of the media already reached the chat and a retry would send it twice.
+    """
     assert message.bot, "Bot is not found"
+    delivered: List[MediaContent] = []
 
     try:
+        format = None
         if service.name == "Youtube" and format_choice:
-            format, user_id = format_choice.split(":")
-            content = await service.download(url, format)
-        else:
-            await message.bot.send_chat_action(message.chat.id, "record_video")
-            user = message.from_user
-            if user is None:
+            format = format_choice.split(":")[0]
+        elif message.from_user is None:
+            return
+
+        cached = await media_cache.get(url, format)
+        if cached:
+            if await MediaHandler.send_media_content(message, cached, report_errors=False, sent=delivered) is not None:
                 return
-            user_id = user.id
-            content = await service.download(url)
+            # Telegram no longer knows the file_id, download it again
+            await media_cache.invalidate(url, format)
+            if delivered:
+                # Sending everything again would repeat what the chat already has
+                raise BotError(
+                    code=ErrorCode.DOWNLOAD_FAILED,
+                    url=url,
+                    message="Cached media was only partly sent",
+                    critical=True,
+                    is_logged=True
+                )
+
+        started = time.monotonic()
+        if not format:
+            await message.bot.send_chat_action(message.chat.id, "record_video")
+        content = await download_flights.download(service, url, format)
         if not content:
             raise BotError(
                 code=ErrorCode.DOWNLOAD_FAILED,
@@ -103,8 +179,20 @@ async def handle_single_download(
                 critical=True,
                 is_logged=True
             )
+        download_time = time.monotonic() - started
+        size = MediaCache.content_size(content)
 
-        await MediaHandler.send_media_content(message, content)
+        sent = await MediaHandler.send_media_content(message, content, report_errors=False, sent=delivered)
+        if sent is None:
+            raise BotError(
+                code=ErrorCode.DOWNLOAD_FAILED,
+                url=url,
+                message="Failed to send media",
+                critical=True,
+                is_logged=True
+            )
+        if sent:
+            await media_cache.set(url, format, sent, size=size, download_time=download_time)
 
     except Exception as e:
         if not isinstance(e, BotError):
@@ -115,31 +203,22 @@ async def handle_single_download(
                 critical=True,
                 is_logged=True
             )
+        if raise_errors and not delivered:
+            raise e
         await handle_download_error(message, e)
 
-    finally:
-        TaskManager().remove_task(int(user_id))
-
 
-async def handle_playlist_download(service, url: str, message: types.Message) -> None:
-    """Handle download of a playlist."""
+async def handle_playlist_download(
+    service, url: str, message: types.Message, raise_errors: bool = False
+) -> None:
+    """Handle download of a playlist, raise_errors re-raises failures as BotError."""
     assert message.bot, "Bot is not found"
 
     try:
         tracks = await service.get_playlist_tracks(url)
         if isinstance(tracks, BotError):
             raise tracks
-        for track in tracks:
-            if message.from_user.id not in user_tasks:
-                break
-
-            try:
-                await message.bot.send_chat_action(message.chat.id, "record_voice")
-                file = await service.download(track)
-                await MediaHandler.send_audio(message, file[0])
-            except Exception:
-                continue
-
+        await PlaylistDownloader(service, message).deliver(tracks)
         await message.reply(_("Download completed."))
     except Exception as e:
         if not isinstance(e, BotError):
@@ -150,6 +229,6 @@ async def handle_playlist_download(service, url: str, message: types.Message) ->
                 critical=True,
                 is_logged=True
             )
+        if raise_errors:
+            raise e
         await handle_download_error(message, e)
-    finally:
-        TaskManager().remove_task(message.from_user.id)
@@ -3,13 +3,27 @@ import importlib
 import logging
 import os
 import pkgutil
+import time
 from logging.handlers import TimedRotatingFileHandler
 
-from database.database_manager import create_table_settings
+from database.database_manager import (
+    create_table_broadcasts,
+    create_table_media_cache,
+    create_table_settings,
+    create_table_track_metadata,
+    database,
+)
 from loader import bot, dp
+from managers.broadcast_manager import broadcaster
+from managers.job_queue import job_queue
+from managers.send_scheduler import send_scheduler
+from managers.session_manager import session_manager
+from managers.webhook_server import run_webhook
+from managers.ytdlp_runner import ytdlp_runner
 from utils.language_middleware import CustomI18nMiddleware
 from aiogram.utils.i18n import I18n, FSMI18nMiddleware
-from utils.register_services import initialize_services
+from config.settings import JOB_QUEUE, SERVICES_WARM_UP, WEBHOOK_URL
+from utils.register_services import initialize_services, warm_up_services
 from utils.set_bot_commands import set_default_commands
 
 # Initialize CustomMiddleware and connect it to dispatcher
@@ -20,6 +34,9 @@ dp.update.middleware(fsm_i18n)
 custom_i18n = CustomI18nMiddleware(i18n)
 dp.update.middleware(custom_i18n)
 
+# Pace every outgoing Bot API call and retry flood waits
+bot.session.middleware(send_scheduler)
+
 # Setup Logger
 log_dir = "other/logs"
 os.makedirs(log_dir, exist_ok=True)
@@ -55,7 +72,16 @@ async def main():
 
     try:
         logger.info("Setting up database...")
+        await database.connect()
         await create_table_settings()
+        await create_table_media_cache()
+        await create_table_broadcasts()
+        await create_table_track_metadata()
+        if JOB_QUEUE:
+            await job_queue.connect()
+
+        logger.info("Opening HTTP session pool...")
+        await session_manager.start()
 
         logger.info("Setting default commands...")
         await set_default_commands()
@@ -67,11 +93,37 @@ async def main():
 
         logger.info("Initializing services...")
         initialize_services()
-
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        if SERVICES_WARM_UP:
+            dp.startup.register(start_services_warm_up)
+        dp.startup.register(resume_broadcasts)
+        dp.shutdown.register(broadcaster.stop)
+
+        if WEBHOOK_URL:
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"An error occurred while starting the bot: {e}")
+    finally:
+        await session_manager.close()
+        ytdlp_runner.shutdown()
+        await job_queue.close()
+        await database.close()
+
+
+background_tasks = set()
+
+
+async def start_services_warm_up():
+    task = asyncio.create_task(warm_up_services())
+    # Keep a reference so the task is not garbage collected while running
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+async def resume_broadcasts():
+    await broadcaster.resume(bot)
 
 
 def load_modules(plugin_packages, ignore_files=[]):
@@ -80,8 +132,9 @@ def load_modules(plugin_packages, ignore_files=[]):
         package = importlib.import_module(plugin_package)
         for _, name, is_pkg in pkgutil.iter_modules(package.__path__):
             if not is_pkg and name not in ignore_files:
-                logger.info(f"Loading module: {plugin_package}.{name}")
+                started = time.perf_counter()
                 importlib.import_module(f"{plugin_package}.{name}")
+                logger.info(f"Loaded module: {plugin_package}.{name} in {time.perf_counter() - started:.2f}s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import aiohttp
+from PIL import Image
+
+from config.settings import ARTWORK_CACHE_DIR, ARTWORK_CACHE_MAX_MB, ARTWORK_CACHE_URL_TTL, ARTWORK_EMBED_SIZE
+from managers.download_scheduler import download_executor
+from utils.file_downloader import download_file
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Artwork:
+    embed: Path  # Written into the audio file
+    thumbnail: Path  # Sent as the audio thumbnail, within Telegram's limits
+
+
+class ArtworkCache:
+    """
+    Content-addressed cache of cover art under ARTWORK_CACHE_DIR.
+
+    Every cover is stored once per distinct image as two JPEG variants: one for embedding
+    into audio files (at most ARTWORK_EMBED_SIZE px) and one that fits Telegram's
+    thumbnail limits. Cover URLs are mapped to their image in memory, so a cover is
+    fetched once and every track of the same album reuses it.
+
+    Files are shared by all requests and must not be deleted by senders, see owns().
+    Beyond ARTWORK_CACHE_MAX_MB the least recently used images are removed.
+    """
+
+    THUMBNAIL_SIZE = 320
+    THUMBNAIL_MAX_BYTES = 200 * 1024
+    # Images used this recently are kept even over the size limit, an upload may be reading them
+    MIN_AGE = 10 * 60
+    # Check the size limit once per this many stored images
+    EVICT_EVERY = 50
+
+    def __init__(
+        self,
+        directory: str = ARTWORK_CACHE_DIR,
+        max_bytes: int = ARTWORK_CACHE_MAX_MB * 1024 * 1024,
+        embed_size: int = ARTWORK_EMBED_SIZE,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.embed_size = embed_size
+        self._urls: TTLCache[str, str] = TTLCache(10000, ARTWORK_CACHE_URL_TTL)
+        self._fetching: Dict[str, asyncio.Task] = {}
+        self.stores = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def owns(self, path: Optional[Union[str, Path]]) -> bool:
+        """True for files of the cache, which senders must keep."""
+        return path is not None and Path(path).resolve().parent == self.directory.resolve()
+
+    async def fetch(self, url: str, session: aiohttp.ClientSession) -> Optional[Artwork]:
+        """
+        Returns the cached variants of a cover, downloading it on a miss.
+
+        Args:
+            url (str): Cover image URL.
+            session (aiohttp.ClientSession): Pooled session of the calling service.
+
+        Returns:
+            Optional[Artwork]: Cover variants, None if the image couldn't be fetched or decoded.
+        """
+        digest = self._urls.get(url)
+        if digest is not None:
+            artwork = self._touch(digest)
+            if artwork is not None:
+                self.hits += 1
+                return artwork
+
+        self.misses += 1
+        task = self._fetching.get(url)
+        if task is None:
+            task = asyncio.create_task(self._download(url, session))
+            self._fetching[url] = task
+            task.add_done_callback(lambda _task: self._fetching.pop(url, None))
+
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            logger.warning(f"Failed to fetch cover {url}: {e}")
+            return None
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+        }
+
+    async def evict(self) -> None:
+        """Removes the least recently used images while the cache is over its size limit."""
+        removed = await asyncio.get_running_loop().run_in_executor(download_executor, self._evict)
+        if removed:
+            logger.info(f"Artwork cache evicted {removed} files")
+
+    def _paths(self, digest: str) -> Artwork:
+        return Artwork(
+            embed=self.directory / f"{digest}.jpg",
+            thumbnail=self.directory / f"{digest}_thumb.jpg",
+        )
+
+    def _touch(self, digest: str) -> Optional[Artwork]:
+        artwork = self._paths(digest)
+        try:
+            # mtime is the last use, eviction goes by it
+            os.utime(artwork.embed)
+            os.utime(artwork.thumbnail)
+        except OSError:
+            return None
+        return artwork
+
+    async def _download(self, url: str, session: aiohttp.ClientSession) -> Artwork:
+        temp_path = self.directory / f"{uuid.uuid4().hex}.part"
+        try:
+            await download_file(session, url, temp_path, segments=1)
+            artwork = await asyncio.get_running_loop().run_in_executor(
+                download_executor, self._store, temp_path
+            )
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+        self._urls[url] = artwork.embed.stem
+        self.stores += 1
+        if self.stores % self.EVICT_EVERY == 0:
+            await self.evict()
+        return artwork
+
+    def _store(self, source: Path) -> Artwork:
+        data = source.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        artwork = self._touch(digest)
+        if artwork is not None:
+            # Same image behind another URL
+            return artwork
+
+        artwork = self._paths(digest)
+        with Image.open(BytesIO(data)) as image:
+            image = image.convert("RGB")
+
+            embed = image.copy()
+            embed.thumbnail((self.embed_size, self.embed_size), Image.LANCZOS)
+            self._write(artwork.embed, self._encode(embed, 90))
+
+            image.thumbnail((self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE), Image.LANCZOS)
+            quality = 85
+            encoded = self._encode(image, quality)
+            while len(encoded) > self.THUMBNAIL_MAX_BYTES and quality > 30:
+                quality -= 15
+                encoded = self._encode(image, quality)
+            self._write(artwork.thumbnail, encoded)
+
+        return artwork
+
+    @staticmethod
+    def _encode(image: Image.Image, quality: int) -> bytes:
+        buffer = BytesIO()
+        image.save(buffer, "JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        # Written under a temporary name so readers never see half a file
+        temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+    def _evict(self) -> int:
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        removed = 0
+        keep_after = time.time() - self.MIN_AGE
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes or mtime > keep_after:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+artwork_cache = ArtworkCache()
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+)
+from aiogram.utils.i18n import gettext as _
+
+from config.settings import (
+    BROADCAST_CONCURRENCY,
+    BROADCAST_MAX_ATTEMPTS,
+    BROADCAST_PAGE_SIZE,
+    BROADCAST_RATE,
+    SEND_BULK_RATE,
+)
+from database.database_manager import database
+from functions.db import db_count_active_chats, db_deactivate_chat, db_get_active_chats
+from managers.send_scheduler import bulk_sends
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Broadcast:
+    """Progress of one broadcast, mirrored into the broadcasts table after every page."""
+
+    broadcast_id: str
+    admin_chat_id: int
+    text: str
+    total: int
+    started_at: float
+    last_chat_id: Optional[int] = None
+    sent: int = 0
+    failed: int = 0
+    deactivated: int = 0
+    status: str = "running"
+    finished_at: Optional[float] = None
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.deactivated
+
+
+class Broadcaster:
+    """
+    Sends a message to every active chat within Telegram's rate limits.
+
+    Chat IDs are streamed from the database in keyset pages. Each page is sent by
+    `concurrency` senders sharing one token bucket of `rate` messages per second, and
+    a RetryAfter from any of them pauses the whole bucket. The sends are bulk traffic
+    for the SendScheduler, which retries short flood waits before they get here and
+    paces them with its SEND_BULK_RATE bucket, so the lower of the two rates applies. The
+    cursor and counters are stored after every page, so a broadcast interrupted by a
+    restart is resumed from its last finished page by resume(). Chats that blocked the
+    bot or no longer exist are marked inactive and skipped from then on.
+    """
+
+    def __init__(
+        self,
+        rate: float = BROADCAST_RATE,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        page_size: int = BROADCAST_PAGE_SIZE,
+        max_attempts: int = BROADCAST_MAX_ATTEMPTS,
+    ) -> None:
+        if rate > SEND_BULK_RATE:
+            logger.warning(
+                f"BROADCAST_RATE {rate}/s is above SEND_BULK_RATE {SEND_BULK_RATE}/s, "
+                f"broadcasts are sent at {SEND_BULK_RATE}/s"
+            )
+            rate = SEND_BULK_RATE
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.max_attempts = max_attempts
+        self._running: Dict[str, Broadcast] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._running)
+
+    async def start(self, bot: Bot, admin_chat_id: int, text: str) -> Broadcast:
+        """
+        Registers a broadcast and starts sending it in the background.
+
+        Args:
+            bot (Bot): Bot used for sending.
+            admin_chat_id (int): Chat that gets the final report, it is not sent the message.
+            text (str): MarkdownV2 text.
+
+        Returns:
+            Broadcast: The started broadcast.
+        """
+        broadcast = Broadcast(
+            broadcast_id=uuid.uuid4().hex[:12],
+            admin_chat_id=admin_chat_id,
+            text=text,
+            total=await db_count_active_chats(),
+            started_at=time.time(),
+        )
+        await database.execute(
+            """
+            INSERT INTO broadcasts (broadcast_id, admin_chat_id, text, status, total, started_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                broadcast.broadcast_id,
+                broadcast.admin_chat_id,
+                broadcast.text,
+                broadcast.status,
+                broadcast.total,
+                broadcast.started_at,
+            ),
+        )
+        self._spawn(bot, broadcast)
+        return broadcast
+
+    async def resume(self, bot: Bot) -> None:
+        """Continues every broadcast that was still running when the bot stopped."""
+        rows = await database.fetchall(
+            """
+            SELECT broadcast_id, admin_chat_id, text, total, started_at,
+                   last_chat_id, sent, failed, deactivated
+            FROM broadcasts WHERE status = 'running'
+            """
+        )
+        for row in rows:
+            broadcast = Broadcast(*row)
+            logger.info(
+                f"Resuming broadcast {broadcast.broadcast_id} after chat {broadcast.last_chat_id}, "
+                f"{broadcast.processed} of {broadcast.total} done"
+            )
+            self._spawn(bot, broadcast)
+
+    async def stop(self) -> None:
+        """Cancels running broadcasts at shutdown, they continue from their stored cursor."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> List[Broadcast]:
+        return list(self._running.values())
+
+    def _spawn(self, bot: Bot, broadcast: Broadcast) -> None:
+        self._running[broadcast.broadcast_id] = broadcast
+        task = asyncio.create_task(self._run(bot, broadcast))
+        self._tasks[broadcast.broadcast_id] = task
+
+        def _forget(_task: asyncio.Task) -> None:
+            self._running.pop(broadcast.broadcast_id, None)
+            self._tasks.pop(broadcast.broadcast_id, None)
+
+        task.add_done_callback(_forget)
+
+    async def _run(self, bot: Bot, broadcast: Broadcast) -> None:
+        try:
+            while True:
+                chat_ids = await db_get_active_chats(broadcast.last_chat_id, self.page_size)
+                if not chat_ids:
+                    break
+
+                await self._send_page(bot, broadcast, [
+                    chat_id for chat_id in chat_ids if chat_id != broadcast.admin_chat_id
+                ])
+                broadcast.last_chat_id = chat_ids[-1]
+                await self._save(broadcast)
+
+            broadcast.status = "done"
+            broadcast.finished_at = time.time()
+            await self._save(broadcast)
+        except asyncio.CancelledError:
+            # Shutdown, the stored cursor lets resume() continue from the last page
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {broadcast.broadcast_id} stopped: {e}")
+            return
+
+        logger.info(
+            f"Broadcast {broadcast.broadcast_id} done in {broadcast.finished_at - broadcast.started_at:.0f}s: "
+            f"{broadcast.sent} sent, {broadcast.failed} failed, {broadcast.deactivated} deactivated"
+        )
+        await self._report(bot, broadcast)
+
+    async def _send_page(self, bot: Bot, broadcast: Broadcast, chat_ids: List[int]) -> None:
+        pending = iter(chat_ids)
+
+        async def sender() -> None:
+            for chat_id in pending:
+                await self._deliver(bot, broadcast, chat_id)
+
+        with bulk_sends():
+            await asyncio.gather(*(sender() for _worker in range(self.concurrency)))
+
+    async def _deliver(self, bot: Bot, broadcast: Broadcast, chat_id: int) -> None:
+        for _attempt in range(self.max_attempts):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id, broadcast.text, parse_mode=ParseMode.MARKDOWN_V2)
+                broadcast.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                logger.warning(f"Broadcast flood control, pausing all senders for {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+            except (TelegramForbiddenError, TelegramNotFound) as e:
+                await self._deactivate(broadcast, chat_id, e)
+                return
+            except TelegramBadRequest as e:
+                if "chat not found" in e.message.lower():
+                    await self._deactivate(broadcast, chat_id, e)
+                else:
+                    logger.error(f"Broadcast to {chat_id} rejected: {e}")
+                    broadcast.failed += 1
+                return
+            except Exception as e:
+                logger.error(f"Broadcast to {chat_id} failed: {e}")
+                broadcast.failed += 1
+                return
+
+        logger.error(f"Broadcast to {chat_id} gave up after {self.max_attempts} flood waits")
+        broadcast.failed += 1
+
+    async def _deactivate(self, broadcast: Broadcast, chat_id: int, error: Exception) -> None:
+        logger.info(f"Chat {chat_id} is unreachable, marking inactive: {error}")
+        await db_deactivate_chat(chat_id)
+        broadcast.deactivated += 1
+
+    async def _save(self, broadcast: Broadcast) -> None:
+        await database.execute(
+            """
+            UPDATE broadcasts
+            SET status = ?, last_chat_id = ?, sent = ?, failed = ?, deactivated = ?, finished_at = ?
+            WHERE broadcast_id = ?
+            """,
+            (
+                broadcast.status,
+                broadcast.last_chat_id,
+                broadcast.sent,
+                broadcast.failed,
+                broadcast.deactivated,
+                broadcast.finished_at,
+                broadcast.broadcast_id,
+            ),
+        )
+
+    @staticmethod
+    async def _report(bot: Bot, broadcast: Broadcast) -> None:
+        template = (
+            "The mailing has been completed\n"
+            "Beginning at {start_time}\n"
+            "Ended at {end_time}\n"
+            "Number of chats: {total_chat}\n"
+            "Successfully sent: {sucсess_send}\n"
+            "erros: {error_send}"
+        )
+        try:
+            template = _(template)
+        except LookupError:
+            # Resumed at startup, outside of any update there is no i18n context
+            pass
+
+        time_format = "%Y-%m-%d %H:%M:%S"
+        done_message = template.format(
+            start_time=time.strftime(time_format, time.localtime(broadcast.started_at)),
+            end_time=time.strftime(time_format, time.localtime(broadcast.finished_at)),
+            total_chat=broadcast.total,
+            # The placeholder name is part of the translated msgid, keep it as is
+            sucсess_send=broadcast.sent,
+            error_send=broadcast.failed + broadcast.deactivated,
+        )
+        try:
+            await bot.send_message(chat_id=broadcast.admin_chat_id, text=done_message)
+        except Exception as e:
+            logger.error(f"Failed to report broadcast {broadcast.broadcast_id}: {e}")
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from config.settings import MEDIA_CACHE_MAX_ENTRIES, MEDIA_CACHE_TTL
+from database.database_manager import database
+from models.media_models import MediaContent, MediaType
+from utils.canonical_url import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """
+    Persistent cache of Telegram file_ids for already delivered links.
+
+    Keys are a canonical URL plus the format choice ("video", "audio" or "default").
+    On a hit the stored file_ids are re-sent and the download is skipped entirely.
+    """
+
+    # Run the eviction query once per this many stores
+    EVICT_EVERY = 100
+
+    def __init__(self, ttl: int = MEDIA_CACHE_TTL, max_entries: int = MEDIA_CACHE_MAX_ENTRIES) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def make_key(url: str, format_choice: Optional[str] = None) -> str:
+        return f"{canonicalize_url(url)}|{format_choice or 'default'}"
+
+    async def get(self, url: str, format_choice: Optional[str] = None) -> Optional[List[MediaContent]]:
+        """Return cached media for the URL or None on a miss."""
+        key = self.make_key(url, format_choice)
+        now = time.time()
+
+        row = await database.fetchone(
+            "SELECT content, size, download_time FROM media_cache WHERE cache_key = ? AND created_at > ?",
+            (key, now - self.ttl),
+        )
+        if row:
+            await database.execute(
+                "UPDATE media_cache SET last_used = ?, hits = hits + 1 WHERE cache_key = ?",
+                (now, key),
+            )
+
+        if not row:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.bytes_saved += row[1] or 0
+        self.seconds_saved += row[2] or 0
+        return self._deserialize(row[0])
+
+    async def set(
+        self,
+        url: str,
+        format_choice: Optional[str],
+        content: List[MediaContent],
+        size: int = 0,
+        download_time: float = 0,
+    ) -> None:
+        """Store sent media. Every item must carry the file_id returned by Telegram."""
+        if not content or any(not item.file_id for item in content):
+            return
+
+        key = self.make_key(url, format_choice)
+        now = time.time()
+
+        await database.execute(
+            """
+            INSERT OR REPLACE INTO media_cache
+                (cache_key, content, size, download_time, created_at, last_used, hits)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+            """,
+            (key, self._serialize(content), size, download_time, now, now),
+        )
+
+        self.stores += 1
+        if self.stores % self.EVICT_EVERY == 0:
+            await self.evict()
+
+    async def invalidate(self, url: str, format_choice: Optional[str] = None) -> None:
+        await database.execute(
+            "DELETE FROM media_cache WHERE cache_key = ?",
+            (self.make_key(url, format_choice),),
+        )
+
+    async def evict(self) -> None:
+        """Drop expired entries, then the least recently used ones above the size limit."""
+        removed = await database.execute(
+            "DELETE FROM media_cache WHERE created_at <= ?", (time.time() - self.ttl,)
+        )
+        removed += await database.execute(
+            """
+            DELETE FROM media_cache WHERE cache_key IN (
+                SELECT cache_key FROM media_cache
+                ORDER BY last_used DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+        if removed > 0:
+            self.evicted += removed
+            logger.info(f"Media cache evicted {removed} entries")
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evicted": self.evicted,
+            "bytes_saved": self.bytes_saved,
+            "seconds_saved": self.seconds_saved,
+        }
+
+    @staticmethod
+    def content_size(content: List[MediaContent]) -> int:
+        """Total size in bytes of the downloaded files that are still on disk."""
+        size = 0
+        for item in content:
+            for path in (item.path, item.cover):
+                if path and os.path.exists(path):
+                    size += os.path.getsize(path)
+        return size
+
+    @staticmethod
+    def _serialize(content: List[MediaContent]) -> str:
+        return json.dumps([
+            {
+                "type": item.type.value,
+                "file_id": item.file_id,
+                "width": item.width,
+                "height": item.height,
+                "duration": item.duration,
+                "title": item.title,
+                "performer": item.performer,
+            }
+            for item in content
+        ])
+
+    @staticmethod
+    def _deserialize(data: str) -> List[MediaContent]:
+        return [
+            MediaContent(
+                type=MediaType(item["type"]),
+                file_id=item["file_id"],
+                width=item.get("width"),
+                height=item.get("height"),
+                duration=item.get("duration"),
+                title=item.get("title"),
+                performer=item.get("performer"),
+            )
+            for item in json.loads(data)
+        ]
+
+
+media_cache = MediaCache()
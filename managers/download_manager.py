@@ -1,37 +1,54 @@
 import asyncio
-from typing import Dict, List, Optional, Tuple
+import logging
+from typing import List, Optional, Set, Tuple, Union
 
 from aiogram import types
 from aiogram.enums import InputMediaType
 from aiogram.utils.media_group import MediaGroupBuilder
 
+from config.settings import USER_TASKS_MAX_ENTRIES, USER_TASKS_TTL
+from managers.single_flight import content_files
 from utils import delete_files, handle_download_error, truncate_string
 from models.media_models import MediaContent, MediaType
 from utils.error_handler import BotError, ErrorCode
+from utils.local_server import local_file_uri, local_upload_enabled
+from utils.ttl_cache import TTLCache
 
-user_tasks: Dict[int, asyncio.Task] = {}
+logger = logging.getLogger(__name__)
+
+# Latest download task per user for /cancel. Entries are dropped when the task finishes,
+# TTL and size cap only reclaim finished tasks whose entry was left behind, running
+# tasks are always kept so they can be cancelled
+user_tasks: TTLCache[int, asyncio.Task] = TTLCache(
+    USER_TASKS_MAX_ENTRIES, USER_TASKS_TTL, keep=lambda task: not task.done()
+)
+# Every unfinished download task, also the ones a newer task of the same user replaced in
+# user_tasks. The webhook server waits for them on shutdown
+running_tasks: Set[asyncio.Task] = set()
 
 
 class TaskManager:
     def add_task(self, user_id: int, task: asyncio.Task) -> None:
         """Add a download task for a user."""
         user_tasks[user_id] = task
+        running_tasks.add(task)
+
+        def _forget(finished: asyncio.Task) -> None:
+            running_tasks.discard(finished)
+            # A newer task of the same user may have replaced this one
+            if user_tasks.peek(user_id) is finished:
+                user_tasks.pop(user_id)
 
-    def remove_task(self, user_id: int) -> None:
-        """Remove a download task for a user."""
-        if user_id in user_tasks:
-            user_tasks.pop(user_id)
+        task.add_done_callback(_forget)
 
     def cancel_task(self, user_id: int) -> bool:
-        """Cancel a download task for a user."""
-        if user_id not in user_tasks:
+        """Cancel a download task for a user, its entry is dropped once the task finishes."""
+        task = user_tasks.get(user_id)
+        if task is None:
             return False
 
-        task = user_tasks[user_id]
-
         if task and not task.done():
             task.cancel()
-            self.remove_task(user_id)
             return True
         else:
             return False
@@ -39,29 +56,50 @@ class TaskManager:
 
 class MediaHandler:
     @staticmethod
-    async def send_media_content(message: types.Message, content: List[MediaContent]) -> None:
-        """Handle sending different types of media content."""
+    async def send_media_content(
+        message: types.Message,
+        content: List[MediaContent],
+        report_errors: bool = True,
+        sent: Optional[List[MediaContent]] = None,
+    ) -> Optional[List[MediaContent]]:
+        """Handle sending different types of media content.
+
+        Returns the sent items with their Telegram file_id set, or None if anything failed.
+        Failures are reported to the user unless report_errors is False. Items are appended
+        to `sent` as they reach the chat, so after a failure the caller can tell whether
+        anything was delivered.
+        """
+        sent = [] if sent is None else sent
+        media_items, audio_items, gif_items, caption = MediaHandler.parse_media(content=content)
+        # send_audio releases the files of the audio it gets, the ones it never gets are released here
+        unsent_audio = list(audio_items)
         try:
-            media_items, audio_items, gif_items, caption = MediaHandler.parse_media(content=content)
-
-            await MediaHandler.send_media_groups(message, media_items, caption)
+            if await MediaHandler.send_media_groups(message, media_items, caption, report_errors, sent) is None:
+                return None
 
             bot = message.bot
             if bot is None:
-                return
+                return None
 
-            if audio_items:
-                for audio in audio_items:
-                    await bot.send_chat_action(message.chat.id, "upload_voice")
-                    await MediaHandler.send_audio(message, audio)
+            while unsent_audio:
+                audio = unsent_audio.pop(0)
+                await bot.send_chat_action(message.chat.id, "upload_voice")
+                sent_audio = await MediaHandler.send_audio(message, audio, report_errors)
+                if sent_audio is None:
+                    return None
+                sent.append(sent_audio)
 
             for gif in gif_items:
                 await bot.send_chat_action(message.chat.id, "upload_video")
-                await message.answer_animation(
-                    animation=types.FSInputFile(gif.path), disable_notification=True
+                gif_message = await message.answer_animation(
+                    animation=MediaHandler.input_file(gif), disable_notification=True
                 )
+                sent.append(MediaContent(
+                    type=MediaType.GIF,
+                    file_id=gif_message.animation.file_id if gif_message.animation else None,
+                ))
 
-                await delete_files([gif.path])
+            return sent
         except Exception as e:
             if not isinstance(e, BotError):
                 e = BotError(
@@ -70,61 +108,81 @@ class MediaHandler:
                     critical=True,
                     is_logged=True
                 )
-            await handle_download_error(message, e)
+            if report_errors:
+                await handle_download_error(message, e)
+            else:
+                logger.warning(f"Failed to send media: {e.message}")
+            return None
+        finally:
+            await delete_files(content_files(unsent_audio + gif_items))
 
     @staticmethod
-    async def send_media_groups(message: types.Message, content: List[MediaContent], caption: Optional[str]):
-        """Send media groups with or without caption."""
-        temp_media_path = []
-        bot = message.bot
-        if bot is None:
-            return
-
+    async def send_media_groups(
+        message: types.Message,
+        content: List[MediaContent],
+        caption: Optional[str],
+        report_errors: bool = True,
+        sent: Optional[List[MediaContent]] = None,
+    ) -> Optional[List[MediaContent]]:
+        """Send media groups with or without caption, sent items are appended to `sent`."""
+        # Collected up front, so the files of items after a failed group are released too
+        temp_media_path = content_files(content)
+        sent = [] if sent is None else sent
         try:
+            bot = message.bot
+            if bot is None:
+                return None
+
             media_to_send_as_document: List[MediaContent] = []
+            group_content = [item for item in content if item.type != MediaType.DOCUMENT]
 
             # Split media items into groups of 10
-            for i in range(0, len(content), 10):
+            for i in range(0, len(group_content), 10):
                 media_group = MediaGroupBuilder()
                 if caption and i == 0:
                     media_group.caption = caption
 
-                group_items = content[i : i + 10]
+                group_items = group_content[i : i + 10]
                 for item in group_items:
                     if item.type == MediaType.PHOTO:
                         media_group.add_photo(
-                            media=types.FSInputFile(item.path),
+                            media=MediaHandler.input_file(item),
                             type=InputMediaType.PHOTO,
                         )
                     elif item.type == MediaType.VIDEO:
                         media_group.add_video(
-                            media=types.FSInputFile(item.path),
+                            media=MediaHandler.input_file(item),
                             type=InputMediaType.VIDEO,
                             supports_streaming=True,
                             width=int(item.width) if item.width else None,
                             height=int(item.height) if item.height else None,
                             duration=int(item.duration) if item.duration else None
                         )
-                    temp_media_path.append(item.path)
 
                     if item.original_size:
                         media_to_send_as_document.append(item)
 
                 if group_items:
                     await bot.send_chat_action(message.chat.id, "upload_video")
-                    await message.answer_media_group(
+                    messages = await message.answer_media_group(
                         media=media_group.build(), disable_notification=True
                     )
-                    await asyncio.sleep(1)
+                    for item, sent_message in zip(group_items, messages):
+                        sent.append(MediaHandler._sent_item(item, sent_message))
 
+            media_to_send_as_document.extend(item for item in content if item.type == MediaType.DOCUMENT)
             for item in media_to_send_as_document:
                 await bot.send_chat_action(message.chat.id, "upload_document")
-                await message.answer_document(
-                    document=types.FSInputFile(item.path),
+                document_message = await message.answer_document(
+                    document=MediaHandler.input_file(item),
                     disable_notification=True
                 )
-                await asyncio.sleep(0.5)
+                sent.append(MediaContent(
+                    type=MediaType.DOCUMENT,
+                    file_id=document_message.document.file_id if document_message.document else None,
+                ))
 
+            return sent
         except Exception as e:
             if not isinstance(e, BotError):
                 e = BotError(
@@ -133,17 +191,23 @@ class MediaHandler:
                     critical=True,
                     is_logged=True
                 )
-            await handle_download_error(message, e)
+            if report_errors:
+                await handle_download_error(message, e)
+            else:
+                logger.warning(f"Failed to send media: {e.message}")
+            return None
         finally:
             await delete_files(temp_media_path)
 
 
     @staticmethod
-    async def send_audio(message: types.Message, audio: MediaContent) -> None:
+    async def send_audio(
+        message: types.Message, audio: MediaContent, report_errors: bool = True
+    ) -> Optional[MediaContent]:
         """Send audio file with or without cover."""
         try:
-            await message.answer_audio(
-                audio=types.FSInputFile(audio.path),
+            audio_message = await message.answer_audio(
+                audio=MediaHandler.input_file(audio),
                 disable_notification=True,
                 thumbnail=types.FSInputFile(audio.cover) if audio.cover else None,
                 title=audio.title,
@@ -151,7 +215,13 @@ class MediaHandler:
                 performer=audio.performer,
             )
 
-            await delete_files([audio.path, audio.cover])
+            return MediaContent(
+                type=MediaType.AUDIO,
+                file_id=audio_message.audio.file_id if audio_message.audio else None,
+                duration=audio.duration,
+                title=audio.title,
+                performer=audio.performer,
+            )
         except Exception as e:
             if not isinstance(e, BotError):
                 e = BotError(
@@ -160,7 +230,47 @@ class MediaHandler:
                     critical=True,
                     is_logged=True
                 )
-            await handle_download_error(message, e)
+            if report_errors:
+                await handle_download_error(message, e)
+            else:
+                logger.warning(f"Failed to send media: {e.message}")
+            return None
+        finally:
+            # Covers from the artwork cache are shared with other tracks, content_files skips them
+            await delete_files(content_files([audio]))
+
+    @staticmethod
+    def input_file(item: MediaContent) -> Union[str, types.FSInputFile]:
+        """Reuse the Telegram file_id when the item was uploaded before.
+
+        With a co-located local Bot API server the file is passed by its file:// path, so
+        the server reads it from the shared volume and the bytes never go through the bot.
+        Files are deleted only after the send call returned, i.e. the server ingested them.
+        """
+        if item.file_id:
+            return item.file_id
+        if local_upload_enabled():
+            return local_file_uri(item.path)
+        return types.FSInputFile(item.path)
+
+
+    @staticmethod
+    def _sent_item(item: MediaContent, sent_message: types.Message) -> MediaContent:
+        """Copy an item with the file_id Telegram assigned to it."""
+        file_id = None
+        if sent_message.photo:
+            file_id = sent_message.photo[-1].file_id
+        elif sent_message.video:
+            file_id = sent_message.video.file_id
+
+        return MediaContent(
+            type=item.type,
+            file_id=file_id,
+            width=item.width,
+            height=item.height,
+            duration=item.duration,
+            title=item.title,
+        )
 
 
     @staticmethod
@@ -176,7 +286,7 @@ class MediaHandler:
             if item.title:
                 caption = truncate_string(item.title or "")
 
-            if item.type in (MediaType.PHOTO, MediaType.VIDEO):
+            if item.type in (MediaType.PHOTO, MediaType.VIDEO, MediaType.DOCUMENT):
                 media_items.append(item)
             elif item.type == MediaType.AUDIO:
                 audio_items.append(item)
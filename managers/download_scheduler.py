@@ -0,0 +1,188 @@
+import asyncio
+import itertools
+import logging
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from config.settings import (
+    DOWNLOAD_GLOBAL_LIMIT,
+    DOWNLOAD_QUEUE_LIMIT,
+    DOWNLOAD_SERVICE_DEFAULT_LIMIT,
+    DOWNLOAD_SERVICE_LIMITS,
+    DOWNLOAD_USER_LIMIT,
+    DOWNLOAD_WORKERS,
+)
+from utils.error_handler import BotError, ErrorCode
+
+logger = logging.getLogger(__name__)
+
+# One executor for blocking download work (yt-dlp, mutagen) shared by every service
+download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download")
+
+_job_ids = itertools.count()
+
+
+@dataclass
+class _Job:
+    user_id: int
+    service: str
+    future: asyncio.Future
+    seq: int = field(default_factory=lambda: next(_job_ids))
+
+
+class DownloadScheduler:
+    """
+    Admits download jobs into a global lane and per-service lanes.
+
+    Waiting jobs are kept in one FIFO per user and dispatched round-robin between users,
+    so a user posting a whole batch of links cannot starve everyone else. Once the
+    waiting list reaches its limit new jobs are rejected with ErrorCode.QUEUE_FULL.
+    """
+
+    def __init__(
+        self,
+        global_limit: int = DOWNLOAD_GLOBAL_LIMIT,
+        service_limits: Optional[Dict[str, int]] = None,
+        default_service_limit: int = DOWNLOAD_SERVICE_DEFAULT_LIMIT,
+        user_limit: int = DOWNLOAD_USER_LIMIT,
+        max_queue: int = DOWNLOAD_QUEUE_LIMIT,
+    ) -> None:
+        self.global_limit = global_limit
+        self.service_limits = service_limits if service_limits is not None else dict(DOWNLOAD_SERVICE_LIMITS)
+        self.default_service_limit = default_service_limit
+        self.user_limit = user_limit
+        self.max_queue = max_queue
+
+        self._waiting: "OrderedDict[int, Deque[_Job]]" = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._running_services: Counter = Counter()
+        self._running_users: Counter = Counter()
+
+    async def acquire(
+        self,
+        user_id: int,
+        service: str,
+        on_queued: Optional[Callable[[int], Awaitable]] = None,
+    ) -> None:
+        """
+        Waits until the job may run. Every successful call must be paired with release().
+
+        Args:
+            user_id (int): Telegram user the job belongs to.
+            service (str): Service name, selects the per-service lane.
+            on_queued (Optional[Callable]): Called with the queue position if the job has to wait.
+
+        Raises:
+            BotError: With ErrorCode.QUEUE_FULL when the waiting list is full.
+        """
+        if self._queued >= self.max_queue:
+            raise BotError(
+                code=ErrorCode.QUEUE_FULL,
+                message=f"Download queue is full ({self._queued} jobs)",
+                critical=False,
+                is_logged=True,
+            )
+
+        job = _Job(user_id=user_id, service=service, future=asyncio.get_running_loop().create_future())
+        self._waiting.setdefault(user_id, deque()).append(job)
+        self._queued += 1
+        self._dispatch()
+
+        try:
+            if not job.future.done() and on_queued is not None:
+                try:
+                    await on_queued(self.position(job))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Failed to report queue position: {e}")
+            await job.future
+        except asyncio.CancelledError:
+            if job.future.done() and not job.future.cancelled():
+                # The slot was granted right as the job got cancelled
+                self.release(user_id, service)
+            else:
+                self._remove(job)
+            raise
+
+    def release(self, user_id: int, service: str) -> None:
+        """Frees the slots taken by a finished job and admits the next ones."""
+        self._running -= 1
+        self._running_services[service] -= 1
+        if self._running_services[service] <= 0:
+            del self._running_services[service]
+        self._running_users[user_id] -= 1
+        if self._running_users[user_id] <= 0:
+            del self._running_users[user_id]
+        self._dispatch()
+
+    def position(self, job: _Job) -> int:
+        """1-based position of a waiting job, counting jobs submitted before it."""
+        return 1 + sum(
+            1 for queue in self._waiting.values() for other in queue if other.seq < job.seq
+        )
+
+    def service_limit(self, service: str) -> int:
+        return self.service_limits.get(service, self.default_service_limit)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": self._running,
+            "queued": self._queued,
+            "users_waiting": len(self._waiting),
+        }
+
+    def _can_run(self, job: _Job) -> bool:
+        return (
+            self._running < self.global_limit
+            and self._running_services[job.service] < self.service_limit(job.service)
+            and self._running_users[job.user_id] < self.user_limit
+        )
+
+    def _dispatch(self) -> None:
+        """Starts waiting jobs round-robin between users while capacity allows."""
+        started = True
+        while started and self._running < self.global_limit:
+            started = False
+            for user_id, queue in list(self._waiting.items()):
+                # Drop jobs whose task was cancelled while waiting
+                while queue and queue[0].future.cancelled():
+                    queue.popleft()
+                    self._queued -= 1
+                if not queue:
+                    del self._waiting[user_id]
+                    continue
+
+                job = queue[0]
+                if not self._can_run(job):
+                    continue
+
+                queue.popleft()
+                if queue:
+                    self._waiting.move_to_end(user_id)
+                else:
+                    del self._waiting[user_id]
+                self._queued -= 1
+
+                self._running += 1
+                self._running_services[job.service] += 1
+                self._running_users[job.user_id] += 1
+                job.future.set_result(None)
+                started = True
+                break
+
+    def _remove(self, job: _Job) -> None:
+        queue = self._waiting.get(job.user_id)
+        if queue is None or job not in queue:
+            return
+        queue.remove(job)
+        self._queued -= 1
+        if not queue:
+            del self._waiting[job.user_id]
+        self._dispatch()
+
+
+download_scheduler = DownloadScheduler()
@@ -0,0 +1,237 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+
+import aiosqlite
+
+from config.settings import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_QUEUE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """A download request handed from the bot frontend to a worker."""
+
+    url: str
+    chat_id: int
+    chat_type: str
+    user_id: int
+    message_id: int
+    format_choice: Optional[str] = None
+    job_id: Optional[int] = None
+    attempts: int = 0
+
+
+class JobQueue(ABC):
+    """
+    Interface of the durable download queue shared by the frontend and the workers.
+
+    Delivery is at-least-once: a claimed job is leased to one worker, which renews the
+    lease while working. If the worker dies the lease runs out and the job is claimed
+    again, until it was attempted JOB_MAX_ATTEMPTS times.
+    """
+
+    @abstractmethod
+    async def connect(self) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def enqueue(self, job: Job) -> int:
+        """Stores a job and returns its id."""
+        pass
+
+    @abstractmethod
+    async def claim(self, worker: str) -> Optional[Job]:
+        """Leases the oldest available job to a worker, None if there is none."""
+        pass
+
+    @abstractmethod
+    async def renew(self, job_id: int, worker: str) -> bool:
+        """Extends the lease, False if the job was lost to another worker."""
+        pass
+
+    @abstractmethod
+    async def complete(self, job_id: int) -> None:
+        pass
+
+    @abstractmethod
+    async def fail(self, job_id: int, error: str, retry: bool = True) -> None:
+        """
+        Puts the job back into the queue, or marks it failed after the last attempt.
+        Without retry it is marked failed right away.
+        """
+        pass
+
+    @abstractmethod
+    async def cancel(self, user_id: int) -> int:
+        """
+        Cancels the queued and running jobs of a user and returns how many there were.
+        Workers stop running jobs once their lease renewal fails.
+        """
+        pass
+
+    @abstractmethod
+    async def purge(self, older_than: float) -> int:
+        """Deletes finished jobs last touched more than older_than seconds ago."""
+        pass
+
+    @abstractmethod
+    async def stats(self) -> dict:
+        """Number of jobs per status."""
+        pass
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    JobQueue in a SQLite file.
+
+    Works for any number of worker processes on the machine that holds the file. Workers
+    on other machines need a networked backend implementing the same interface.
+    """
+
+    def __init__(
+        self,
+        path: str = JOB_QUEUE_PATH,
+        lease: float = JOB_LEASE_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ) -> None:
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.conn: Optional[aiosqlite.Connection] = None
+
+    async def connect(self) -> None:
+        self.conn = await aiosqlite.connect(self.path)
+        await self.conn.execute("PRAGMA journal_mode=WAL")
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
+        await self.conn.execute("PRAGMA busy_timeout=5000")
+        await self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,
+                chat_type TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                format_choice TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+        """
+        )
+        await self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, job_id);")
+        await self.conn.commit()
+        logger.info(f"Job queue opened: {self.path}")
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def enqueue(self, job: Job) -> int:
+        now = time.time()
+        cursor = await self.conn.execute(
+            """
+            INSERT INTO jobs (url, chat_id, chat_type, user_id, message_id, format_choice, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job.url, job.chat_id, job.chat_type, job.user_id, job.message_id, job.format_choice, now, now),
+        )
+        await self.conn.commit()
+        job.job_id = cursor.lastrowid
+        return job.job_id
+
+    async def claim(self, worker: str) -> Optional[Job]:
+        now = time.time()
+        # Jobs whose worker died on their last attempt are given up
+        await self.conn.execute(
+            """
+            UPDATE jobs SET status = 'failed', error = 'lease expired', updated_at = ?
+            WHERE status = 'running' AND lease_until < ? AND attempts >= ?
+            """,
+            (now, now, self.max_attempts),
+        )
+        # One statement, so concurrent workers can never claim the same job
+        async with self.conn.execute(
+            """
+            UPDATE jobs
+            SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ?
+            WHERE job_id = (
+                SELECT job_id FROM jobs
+                WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+                ORDER BY job_id LIMIT 1
+            )
+            RETURNING url, chat_id, chat_type, user_id, message_id, format_choice, job_id, attempts
+            """,
+            (worker, now + self.lease, now, now),
+        ) as cursor:
+            row = await cursor.fetchone()
+        await self.conn.commit()
+        return Job(*row) if row else None
+
+    async def renew(self, job_id: int, worker: str) -> bool:
+        now = time.time()
+        cursor = await self.conn.execute(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE job_id = ? AND worker = ? AND status = 'running'",
+            (now + self.lease, now, job_id, worker),
+        )
+        await self.conn.commit()
+        return cursor.rowcount > 0
+
+    async def complete(self, job_id: int) -> None:
+        # Only running jobs, a cancelled one stays cancelled
+        await self.conn.execute(
+            "UPDATE jobs SET status = 'done', lease_until = NULL, updated_at = ? WHERE job_id = ? AND status = 'running'",
+            (time.time(), job_id),
+        )
+        await self.conn.commit()
+
+    async def fail(self, job_id: int, error: str, retry: bool = True) -> None:
+        await self.conn.execute(
+            """
+            UPDATE jobs
+            SET status = CASE WHEN attempts >= ? OR NOT ? THEN 'failed' ELSE 'queued' END,
+                lease_until = NULL, error = ?, updated_at = ?
+            WHERE job_id = ? AND status = 'running'
+            """,
+            (self.max_attempts, retry, error, time.time(), job_id),
+        )
+        await self.conn.commit()
+
+    async def cancel(self, user_id: int) -> int:
+        cursor = await self.conn.execute(
+            """
+            UPDATE jobs SET status = 'cancelled', lease_until = NULL, updated_at = ?
+            WHERE user_id = ? AND status IN ('queued', 'running')
+            """,
+            (time.time(), user_id),
+        )
+        await self.conn.commit()
+        return cursor.rowcount
+
+    async def purge(self, older_than: float) -> int:
+        cursor = await self.conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND updated_at < ?",
+            (time.time() - older_than,),
+        )
+        await self.conn.commit()
+        return cursor.rowcount
+
+    async def stats(self) -> dict:
+        async with self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status") as cursor:
+            return {status: count for status, count in await cursor.fetchall()}
+
+
+job_queue = SQLiteJobQueue()
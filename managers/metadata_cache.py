@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from config.settings import (
+    METADATA_CACHE_MAX_ENTRIES,
+    METADATA_CACHE_MEMORY_ENTRIES,
+    METADATA_CACHE_NEGATIVE_TTL,
+    METADATA_CACHE_TTL,
+)
+from database.database_manager import database
+from models.media_models import TrackMetadata
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """
+    Two-level cache of track metadata keyed by "<service>:<track id>".
+
+    The most recently used entries are kept in memory, every entry is kept in the
+    track_metadata table so it survives restarts. Track IDs that don't resolve are cached
+    as None for the shorter negative TTL. Concurrent lookups of the same key share one
+    fetch.
+    """
+
+    # Run the eviction query once per this many stores
+    EVICT_EVERY = 500
+
+    def __init__(
+        self,
+        ttl: int = METADATA_CACHE_TTL,
+        negative_ttl: int = METADATA_CACHE_NEGATIVE_TTL,
+        max_entries: int = METADATA_CACHE_MAX_ENTRIES,
+        memory_entries: int = METADATA_CACHE_MEMORY_ENTRIES,
+    ) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # Values carry their own expiry, negative entries live shorter than the memory TTL
+        self._memory: TTLCache[str, Tuple[float, Optional[TrackMetadata]]] = TTLCache(memory_entries, ttl)
+        self._fetching: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    async def lookup(
+        self, key: str, fetch: Callable[[], Awaitable[Optional[TrackMetadata]]]
+    ) -> Optional[TrackMetadata]:
+        """
+        Returns cached metadata, fetching and storing it on a miss.
+
+        Args:
+            key (str): Service and track ID, e.g. "spotify:4uLU6hMCjMI75M1A2tKUQC".
+            fetch (Callable[[], Awaitable[Optional[TrackMetadata]]]): Fetches the metadata.
+                None means the track doesn't exist and is cached as such. Exceptions are
+                passed to the caller and nothing is cached.
+
+        Returns:
+            Optional[TrackMetadata]: Metadata, None for a track that doesn't exist.
+        """
+        found, metadata = await self._get(key)
+        if found:
+            self.hits += 1
+            return metadata
+
+        self.misses += 1
+        task = self._fetching.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetch))
+            self._fetching[key] = task
+            task.add_done_callback(lambda _task: self._fetching.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def put(self, key: str, metadata: Optional[TrackMetadata]) -> None:
+        """Stores metadata, None marks the track as not existing."""
+        ttl = self.ttl if metadata else self.negative_ttl
+        expires_at = time.time() + ttl
+        self._memory[key] = (expires_at, metadata)
+
+        await database.execute(
+            """
+            INSERT OR REPLACE INTO track_metadata
+                (track_key, found, artist, title, cover_url, duration, isrc, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                key,
+                metadata is not None,
+                metadata.artist if metadata else None,
+                metadata.title if metadata else None,
+                metadata.cover_url if metadata else None,
+                metadata.duration if metadata else None,
+                metadata.isrc if metadata else None,
+                expires_at,
+            ),
+        )
+
+        self.stores += 1
+        if self.stores % self.EVICT_EVERY == 0:
+            await self.evict()
+
+    async def warm(self, entries: Iterable[Tuple[str, TrackMetadata]]) -> None:
+        """
+        Stores metadata that came with another response, e.g. the tracks of a playlist.
+
+        Args:
+            entries (Iterable[Tuple[str, TrackMetadata]]): Keys and their metadata.
+        """
+        # Queued together so the database writer commits them in batches
+        stored = await asyncio.gather(*(self.put(key, metadata) for key, metadata in entries))
+        if stored:
+            logger.info(f"Metadata cache warmed with {len(stored)} tracks")
+
+    async def evict(self) -> None:
+        """Drop expired entries, then the ones expiring first above the size limit."""
+        removed = await database.execute(
+            "DELETE FROM track_metadata WHERE expires_at <= ?", (time.time(),)
+        )
+        removed += await database.execute(
+            """
+            DELETE FROM track_metadata WHERE track_key IN (
+                SELECT track_key FROM track_metadata
+                ORDER BY expires_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+        if removed > 0:
+            logger.info(f"Metadata cache evicted {removed} entries")
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "in_memory": len(self._memory),
+        }
+
+    async def _get(self, key: str) -> Tuple[bool, Optional[TrackMetadata]]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None and entry[0] > now:
+            return True, entry[1]
+
+        row = await database.fetchone(
+            """
+            SELECT found, artist, title, cover_url, duration, isrc, expires_at
+            FROM track_metadata WHERE track_key = ? AND expires_at > ?
+            """,
+            (key, now),
+        )
+        if not row:
+            return False, None
+
+        metadata = TrackMetadata(*row[1:6]) if row[0] else None
+        self._memory[key] = (row[6], metadata)
+        return True, metadata
+
+    async def _fetch(
+        self, key: str, fetch: Callable[[], Awaitable[Optional[TrackMetadata]]]
+    ) -> Optional[TrackMetadata]:
+        metadata = await fetch()
+        await self.put(key, metadata)
+        return metadata
+
+
+metadata_cache = MetadataCache()
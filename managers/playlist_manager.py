@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import types
+from aiogram.utils.i18n import gettext as _
+
+from config.settings import PLAYLIST_STATUS_INTERVAL, PLAYLIST_WINDOW
+from managers.cache_manager import MediaCache, media_cache
+from managers.download_manager import MediaHandler
+from managers.send_scheduler import bulk_sends
+from managers.single_flight import content_files, download_flights
+from models.media_models import MediaContent
+from utils import delete_files
+
+logger = logging.getLogger(__name__)
+
+# (content, from_cache, download_time)
+_Fetched = Tuple[List[MediaContent], bool, float]
+
+
+class PlaylistDownloader:
+    """
+    Pipelined playlist delivery.
+
+    Up to `window` tracks ahead of the one being uploaded are resolved and downloaded in
+    parallel, while tracks are still sent in playlist order. Progress is reported by
+    editing a single status message. Cancelling the task running deliver() cancels the
+    pending downloads and removes their files.
+    """
+
+    def __init__(self, service, message: types.Message, window: int = PLAYLIST_WINDOW) -> None:
+        self.service = service
+        self.message = message
+        self.window = max(1, window)
+
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self._status: Optional[types.Message] = None
+        self._status_text = ""
+        self._status_edited = 0.0
+
+    async def deliver(self, tracks: List[str]) -> None:
+        """
+        Downloads and sends every track of the playlist.
+
+        Args:
+            tracks (List[str]): Track URLs in playlist order.
+        """
+        self.total = len(tracks)
+        pending: Dict[int, asyncio.Task] = {}
+        await self._update_status(force=True)
+
+        try:
+            for index, track in enumerate(tracks):
+                for ahead in range(index, min(index + self.window, self.total)):
+                    if ahead not in pending:
+                        pending[ahead] = asyncio.create_task(self._fetch(tracks[ahead]))
+
+                task = pending.pop(index)
+                try:
+                    content, from_cache, download_time = await task
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Playlist track failed: {track}: {e}")
+                    self.failed += 1
+                    await self._update_status()
+                    continue
+
+                await self._send(track, content, from_cache, download_time)
+                await self._update_status()
+        finally:
+            await self._discard(pending)
+            await self._update_status(force=True)
+
+    async def _fetch(self, track: str) -> _Fetched:
+        cached = await media_cache.get(track)
+        if cached:
+            return cached[:1], True, 0.0
+
+        started = time.monotonic()
+        content = await download_flights.download(self.service, track)
+        if not content:
+            raise ValueError("No content found")
+        return content, False, time.monotonic() - started
+
+    async def _send(self, track: str, content: List[MediaContent], from_cache: bool, download_time: float) -> None:
+        # Only the first item is delivered, drop files of anything else
+        if len(content) > 1 and not from_cache:
+            await delete_files(content_files(content[1:]))
+
+        size = 0 if from_cache else MediaCache.content_size(content[:1])
+        await self.message.bot.send_chat_action(self.message.chat.id, "record_voice")
+        # Tracks yield to interactive replies of other users
+        with bulk_sends():
+            sent = await MediaHandler.send_audio(self.message, content[0])
+
+        if sent is None:
+            self.failed += 1
+            if from_cache:
+                await media_cache.invalidate(track)
+            return
+
+        self.sent += 1
+        if not from_cache:
+            await media_cache.set(track, None, [sent], size=size, download_time=download_time)
+
+    async def _discard(self, pending: Dict[int, asyncio.Task]) -> None:
+        """Cancels tracks that were not delivered and deletes what they already downloaded."""
+        for task in pending.values():
+            task.cancel()
+        results = await asyncio.gather(*pending.values(), return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, tuple):
+                content, from_cache, _download_time = result
+                if not from_cache:
+                    await delete_files(content_files(content))
+
+    async def _update_status(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._status_edited < PLAYLIST_STATUS_INTERVAL:
+            return
+
+        text = _("Downloading playlist ⏳\nSent: {sent}/{total}\nFailed: {failed}").format(
+            sent=self.sent, total=self.total, failed=self.failed
+        )
+        if text == self._status_text:
+            return
+
+        try:
+            if self._status is None:
+                self._status = await self.message.answer(text)
+            else:
+                await self._status.edit_text(text)
+            self._status_text = text
+            self._status_edited = now
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to update playlist status: {e}")
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendChatAction, SendMediaGroup, TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+from config.settings import (
+    SEND_BULK_RATE,
+    SEND_CHAT_BURST,
+    SEND_CHAT_RATE,
+    SEND_GLOBAL_RATE,
+    SEND_GROUP_RATE,
+    SEND_MAX_RETRIES,
+    SEND_MAX_RETRY_AFTER,
+)
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Bulk traffic (playlists, broadcasts) is marked by running it inside bulk_sends()
+_bulk: ContextVar[bool] = ContextVar("bulk_sends", default=False)
+
+
+@contextmanager
+def bulk_sends() -> Iterator[None]:
+    """Marks every Bot API call made in this context, and in tasks started from it, as bulk."""
+    token = _bulk.set(True)
+    try:
+        yield
+    finally:
+        _bulk.reset(token)
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Bot session middleware that paces every outgoing Bot API call.
+
+    Calls addressed to a chat take a token from that chat's bucket (SEND_CHAT_RATE per
+    second for private chats, SEND_GROUP_RATE for groups and channels) and from the
+    global bucket. A media group costs one token per item. Bulk calls additionally go
+    through a slower bulk bucket and wait while interactive calls are queued for a global
+    token, so replies to users overtake playlist and broadcast traffic.
+
+    A TelegramRetryAfter pauses the chat's bucket, or the bulk bucket for bulk calls, and
+    the call is retried transparently. Waits longer than SEND_MAX_RETRY_AFTER are raised.
+    Chat actions are not paced, they are cheap and losing one is harmless.
+    """
+
+    # Drop idle per-chat buckets once this many are kept
+    PRUNE_AT = 4096
+
+    def __init__(
+        self,
+        global_rate: float = SEND_GLOBAL_RATE,
+        bulk_rate: float = SEND_BULK_RATE,
+        chat_rate: float = SEND_CHAT_RATE,
+        group_rate: float = SEND_GROUP_RATE,
+        chat_burst: float = SEND_CHAT_BURST,
+        max_retries: int = SEND_MAX_RETRIES,
+        max_retry_after: float = SEND_MAX_RETRY_AFTER,
+    ) -> None:
+        self.global_bucket = TokenBucket(global_rate)
+        self.bulk_bucket = TokenBucket(bulk_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        self._interactive_waiting = 0
+        self._interactive_done = asyncio.Condition()
+
+        self.requests = 0
+        self.retries = 0
+        self.waited = 0.0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if isinstance(method, SendChatAction):
+            return await make_request(bot, method)
+
+        bulk = _bulk.get()
+        cost = len(method.media) if isinstance(method, SendMediaGroup) else 1
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            await self._acquire(chat_id, cost, bulk)
+            self.waited += time.monotonic() - started
+            self.requests += 1
+
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries or e.retry_after > self.max_retry_after:
+                    raise
+                attempt += 1
+                self.retries += 1
+                logger.warning(
+                    f"{type(method).__name__} to {chat_id} hit flood control, "
+                    f"retrying in {e.retry_after}s ({'bulk' if bulk else 'interactive'})"
+                )
+                self._pause(chat_id, e.retry_after, bulk)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "waited": self.waited,
+            "chats": len(self._chats),
+        }
+
+    async def _acquire(self, chat_id: Optional[Union[int, str]], cost: int, bulk: bool) -> None:
+        if chat_id is not None:
+            await self._chat_bucket(chat_id).acquire(cost)
+
+        if bulk:
+            await self.bulk_bucket.acquire(cost)
+            async with self._interactive_done:
+                await self._interactive_done.wait_for(lambda: self._interactive_waiting == 0)
+            await self.global_bucket.acquire(cost)
+            return
+
+        self._interactive_waiting += 1
+        try:
+            await self.global_bucket.acquire(cost)
+        finally:
+            self._interactive_waiting -= 1
+            if not self._interactive_waiting:
+                async with self._interactive_done:
+                    self._interactive_done.notify_all()
+
+    def _pause(self, chat_id: Optional[Union[int, str]], seconds: float, bulk: bool) -> None:
+        if chat_id is not None:
+            self._chat_bucket(chat_id).pause(seconds)
+        else:
+            self.global_bucket.pause(seconds)
+        if bulk:
+            self.bulk_bucket.pause(seconds)
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.PRUNE_AT:
+                for key in [key for key, other in self._chats.items() if other.idle]:
+                    del self._chats[key]
+
+            private = isinstance(chat_id, int) and chat_id > 0
+            bucket = TokenBucket(self.chat_rate if private else self.group_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+
+send_scheduler = SendScheduler()
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+from config.settings import (
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=300, connect=15, sock_read=60)
+# JSON APIs answer fast, a hung request should fail long before a media download would
+API_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+# Web pages and cover images
+PAGE_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10, sock_read=30)
+
+# Default timeout per session name, sessions that also download media use DEFAULT_TIMEOUT
+SESSION_TIMEOUTS: Dict[str, aiohttp.ClientTimeout] = {
+    "spotify_api": API_TIMEOUT,
+    "applemusic_api": API_TIMEOUT,
+    "twitter": API_TIMEOUT,
+    "spotify": PAGE_TIMEOUT,
+    "applemusic": PAGE_TIMEOUT,
+    "soundcloud": PAGE_TIMEOUT,
+    "youtube": PAGE_TIMEOUT,
+    "ytmusic": PAGE_TIMEOUT,
+}
+
+
+class SessionManager:
+    """
+    Application-scoped registry of pooled aiohttp sessions.
+
+    All sessions share one TCPConnector, so keep-alive connections and the DNS cache are
+    reused across services. Each service gets its own session carrying its default
+    headers and timeout. The registry is opened in main.main() and closed on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._defaults: Dict[str, Tuple[Optional[Dict[str, str]], Optional[aiohttp.ClientTimeout]]] = {}
+
+    async def start(self) -> None:
+        """Create the shared connector. Called once at startup."""
+        self._get_connector()
+        logger.info("HTTP session registry started")
+
+    async def close(self) -> None:
+        """Close every registered session and the shared connector."""
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
+        self._defaults.clear()
+
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+        self._connector = None
+
+        # Give SSL transports a moment to shut down cleanly
+        await asyncio.sleep(0.25)
+        logger.info("HTTP session registry closed")
+
+    def get_session(
+        self,
+        name: str = "default",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ) -> aiohttp.ClientSession:
+        """
+        Returns the pooled session registered under a name, creating it on first use.
+
+        Every caller of a name must pass the same defaults, they are only applied when the
+        session is created.
+
+        Args:
+            name (str): Usually the service name, e.g. "pinterest".
+            headers (Optional[Dict[str, str]]): Default headers.
+            timeout (Optional[aiohttp.ClientTimeout]): Default timeout, SESSION_TIMEOUTS or
+                DEFAULT_TIMEOUT when not given.
+
+        Returns:
+            aiohttp.ClientSession: Session that must not be closed by the caller.
+
+        Raises:
+            ValueError: If the name was already registered with different defaults.
+        """
+        defaults = self._defaults.setdefault(name, (headers, timeout))
+        if defaults != (headers, timeout):
+            raise ValueError(f"Session {name!r} is already registered with other default headers or timeout")
+
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=self._get_connector(),
+                connector_owner=False,
+                headers=headers,
+                timeout=timeout or SESSION_TIMEOUTS.get(name, DEFAULT_TIMEOUT),
+            )
+            self._sessions[name] = session
+        return session
+
+    def _get_connector(self) -> aiohttp.TCPConnector:
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                use_dns_cache=True,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True,
+            )
+        return self._connector
+
+
+session_manager = SessionManager()
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import partial
+from typing import Dict, List, Optional
+
+from managers.artwork_cache import artwork_cache
+from managers.cache_manager import MediaCache
+from models.media_models import MediaContent
+from utils.delete_files import delete_files, share_files
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+def content_files(content: List[MediaContent]) -> List[str]:
+    """Files on disk that senders of the content delete after uploading."""
+    files = []
+    for item in content:
+        for path in (item.path, item.cover):
+            if path and not artwork_cache.owns(path):
+                files.append(str(path))
+    return files
+
+
+class DownloadFlights:
+    """
+    Single-flight layer in front of BaseService.download.
+
+    Concurrent requests for the same canonical URL and format await one shared download
+    instead of starting their own, so yt-dlp never writes the same output path twice.
+    The downloaded files are shared with every waiter via share_files, so delete_files
+    only removes them after the last sender has uploaded.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def download(self, service, url: str, format_choice: Optional[str] = None) -> List[MediaContent]:
+        """
+        Downloads the URL, joining an identical download that is already in flight.
+
+        Args:
+            service (BaseService): Service handling the URL.
+            url (str): Media URL.
+            format_choice (Optional[str]): "video"/"audio" for YouTube, None otherwise.
+
+        Returns:
+            List[MediaContent]: Downloaded content, shared with the other waiters.
+        """
+        key = MediaCache.make_key(url, format_choice)
+        flight = self._flights.get(key)
+
+        if flight is None:
+            coro = service.download(url, format_choice) if format_choice else service.download(url)
+            flight = _Flight(task=asyncio.create_task(coro))
+            self._flights[key] = flight
+            flight.task.add_done_callback(partial(self._finish, key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info(f"Joined in-flight download: {key}")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                flight.waiters -= 1
+                if flight.waiters == 0:
+                    flight.task.cancel()
+            elif not flight.task.cancelled() and flight.task.exception() is None:
+                # Our share of the files was already counted, give it back
+                await delete_files(content_files(flight.task.result()))
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+    def _finish(self, key: str, flight: _Flight, task: asyncio.Task) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        share_files(content_files(task.result()), flight.waiters)
+
+
+download_flights = DownloadFlights()
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import signal
+from typing import Any, Dict, Iterable, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config.settings import (
+    WEBHOOK_CONCURRENCY,
+    WEBHOOK_DRAIN_TIMEOUT,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+from managers.download_manager import running_tasks
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookRequestHandler(SimpleRequestHandler):
+    """
+    Webhook endpoint that answers Telegram at once and handles updates in the background.
+
+    At most `concurrency` updates are processed at the same time, the rest wait for a
+    slot inside their task. While draining, new deliveries are refused with 503 so
+    Telegram keeps them and redelivers them to the next instance, and the downloads that
+    handlers started in the background get the rest of the drain timeout to finish.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, concurrency: int = WEBHOOK_CONCURRENCY, **kwargs: Any) -> None:
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._in_flight: Set[asyncio.Task] = set()
+        self.draining = False
+        self.received = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.draining:
+            return web.Response(status=503, text="Draining")
+        self.received += 1
+        return await super().handle(request)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        task = asyncio.current_task()
+        self._in_flight.add(task)
+        try:
+            async with self._slots:
+                await super()._background_feed_update(bot, update)
+        finally:
+            self._in_flight.discard(task)
+
+    async def health(self, request: web.Request) -> web.Response:
+        """GET /health: 200 while serving, 503 while draining."""
+        return web.json_response(
+            {
+                "status": "draining" if self.draining else "ok",
+                "in_flight": len(self._in_flight),
+                "received": self.received,
+            },
+            status=503 if self.draining else 200,
+        )
+
+    async def drain(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT, downloads: Iterable[asyncio.Task] = ()) -> None:
+        """
+        Stops accepting updates and waits for the ones in progress to finish.
+
+        Args:
+            timeout (float): Seconds to wait for updates and downloads together.
+            downloads (Iterable[asyncio.Task]): Live collection of download tasks that
+                handlers started in the background, read once the updates are done.
+        """
+        self.draining = True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Updates first, they may still start downloads
+        await self._wait_for(set(self._in_flight), timeout, "updates")
+        await self._wait_for(set(downloads), max(0.0, deadline - loop.time()), "downloads")
+
+    @staticmethod
+    async def _wait_for(tasks: Set[asyncio.Task], timeout: float, what: str) -> None:
+        tasks = {task for task in tasks if not task.done()}
+        if not tasks:
+            return
+
+        logger.info(f"Draining {len(tasks)} {what} in progress")
+        _done, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} {what} still running after the drain timeout, cancelling")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot) -> None:
+    """
+    Serves updates over a webhook until SIGINT or SIGTERM, then drains updates and
+    running downloads and returns.
+
+    Dispatcher startup and shutdown hooks run with the aiohttp application. The webhook is
+    left registered on shutdown and pending updates are kept on startup, so nothing sent
+    during a restart is lost.
+
+    Args:
+        dispatcher (Dispatcher): Dispatcher with all routers and middlewares.
+        bot (Bot): Bot the webhook is registered for.
+    """
+    handler = WebhookRequestHandler(dispatcher, bot, secret_token=WEBHOOK_SECRET or None)
+
+    app = web.Application()
+    # Routed directly instead of handler.register(), which would close the bot session
+    # before the dispatcher shutdown hooks had a chance to use it
+    app.router.add_post(WEBHOOK_PATH, handler.handle)
+    app.router.add_get("/health", handler.health)
+    setup_application(app, dispatcher, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    await site.start()
+
+    await bot.set_webhook(
+        url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET or None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+    )
+    logger.info(f"Serving webhook {WEBHOOK_PATH} on {WEBHOOK_HOST}:{WEBHOOK_PORT}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows, KeyboardInterrupt still stops the loop
+            pass
+
+    try:
+        await stop.wait()
+        logger.info("Stopping webhook server...")
+    finally:
+        await handler.drain(downloads=running_tasks)
+        await runner.cleanup()
+        await bot.session.close()
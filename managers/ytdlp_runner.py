@@ -0,0 +1,265 @@
+import asyncio
+import glob
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Iterator, Optional, Set
+
+from config.settings import YTDLP_PROCESS_MAX_TASKS, YTDLP_PROCESS_WORKERS
+from managers.download_scheduler import download_executor
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between checks of the cancel token while ffmpeg runs without progress hooks
+CANCEL_POLL_INTERVAL = 0.5
+
+
+class CancelToken:
+    """
+    Cancel flag shared between the event loop and a running job.
+
+    In threads an Event is enough. Jobs in worker processes receive a pickled copy, so the
+    flag is also mirrored into a marker file that the worker can see.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._event = threading.Event()
+
+    def set(self) -> None:
+        self._event.set()
+        if self.path:
+            open(self.path, "w").close()
+
+    def is_set(self) -> bool:
+        return self._event.is_set() or (self.path is not None and os.path.exists(self.path))
+
+    def discard(self) -> None:
+        if self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict) -> None:
+        self.path = state["path"]
+        self._event = threading.Event()
+
+
+@contextmanager
+def cancellable(options: dict, cancel_token: Optional[CancelToken]) -> Iterator[dict]:
+    """
+    Yields YoutubeDL options with hooks that abort the job once the token is set.
+
+    The hooks raise DownloadCancelled at the next progress update and remember every file
+    the job touched. A watcher thread kills this process' ffmpeg children working on those
+    files, since no hooks fire while they run. If the job fails or is cancelled, its
+    partial files are removed.
+    """
+    from yt_dlp.utils import DownloadCancelled
+
+    seen: Set[str] = set()
+
+    def hook(status: dict) -> None:
+        for key in ("filename", "tmpfilename"):
+            if status.get(key):
+                seen.add(status[key])
+        info = status.get("info_dict") or {}
+        if info.get("filepath"):
+            seen.add(info["filepath"])
+        if cancel_token is not None and cancel_token.is_set():
+            raise DownloadCancelled()
+
+    options = dict(options)
+    options["progress_hooks"] = [*options.get("progress_hooks", []), hook]
+    options["postprocessor_hooks"] = [*options.get("postprocessor_hooks", []), hook]
+
+    finished = threading.Event()
+    if cancel_token is not None:
+        threading.Thread(
+            target=_watch, args=(cancel_token, seen, finished), name="ytdlp-cancel", daemon=True
+        ).start()
+
+    try:
+        yield options
+    except BaseException:
+        _remove_partials(seen)
+        raise
+    finally:
+        finished.set()
+
+
+def extract_job(
+    options: dict, url: str, download: bool = True, cancel_token: Optional[CancelToken] = None
+) -> Optional[dict]:
+    """
+    Runs yt-dlp extract_info in whichever thread or process executes the job.
+
+    Module-level and side-effect free so it can be pickled into worker processes.
+    yt_dlp is imported here to keep this module cheap to import in the bot process.
+
+    Args:
+        options (dict): YoutubeDL options, must be picklable.
+        url (str): Media URL.
+        download (bool): Download the media too, not only extract the info.
+        cancel_token (Optional[CancelToken]): Aborts the download once set.
+
+    Returns:
+        Optional[dict]: Sanitized info with the downloaded file under "filepath", or None.
+    """
+    import yt_dlp
+
+    with cancellable(options, cancel_token) as options, yt_dlp.YoutubeDL(options) as ydl:
+        try:
+            info = ydl.extract_info(url, download=download)
+        except yt_dlp.utils.DownloadError as e:
+            # The original carries a traceback and can't travel back from a worker process
+            raise yt_dlp.utils.DownloadError(str(e)) from None
+        if not info:
+            return None
+        return with_filepath(ydl, info)
+
+
+def with_filepath(ydl, info: dict) -> dict:
+    """Sanitized copy of an info dict with the output file under "filepath"."""
+    requested_downloads = info.get("requested_downloads") or [{}]
+    filepath = requested_downloads[0].get("filepath") or ydl.prepare_filename(info)
+    info = ydl.sanitize_info(info)
+    info["filepath"] = filepath
+    return info
+
+
+class YtDlpRunner:
+    """
+    Executes yt-dlp and post-processing jobs off the event loop.
+
+    By default jobs run in the shared download thread pool. With YTDLP_PROCESS_WORKERS > 0
+    they run in a pool of spawned worker processes instead, so extraction does not
+    compete with the event loop for the GIL. Workers are replaced after
+    YTDLP_PROCESS_MAX_TASKS jobs to contain memory growth. Jobs and their arguments must
+    be picklable: module-level functions taking and returning plain data.
+    """
+
+    def __init__(self, workers: int = YTDLP_PROCESS_WORKERS, max_tasks_per_child: int = YTDLP_PROCESS_MAX_TASKS) -> None:
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.workers > 0
+
+    async def run(self, job: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs a job in the configured executor and returns its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(), partial(job, *args, **kwargs))
+
+    async def run_cancellable(self, job: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs a job that accepts a cancel_token keyword and stops it when the caller is cancelled.
+
+        A job still waiting for an executor slot is dropped. A running one stops at its next
+        hook, and the caller waits for it so its partial files are removed before the
+        cancellation goes on.
+        """
+        token = CancelToken(self._marker_path() if self.uses_processes else None)
+        future = self._executor().submit(partial(job, *args, cancel_token=token, **kwargs))
+        future.add_done_callback(lambda _: token.discard())
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not future.cancel():
+                token.set()
+                if future.done():
+                    token.discard()
+                await asyncio.gather(asyncio.wrap_future(future), return_exceptions=True)
+            raise
+
+    async def extract(self, options: dict, url: str, download: bool = True) -> Optional[dict]:
+        """Runs extract_job, see its docstring."""
+        return await self.run_cancellable(extract_job, options, url, download)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _executor(self) -> Executor:
+        if not self.uses_processes:
+            return download_executor
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child or None,
+            )
+            logger.info(f"Started {self.workers} yt-dlp worker processes")
+        return self._pool
+
+    @staticmethod
+    def _marker_path() -> str:
+        return os.path.join(tempfile.gettempdir(), f"ytdlp-cancel-{uuid.uuid4().hex}")
+
+
+def _watch(cancel_token: CancelToken, seen: Set[str], finished: threading.Event) -> None:
+    while not finished.wait(CANCEL_POLL_INTERVAL):
+        if cancel_token.is_set():
+            _kill_ffmpeg(seen)
+            return
+
+
+def _kill_ffmpeg(paths: Set[str]) -> None:
+    """Kills ffmpeg processes started by this process that work on one of the paths."""
+    own_pid = str(os.getpid())
+    try:
+        pids = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except FileNotFoundError:
+        return
+
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                parent = f.read().rsplit(")", 1)[1].split()[1]
+            if parent != own_pid:
+                continue
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                args = f.read().decode(errors="replace").split("\0")
+        except (OSError, IndexError):
+            continue
+
+        if not os.path.basename(args[0]).startswith("ff"):
+            continue
+        if any(path in arg for arg in args for path in list(paths)):
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+                logger.info(f"Killed {args[0]} ({pid}) of a cancelled download")
+            except ProcessLookupError:
+                pass
+
+
+def _remove_partials(paths: Set[str]) -> None:
+    for path in list(paths):
+        stem, extension = os.path.splitext(path)
+        candidates = [path, f"{path}.part", f"{path}.ytdl", f"{stem}.temp{extension}"]
+        candidates += glob.glob(f"{glob.escape(path)}.part-Frag*")
+        for candidate in candidates:
+            try:
+                os.remove(candidate)
+                logger.info(f"Removed partial file {candidate}")
+            except (FileNotFoundError, IsADirectoryError):
+                pass
+
+
+ytdlp_runner = YtDlpRunner()
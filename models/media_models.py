@@ -9,11 +9,12 @@ class MediaType(Enum):
     PHOTO = "photo"
     AUDIO = "audio"
     GIF = "gif"
+    DOCUMENT = "document"
 
 @dataclass
 class MediaContent():
     type: MediaType
-    path: Path
+    path: Optional[Path] = None
     width: Optional[int] = None
     height: Optional[int] = None
     duration: Optional[int] = None
@@ -21,3 +22,22 @@ class MediaContent():
     cover: Optional[Path] = None
     performer: Optional[str] = None
     original_size: Optional[bool] = None
+    file_id: Optional[str] = None  # Telegram file_id of an already uploaded copy
+
+
+@dataclass
+class TrackMetadata():
+    artist: str
+    title: str
+    cover_url: Optional[str] = None
+    duration: Optional[float] = None  # Seconds
+    isrc: Optional[str] = None
+
+
+@dataclass
+class MusicMatch():
+    url: str  # YouTube Music watch URL
+    confidence: float  # 0..1, how sure the matcher is that this is the requested track
+    title: str
+    artist: str
+    duration: Optional[float] = None
@@ -1,66 +1,55 @@
-import asyncio
 import json
 import logging
 import os
 import re
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 
-import aiofiles
 import aiohttp
-import yt_dlp
 from aiofiles import os as aios
 from bs4 import BeautifulSoup
 from yt_dlp.utils import sanitize_filename
 
 from config.secrets import APPLEMUSIC_DEV_TOKEN
+from managers.metadata_cache import metadata_cache
+from managers.artwork_cache import artwork_cache
+from managers.session_manager import session_manager
+from managers.ytdlp_runner import ytdlp_runner
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
-from utils import (
-    get_applemusic_author,
-    random_cookie_file,
-    search_music,
-    update_metadata,
-)
+from services.manifest import APPLE_MUSIC
+from utils import random_cookie_file
+from utils.audio_pipeline import audio_postprocessors, finalize_audio, preferred_audio_format
 from utils.error_handler import BotError, ErrorCode
+from utils.get_applemusic_author import (
+    APPLEMUSIC_API_HEADERS,
+    applemusic_track_metadata,
+    get_applemusic_metadata,
+)
+from utils.music_search_engine import require_match
 
 logger = logging.getLogger(__name__)
 
 
 class AppleMusicService(BaseService):
     name = "AppleMusic"
-    _download_executor = ThreadPoolExecutor(max_workers=10)
+    hosts = APPLE_MUSIC.hosts
+    url_pattern = APPLE_MUSIC.url_pattern
 
     def __init__(self, output_path: str = "other/downloadsTemp") -> None:
         super().__init__()
         self.output_path = output_path
         os.makedirs(self.output_path, exist_ok=True)
-        self.api_headers = {
-            'accept': '*/*',
-            'authorization': f'Bearer {APPLEMUSIC_DEV_TOKEN}',
-            'origin': 'https://music.apple.com',
-            'referer': 'https://music.apple.com/',
-        }
+        self.api_headers = APPLEMUSIC_API_HEADERS
 
     def _get_audio_options(self):
         return {
-            "format": "bestaudio",
+            "format": preferred_audio_format(),
             "outtmpl": f"{self.output_path}/{sanitize_filename('%(title)s')}",
             "cookiefile": random_cookie_file(),
-            "postprocessors": [
-                {
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                },
-            ],
+            "postprocessors": audio_postprocessors(),
         }
 
-    def is_supported(self, url: str) -> bool:
-        return bool(
-            re.match(r"https:\/\/music\.apple\.com\/[\w]{2}\/(song\/([\w-]+)\/(\d+)|album\/([^\/]+)\/(\d+)(\?i=(\d+))?|playlist\/([\w-]+)\/([\w.-]+))", url)
-        )
-
     def is_playlist(self, url: str) -> bool:
         return bool(
             re.match(r"https:\/\/music\.apple\.com\/[\w]{2}\/playlist\/([\w-]+)\/([\w.-]+)", url)
@@ -68,9 +57,9 @@ class AppleMusicService(BaseService):
     async def download(self, url: str) -> List[MediaContent]:
         options = self._get_audio_options()
         try:
-            permofer, title, cover_url = await get_applemusic_author(url)
+            metadata = await get_applemusic_metadata(url)
 
-            if not permofer or not title:
+            if metadata is None or not metadata.artist or not metadata.title:
                 raise BotError(
                     code=ErrorCode.INTERNAL_ERROR,
                     message="Failed to get artist and title from Apple Music",
@@ -78,84 +67,56 @@ class AppleMusicService(BaseService):
                     critical=True,
                     is_logged=True
                 )
+            permofer, title, cover_url = metadata.artist, metadata.title, metadata.cover_url
 
-            video_link = await search_music(permofer, title)
-
-            with yt_dlp.YoutubeDL(options) as ydl:
-                loop = asyncio.get_event_loop()
+            match = await require_match(metadata, url)
 
-                info_dict = await loop.run_in_executor(
-                    self._download_executor,
-                    lambda: ydl.extract_info(video_link, download=False)
-                )
-                if not info_dict:
-                    raise BotError(
-                        code=ErrorCode.DOWNLOAD_FAILED,
-                        message="Failed to extract info from Apple Music",
-                        url=url,
-                        critical=False,
-                        is_logged=True,
-                    )
-
-                await loop.run_in_executor(
-                    self._download_executor,
-                    lambda: ydl.download([video_link])
+            info_dict = await ytdlp_runner.extract(options, match.url)
+            if not info_dict:
+                raise BotError(
+                    code=ErrorCode.DOWNLOAD_FAILED,
+                    message="Failed to extract info from Apple Music",
+                    url=url,
+                    critical=False,
+                    is_logged=True,
                 )
 
-                base_path = os.path.join(
-                    self.output_path,
-                    f"{sanitize_filename(info_dict['title'])}"
-                )
+            base_path = os.path.join(
+                self.output_path,
+                f"{sanitize_filename(info_dict['title'])}"
+            )
+            if cover_url is None:
+                cover_url = info_dict.get("thumbnail", None)
+
+            artwork = None
+            if cover_url:
+                artwork = await artwork_cache.fetch(cover_url, session_manager.get_session("applemusic"))
+
+            audio_path = await ytdlp_runner.run(
+                finalize_audio,
+                info_dict,
+                base_path,
+                title=title,
+                artist=permofer,
+                cover_file=str(artwork.embed) if artwork else None
+            )
 
-                audio_path = f"{base_path}.mp3"
-                cover_path = f"{base_path}.jpg"
-
-
-                if cover_url is None:
-                    cover_url = info_dict.get("thumbnail", None)
-
-                if cover_url:
-                    try:
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(cover_url) as response:
-                                response.raise_for_status()
-                                cover_path = f"{base_path}.jpg"
-                                async with aiofiles.open(cover_path, 'wb') as f:
-                                    async for chunk in response.content.iter_chunked(1024):
-                                        await f.write(chunk)
-
-                        if not await aios.path.exists(cover_path):
-                            cover_path = None
-
-                    except Exception:
-                        cover_path = None
-
-                await loop.run_in_executor(
-                    self._download_executor,
-                    lambda: update_metadata(
-                        audio_path,
-                        title=title,
-                        artist=permofer,
-                        cover_file=cover_path
-                    )
+            if await aios.path.exists(audio_path):
+                return [MediaContent(
+                    type=MediaType.AUDIO,
+                    path=Path(audio_path),
+                    duration=info_dict.get("duration", None),
+                    title=title,
+                    performer=permofer,
+                    cover=artwork.thumbnail if artwork else None
+                )]
+            else:
+                raise BotError(
+                    code=ErrorCode.DOWNLOAD_FAILED,
+                    message="Audio file not found after download",
+                    url=url,
+                    is_logged=True
                 )
-
-                if await aios.path.exists(audio_path):
-                    return [MediaContent(
-                        type=MediaType.AUDIO,
-                        path=Path(audio_path),
-                        duration=info_dict.get("duration", None),
-                        title=title,
-                        performer=permofer,
-                        cover=Path(cover_path) if cover_path else None
-                    )]
-                else:
-                    raise BotError(
-                        code=ErrorCode.DOWNLOAD_FAILED,
-                        message="Audio file not found after download",
-                        url=url,
-                        is_logged=True
-                    )
         except BotError as e:
             raise e
         except Exception as e:
@@ -186,36 +147,42 @@ class AppleMusicService(BaseService):
             logger.info(f"Attempting to fetch playlist {playlist_id} using Apple Music API.")
             try:
                 params = {
-                    'fields[songs]': 'name,artistName,artwork,url',
+                    'fields[songs]': 'name,artistName,artwork,url,durationInMillis,isrc',
                 }
                 api_url = f'https://amp-api.music.apple.com/v1/catalog/tr/playlists/{playlist_id}'
 
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(api_url, headers=self.api_headers, params=params) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            if (data and 'data' in data and len(data['data']) > 0 and
-                                    'relationships' in data['data'][0] and
-                                    'tracks' in data['data'][0]['relationships'] and
-                                    'data' in data['data'][0]['relationships']['tracks']):
-
-                                track_urls: list[str] = []
-                                tracks_data = data['data'][0]['relationships']['tracks']['data']
-                                for track in tracks_data:
-                                    if "attributes" in track and "url" in track["attributes"]:
-                                        track_urls.append(track["attributes"]["url"])
-                                    else:
-                                        logger.warning(f"Skipping track in API response due to missing attributes/url: {track}")
-
-                                if track_urls:
-                                    logger.info(f"Successfully fetched {len(track_urls)} tracks from API for playlist {playlist_id}.")
-                                    return track_urls
+                session = session_manager.get_session("applemusic_api", headers=self.api_headers)
+                async with session.get(api_url, params=params) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        if (data and 'data' in data and len(data['data']) > 0 and
+                                'relationships' in data['data'][0] and
+                                'tracks' in data['data'][0]['relationships'] and
+                                'data' in data['data'][0]['relationships']['tracks']):
+
+                            track_urls: list[str] = []
+                            warm = []
+                            tracks_data = data['data'][0]['relationships']['tracks']['data']
+                            for track in tracks_data:
+                                if "attributes" in track and "url" in track["attributes"]:
+                                    track_urls.append(track["attributes"]["url"])
+                                    metadata = applemusic_track_metadata(track["attributes"])
+                                    if metadata and track.get("id"):
+                                        warm.append((f"applemusic:{track['id']}", metadata))
                                 else:
-                                    logger.warning(f"API returned no tracks or invalid track data for playlist {playlist_id}. Falling back to HTML parsing.")
+                                    logger.warning(f"Skipping track in API response due to missing attributes/url: {track}")
+
+                            # The response already holds every track's metadata, spare a lookup per track
+                            await metadata_cache.warm(warm)
+                            if track_urls:
+                                logger.info(f"Successfully fetched {len(track_urls)} tracks from API for playlist {playlist_id}.")
+                                return track_urls
                             else:
-                                logger.warning(f"Unexpected API response structure for playlist {playlist_id}. Falling back to HTML parsing.")
+                                logger.warning(f"API returned no tracks or invalid track data for playlist {playlist_id}. Falling back to HTML parsing.")
                         else:
-                            logger.error(f"API request failed with status {response.status} for playlist {playlist_id}. Falling back to HTML parsing.")
+                            logger.warning(f"Unexpected API response structure for playlist {playlist_id}. Falling back to HTML parsing.")
+                    else:
+                        logger.error(f"API request failed with status {response.status} for playlist {playlist_id}. Falling back to HTML parsing.")
 
             except aiohttp.ClientError as e:
                 logger.error(f"Apple Music API request error for playlist {playlist_id}: {e}. Falling back to HTML parsing.")
@@ -227,56 +194,56 @@ class AppleMusicService(BaseService):
         # --- Fallback to HTML parsing ---
         logger.info(f"Falling back to HTML parsing for playlist {playlist_id}.")
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-
-                    soup = BeautifulSoup(await response.text(), 'html.parser')
-
-                    script_tag = soup.find('script', {'id': 'serialized-server-data'})
-                    if not script_tag or not script_tag.string:
-                        logger.error(f"Could not find JSON in page for playlist {playlist_id} (serialized-server-data script tag missing or empty).")
-                        return []
-
-                    json_data = json.loads(script_tag.string)
-
-                    track_urls: list[str] = []
-
-                    sections = json_data[0].get('data', {}).get('sections', [])
-                    for section in sections:
-                        if "track-list" in section.get("id", ""):
-                            tracks = section.get('items', [])
-                            for track in tracks:
-                                try:
-                                    track_id_raw = track.get("id")
-                                    numerical_track_id = None
-
-                                    if isinstance(track_id_raw, str):
-                                        id_match = re.search(r'(\d+)$', track_id_raw)
-                                        if id_match:
-                                            numerical_track_id = id_match.group(1)
-                                        else:
-                                            if track_id_raw.isdigit():
-                                                numerical_track_id = track_id_raw
-                                    elif isinstance(track_id_raw, (int, float)):
-                                        numerical_track_id = str(int(track_id_raw))
-
-                                    if numerical_track_id:
-                                        track_urls.append("https://music.apple.com/pl/song/"+numerical_track_id)
+            session = session_manager.get_session("applemusic")
+            async with session.get(url) as response:
+                response.raise_for_status()
+
+                soup = BeautifulSoup(await response.text(), 'html.parser')
+
+                script_tag = soup.find('script', {'id': 'serialized-server-data'})
+                if not script_tag or not script_tag.string:
+                    logger.error(f"Could not find JSON in page for playlist {playlist_id} (serialized-server-data script tag missing or empty).")
+                    return []
+
+                json_data = json.loads(script_tag.string)
+
+                track_urls: list[str] = []
+
+                sections = json_data[0].get('data', {}).get('sections', [])
+                for section in sections:
+                    if "track-list" in section.get("id", ""):
+                        tracks = section.get('items', [])
+                        for track in tracks:
+                            try:
+                                track_id_raw = track.get("id")
+                                numerical_track_id = None
+
+                                if isinstance(track_id_raw, str):
+                                    id_match = re.search(r'(\d+)$', track_id_raw)
+                                    if id_match:
+                                        numerical_track_id = id_match.group(1)
                                     else:
-                                        logger.warning(f"Could not extract numerical track ID for: {track}")
+                                        if track_id_raw.isdigit():
+                                            numerical_track_id = track_id_raw
+                                elif isinstance(track_id_raw, (int, float)):
+                                    numerical_track_id = str(int(track_id_raw))
+
+                                if numerical_track_id:
+                                    track_urls.append("https://music.apple.com/pl/song/"+numerical_track_id)
+                                else:
+                                    logger.warning(f"Could not extract numerical track ID for: {track}")
 
-                                except (KeyError, IndexError) as e:
-                                    logger.warning(f"Failed to extract URL for track from HTML (KeyError/IndexError): {track}. Error: {e}")
-                                except Exception as e:
-                                    logger.warning(f"An unexpected error occurred during HTML track extraction: {track}. Error: {e}")
-                            break
+                            except (KeyError, IndexError) as e:
+                                logger.warning(f"Failed to extract URL for track from HTML (KeyError/IndexError): {track}. Error: {e}")
+                            except Exception as e:
+                                logger.warning(f"An unexpected error occurred during HTML track extraction: {track}. Error: {e}")
+                        break
 
-                    if not track_urls:
-                        logger.warning(f"No tracks found after HTML parsing for playlist {playlist_id}.")
-                    else:
-                        logger.info(f"Successfully parsed {len(track_urls)} tracks from HTML for playlist {playlist_id}.")
-                    return track_urls
+                if not track_urls:
+                    logger.warning(f"No tracks found after HTML parsing for playlist {playlist_id}.")
+                else:
+                    logger.info(f"Successfully parsed {len(track_urls)} tracks from HTML for playlist {playlist_id}.")
+                return track_urls
 
         except aiohttp.ClientError as e:
             logger.error(f"Failed to fetch playlist HTML: {e}")
@@ -1,10 +1,15 @@
+import re
 from abc import ABC, abstractmethod
+from typing import Optional, Tuple
 
 
 class BaseService(ABC):
-    @abstractmethod
+    # Hostnames without "www."/"m." prefixes, used by the URL router index
+    hosts: Tuple[str, ...] = ()
+    url_pattern: Optional[re.Pattern] = None
+
     def is_supported(self, url: str) -> bool:
-        pass
+        return bool(self.url_pattern and self.url_pattern.match(url))
 
     @abstractmethod
     def is_playlist(self, url: str) -> bool:
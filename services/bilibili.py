@@ -1,15 +1,15 @@
 import logging
 import os
-import re
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 
 from aiofiles import os as aios
 from bilix.sites.bilibili import DownloaderBilibili
 
+from managers.download_scheduler import download_executor
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
+from services.manifest import BILIBILI
 from utils.error_handler import BotError, ErrorCode
 
 logger = logging.getLogger(__name__)
@@ -17,16 +17,15 @@ logger = logging.getLogger(__name__)
 
 class BiliBiliService(BaseService):
     name = "BiliBili"
-    _download_executor = ThreadPoolExecutor(max_workers=10)
+    hosts = BILIBILI.hosts
+    url_pattern = BILIBILI.url_pattern
+    _download_executor = download_executor
 
     def __init__(self, output_path: str = "other/downloadsTemp") -> None:
         super().__init__()
         self.output_path = output_path
         os.makedirs(self.output_path, exist_ok=True)
 
-    def is_supported(self, url: str) -> bool:
-        return bool(re.match(r"https?://(?:www\.)?bilibili\.(?:com|tv)/[\w/?=&]+", url))
-
     def is_playlist(self, url: str) -> bool:
         return False
 
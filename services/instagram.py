@@ -2,26 +2,29 @@ import asyncio
 import logging
 import os
 import re
-from functools import partial
 from pathlib import Path
 from typing import List, Tuple
 import instaloader
-from concurrent.futures import ThreadPoolExecutor
 
-import aiofiles
-import aiohttp
 import yt_dlp
 
+from managers.download_scheduler import download_executor
+from managers.session_manager import session_manager
+from managers.ytdlp_runner import ytdlp_runner
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
+from services.manifest import INSTAGRAM
 from utils.error_handler import BotError, ErrorCode
+from utils.file_downloader import download_file
 
 logger = logging.getLogger(__name__)
 
 
 class InstagramService(BaseService):
     name = "Instagram"
-    _download_executor = ThreadPoolExecutor(max_workers=5)
+    hosts = INSTAGRAM.hosts
+    url_pattern = INSTAGRAM.url_pattern
+    _download_executor = download_executor
 
     def __init__(self, output_path: str = "other/downloadsTemp"):
         self.output_path = output_path
@@ -31,14 +34,6 @@ class InstagramService(BaseService):
             "quiet": True,
         }
 
-    def is_supported(self, url: str) -> bool:
-        return bool(
-            re.match(
-                r"https://www\.instagram\.com/(?:p|reel|tv|stories)/([A-Za-z0-9_-]+)/",
-                url,
-            )
-        )
-
     def is_playlist(self, url: str) -> bool:
         return False
 
@@ -47,31 +42,22 @@ class InstagramService(BaseService):
 
         try:
             if re.match(r'https://www\.instagram\.com/reel/([A-Za-z0-9_-]+)', url):
-                with yt_dlp.YoutubeDL(self.yt_dlp_opts) as ydl:
-                    loop = asyncio.get_event_loop()
-                    info_dict = await loop.run_in_executor(
-                        self._download_executor,
-                        lambda: ydl.extract_info(url, download=False)
+                info_dict = await ytdlp_runner.extract(self.yt_dlp_opts, url)
+                if not info_dict:
+                    raise BotError(
+                        code=ErrorCode.DOWNLOAD_FAILED,
+                        message="Failed to get video info",
+                        url=url,
+                        critical=False,
+                        is_logged=True,
                     )
-                    if not info_dict:
-                        raise BotError(
-                            code=ErrorCode.DOWNLOAD_FAILED,
-                            message="Failed to get video info",
-                            url=url,
-                            critical=False,
-                            is_logged=True,
-                        )
-                    await loop.run_in_executor(
-                        self._download_executor,
-                        lambda: ydl.download([url])
+                result.append(
+                    MediaContent(
+                        type=MediaType.VIDEO,
+                        path=Path(info_dict["filepath"]),
                     )
-                    result.append(
-                        MediaContent(
-                            type=MediaType.VIDEO,
-                            path=Path(ydl.prepare_filename(info_dict)),
-                        )
-                    )
-                    return result
+                )
+                return result
 
             media_urls, filenames = await self._get_instagram_post(url)
 
@@ -168,26 +154,10 @@ class InstagramService(BaseService):
                 is_logged=True,
             )
 
-async def run_in_thread(func, *args):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, partial(func, *args))
-
-
 async def download_media(session, url, filename) -> str:
     try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                async with aiofiles.open(filename, "wb") as f:
-                    await f.write(await response.read())
-                return filename
-            else:
-                raise BotError(
-                    code=ErrorCode.INTERNAL_ERROR,
-                    message=f"Failed to download Instagram media: {response.status}",
-                    url=url,
-                    critical=False,
-                    is_logged=True,
-                )
+        await download_file(session, url, filename)
+        return filename
     except BotError as e:
         raise e
     except Exception as e:
@@ -201,30 +171,26 @@ async def download_media(session, url, filename) -> str:
 
 
 async def download_all_media(media_urls, filenames):
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for url, name in zip(media_urls, filenames):
-            if name.endswith(".mp4"):
-                tasks.append(download_video_with_ytdlp(url, name))
-            else:
-                tasks.append(download_media(session, url, name))
-        results = await asyncio.gather(*tasks)
-        return results
+    session = session_manager.get_session("instagram")
+    tasks = []
+    for url, name in zip(media_urls, filenames):
+        if name.endswith(".mp4"):
+            tasks.append(download_video_with_ytdlp(url, name))
+        else:
+            tasks.append(download_media(session, url, name))
+    results = await asyncio.gather(*tasks)
+    return results
 
 async def download_video_with_ytdlp(url: str, filename: str) -> str:
     try:
-        def _download():
-            ydl_opts = {
-                'outtmpl': "other/downloadsTemp/%(id)s.%(ext)s",
-                'quiet': True,
-                'format': 'mp4',
-                'merge_output_format': 'mp4',
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                return ydl.prepare_filename(info)
-
-        downloaded_path = await run_in_thread(_download)
+        ydl_opts = {
+            'outtmpl': "other/downloadsTemp/%(id)s.%(ext)s",
+            'quiet': True,
+            'format': 'mp4',
+            'merge_output_format': 'mp4',
+        }
+        info = await ytdlp_runner.extract(ydl_opts, url)
+        downloaded_path = info["filepath"]
 
         final_path = os.path.join("other/downloadsTemp", filename)
         os.rename(downloaded_path, final_path)
@@ -0,0 +1,130 @@
+import re
+from dataclasses import dataclass
+from typing import Tuple
+
+
+@dataclass(frozen=True)
+class ServiceSpec:
+    """
+    Lightweight description of a service, enough to route URLs without importing it.
+
+    The module is imported and the class instantiated on the first matching request.
+    """
+
+    name: str
+    module: str
+    class_name: str
+    hosts: Tuple[str, ...]
+    url_pattern: re.Pattern
+
+
+APPLE_MUSIC = ServiceSpec(
+    name="AppleMusic",
+    module="services.apple_music",
+    class_name="AppleMusicService",
+    hosts=("music.apple.com",),
+    url_pattern=re.compile(r"https:\/\/music\.apple\.com\/[\w]{2}\/(song\/([\w-]+)\/(\d+)|album\/([^\/]+)\/(\d+)(\?i=(\d+))?|playlist\/([\w-]+)\/([\w.-]+))"),
+)
+
+BILIBILI = ServiceSpec(
+    name="BiliBili",
+    module="services.bilibili",
+    class_name="BiliBiliService",
+    hosts=("bilibili.com", "bilibili.tv"),
+    url_pattern=re.compile(r"https?://(?:www\.)?bilibili\.(?:com|tv)/[\w/?=&]+"),
+)
+
+INSTAGRAM = ServiceSpec(
+    name="Instagram",
+    module="services.instagram",
+    class_name="InstagramService",
+    hosts=("instagram.com",),
+    url_pattern=re.compile(r"https://www\.instagram\.com/(?:p|reel|tv|stories)/([A-Za-z0-9_-]+)/"),
+)
+
+PINTEREST = ServiceSpec(
+    name="Pinterest",
+    module="services.pinterest",
+    class_name="PinterestService",
+    hosts=("pinterest.com", "pin.it"),
+    url_pattern=re.compile(r"https?://(?:www\.)?(?:pinterest\.com/[\w/-]+|pin\.it/[A-Za-z0-9]+)"),
+)
+
+PIXIV = ServiceSpec(
+    name="Pixiv",
+    module="services.pixiv",
+    class_name="PixivService",
+    hosts=("pixiv.net",),
+    url_pattern=re.compile(r"https:\/\/www\.pixiv\.net\/(?:[a-z]{2}\/)?artworks\/\d+"),
+)
+
+REDDIT = ServiceSpec(
+    name="Reddit",
+    module="services.reddit",
+    class_name="RedditService",
+    hosts=("reddit.com",),
+    url_pattern=re.compile(r"https:\/\/www\.reddit\.com\/r\/[A-Za-z0-9_]+\/(?:comments\/[A-Za-z0-9]+(?:\/[^\/\s?]+)?|s\/[A-Za-z0-9]+)(?:\?[^\s]*)?"),
+)
+
+SOUNDCLOUD = ServiceSpec(
+    name="SoundCloud",
+    module="services.soundcloud",
+    class_name="SoundCloudService",
+    hosts=("soundcloud.com", "on.soundcloud.com"),
+    url_pattern=re.compile(r"^https:\/\/(?:on\.soundcloud\.com\/[a-zA-Z0-9]+|soundcloud\.com\/[^\/]+\/(sets\/[^\/]+|[^\/\?\s]+))(?:\?.*)?$"),
+)
+
+SPOTIFY = ServiceSpec(
+    name="Spotify",
+    module="services.spotify",
+    class_name="SpotifyService",
+    hosts=("open.spotify.com",),
+    url_pattern=re.compile(r"https?://open\.spotify\.com/(track|playlist)/([\w-]+)"),
+)
+
+TIKTOK = ServiceSpec(
+    name="Tiktok",
+    module="services.tiktok",
+    class_name="TikTokService",
+    hosts=("tiktok.com", "vm.tiktok.com", "vt.tiktok.com"),
+    url_pattern=re.compile(r"https?://(?:www\.)?(?:tiktok\.com/.*|(vm|vt)\.tiktok\.com/.+)"),
+)
+
+TWITTER = ServiceSpec(
+    name="Twitter",
+    module="services.twitter",
+    class_name="TwitterService",
+    hosts=("twitter.com", "x.com"),
+    url_pattern=re.compile(r"https://(?:twitter|x)\.com/\w+/status/\d+"),
+)
+
+YOUTUBE = ServiceSpec(
+    name="Youtube",
+    module="services.youtube",
+    class_name="YouTubeService",
+    hosts=("youtube.com", "youtu.be"),
+    url_pattern=re.compile(r"https?://(?:www\.)?(?:m\.)?(?:youtu\.be/|youtube\.com/(?:shorts/|watch\?v=))([\w-]+)"),
+)
+
+YTMUSIC = ServiceSpec(
+    name="YTMusic",
+    module="services.ytmusic",
+    class_name="YtMusicService",
+    hosts=("music.youtube.com",),
+    url_pattern=re.compile(r"https:\/\/music\.youtube\.com\/(watch\?v=[\w-]+(&[\w=-]+)*|playlist\?list=[\w-]+(&[\w=-]+)*)"),
+)
+
+SERVICE_MANIFEST: Tuple[ServiceSpec, ...] = (
+    APPLE_MUSIC,
+    BILIBILI,
+    INSTAGRAM,
+    PINTEREST,
+    PIXIV,
+    REDDIT,
+    SOUNDCLOUD,
+    SPOTIFY,
+    TIKTOK,
+    TWITTER,
+    YOUTUBE,
+    YTMUSIC,
+)
@@ -1,48 +1,43 @@
 import asyncio
 import os
 import re
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List
 
-import aiofiles
-import aiohttp
 import yt_dlp
 from fake_useragent import UserAgent
 
+from managers.download_scheduler import download_executor
+from managers.session_manager import session_manager
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
+from services.manifest import PINTEREST
 from utils.error_handler import BotError, ErrorCode
+from utils.file_downloader import download_file
 
 ua = UserAgent()
 
 
 class PinterestService(BaseService):
     name = "Pinterest"
-    _download_executor = ThreadPoolExecutor(max_workers=10)
+    hosts = PINTEREST.hosts
+    url_pattern = PINTEREST.url_pattern
+    _download_executor = download_executor
 
     def __init__(self, output_path: str = "other/downloadsTemp") -> None:
         super().__init__()
         self.output_path = output_path
         os.makedirs(self.output_path, exist_ok=True)
 
-    def is_supported(self, url: str) -> bool:
-        return bool(
-            re.match(
-                r"https?://(?:www\.)?(?:pinterest\.com/[\w/-]+|pin\.it/[A-Za-z0-9]+)",
-                url,
-            )
-        )
-
     def is_playlist(self, url: str) -> bool:
         return False
 
     async def download(self, url: str) -> List[MediaContent]:
         result = []
 
-        async with aiohttp.ClientSession() as sesion:
-            async with sesion.get(url) as link:
-                url = str(link.url)
+        session = session_manager.get_session("pinterest")
+        async with session.get(url) as link:
+            url = str(link.url)
 
         try:
             match = re.search(r"/pin/(\d+)", url)
@@ -137,14 +132,14 @@ class PinterestService(BaseService):
             "data": f'{{"options":{{"id":"{pin_id}","field_set_key":"auth_web_main_pin","noCache":true,"fetch_visual_search_objects":true}},"context":{{}}}}',
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params, headers=headers) as response:
-                if response.status == 200:
-                    response_json = await response.json()
-                else:
-                    raise Exception(
-                        f"Failed to retrieve image. Status code: {response.status}"
-                    )
+        session = session_manager.get_session("pinterest")
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 200:
+                response_json = await response.json()
+            else:
+                raise Exception(
+                    f"Failed to retrieve image. Status code: {response.status}"
+                )
 
         root = response_json["resource_response"]["data"]
 
@@ -237,29 +232,24 @@ class PinterestService(BaseService):
     async def _download_photo(self, url: str, filename: str) -> None:
         try:
             content_url = re.sub(r"/\d+x", "/originals", url)
-            async with aiohttp.ClientSession() as session:
-                async with session.get(content_url) as response:
-                    response_status = response.status
-                    if response_status == 200:
-                        async with aiofiles.open(filename, "wb") as f:
-                            await f.write(await response.read())
-                        return
-
-            if response_status == 403:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            async with aiofiles.open(filename, "wb") as f:
-                                await f.write(await response.read())
-                            return
-                        else:
-                            raise BotError(
-                                code=ErrorCode.DOWNLOAD_FAILED,
-                                message=f"Failed to retrieve image. Status code: {response.status}",
-                                url=url,
-                                critical=True,
-                                is_logged=True,
-                            )
+            session = session_manager.get_session("pinterest")
+            try:
+                await download_file(session, content_url, filename)
+            except BotError as e:
+                if e.code == ErrorCode.LARGE_FILE:
+                    raise
+                # Originals are not available for every pin, fall back to the sized image
+                await download_file(session, url, filename)
+        except BotError as e:
+            if e.code == ErrorCode.LARGE_FILE:
+                raise
+            raise BotError(
+                code=ErrorCode.DOWNLOAD_FAILED,
+                message=f"Failed to retrieve image: {url}. {e.message}",
+                url=url,
+                critical=True,
+                is_logged=True,
+            )
         except Exception as e:
             raise BotError(
                 code=ErrorCode.DOWNLOAD_FAILED,
@@ -271,21 +261,8 @@ class PinterestService(BaseService):
 
     async def _download_video(self, url: str, filename: str) -> None:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    content_length = response.headers.get("Content-Length")
-                    if content_length and int(content_length) > 50 * 1024 * 1024:
-                        raise BotError(
-                            code=ErrorCode.SIZE_CHECK_FAIL,
-                            message=f"File size exceeds 50MB: {url}",
-                            url=url,
-                            critical=False,
-                            is_logged=False,
-                        )
-
-                    async with aiofiles.open(filename, "wb") as f:
-                        async for chunk in response.content.iter_chunked(1024):
-                            await f.write(chunk)
+            session = session_manager.get_session("pinterest")
+            await download_file(session, url, filename)
         except BotError as e:
             raise e
         except Exception as e:
@@ -4,19 +4,22 @@ import re
 from pathlib import Path
 from typing import List
 
-import aiofiles
-import aiohttp
 from fake_useragent import UserAgent
 
+from managers.session_manager import session_manager
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
+from services.manifest import PIXIV
 from utils.error_handler import BotError, ErrorCode
+from utils.file_downloader import download_file
 
 ua = UserAgent(platforms="desktop")
 
 
 class PixivService(BaseService):
     name = "Pixiv"
+    hosts = PIXIV.hosts
+    url_pattern = PIXIV.url_pattern
 
     def __init__(self, output_path: str = "other/downloadsTemp/"):
         self.output_path = output_path
@@ -28,11 +31,6 @@ class PixivService(BaseService):
             "User-Agent": self.user_agent,
         }
 
-    def is_supported(self, url: str) -> bool:
-        return bool(
-            re.match(r"https:\/\/www\.pixiv\.net\/(?:[a-z]{2}\/)?artworks\/\d+", url)
-        )
-
     def is_playlist(self, url: str) -> bool:
         return False
 
@@ -52,18 +50,18 @@ class PixivService(BaseService):
             )
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"https://www.pixiv.net/ajax/illust/{pixiv_id}/pages", headers=self.headers) as response:
-                    if response.status == 200:
-                        page_response_json = await response.json()
-                    else:
-                        raise BotError(
-                            code=ErrorCode.INVALID_URL,
-                            message="Failed to retrieve Pixiv pages info",
-                            url=url,
-                            critical=False,
-                            is_logged=True,
-                        )
+            session = session_manager.get_session("pixiv", headers=self.headers)
+            async with session.get(f"https://www.pixiv.net/ajax/illust/{pixiv_id}/pages") as response:
+                if response.status == 200:
+                    page_response_json = await response.json()
+                else:
+                    raise BotError(
+                        code=ErrorCode.INVALID_URL,
+                        message="Failed to retrieve Pixiv pages info",
+                        url=url,
+                        critical=False,
+                        is_logged=True,
+                    )
             for img in page_response_json["body"]:
                 img_url=img["urls"]["original"]
 
@@ -93,26 +91,17 @@ class PixivService(BaseService):
 
     async def _download_photo(self, url: str, filename: str) -> None:
         retries = 3
-        connector = aiohttp.TCPConnector(force_close=True)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            for attempt in range(retries):
-                try:
-                    async with session.get(url, headers=self.headers) as response:
-                        if response.status == 200:
-                            async with aiofiles.open(filename, "wb") as f:
-                                async for chunk in response.content.iter_chunked(1024):
-                                    await f.write(chunk)
-                            break
-                        else:
-                            raise BotError(
-                                code=ErrorCode.DOWNLOAD_FAILED,
-                                message=f"Failed to download Pixiv image: {response.status}",
-                                url=url,
-                                critical=False,
-                                is_logged=True,
-                            )
-                except Exception:
-                    if attempt < retries - 1:
-                        await asyncio.sleep(0.5)
-                    else:
-                        raise
+        session = session_manager.get_session("pixiv", headers=self.headers)
+        for attempt in range(retries):
+            try:
+                await download_file(session, url, filename)
+                break
+            except BotError as e:
+                if e.code == ErrorCode.LARGE_FILE or attempt == retries - 1:
+                    raise
+                await asyncio.sleep(0.5)
+            except Exception:
+                if attempt < retries - 1:
+                    await asyncio.sleep(0.5)
+                else:
+                    raise
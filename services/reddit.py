@@ -1,26 +1,27 @@
 import asyncio
 import os
-import re
 from pathlib import Path
 from typing import List
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor
 import yt_dlp
 
-import aiofiles
-import aiohttp
 from fake_useragent import UserAgent
 
+from managers.session_manager import session_manager
+from managers.ytdlp_runner import ytdlp_runner
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
+from services.manifest import REDDIT
 from utils.error_handler import BotError, ErrorCode
+from utils.file_downloader import download_file
 
 ua = UserAgent(platforms="desktop")
 
 
 class RedditService(BaseService):
     name = "Reddit"
-    _download_executor = ThreadPoolExecutor(max_workers=5)
+    hosts = REDDIT.hosts
+    url_pattern = REDDIT.url_pattern
 
     def __init__(self, output_path: str = "other/downloadsTemp"):
         self.output_path = output_path
@@ -34,11 +35,6 @@ class RedditService(BaseService):
             "quiet": True,
         }
 
-    def is_supported(self, url: str) -> bool:
-        return bool(
-            re.match(r"https:\/\/www\.reddit\.com\/r\/[A-Za-z0-9_]+\/(?:comments\/[A-Za-z0-9]+(?:\/[^\/\s?]+)?|s\/[A-Za-z0-9]+)(?:\?[^\s]*)?", url)
-        )
-
     def is_playlist(self, url: str) -> bool:
         return False
 
@@ -49,18 +45,18 @@ class RedditService(BaseService):
         media_type = None
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self.headers, allow_redirects=True) as response:
-                    if response.status == 200:
-                        page_content = await response.text()
-                    else:
-                        raise BotError(
-                            code=ErrorCode.DOWNLOAD_FAILED,
-                            message="Failed to retrieve Reddit page",
-                            url=url,
-                            critical=False,
-                            is_logged=True,
-                        )
+            session = session_manager.get_session("reddit", headers=self.headers)
+            async with session.get(url, allow_redirects=True) as response:
+                if response.status == 200:
+                    page_content = await response.text()
+                else:
+                    raise BotError(
+                        code=ErrorCode.DOWNLOAD_FAILED,
+                        message="Failed to retrieve Reddit page",
+                        url=url,
+                        critical=False,
+                        is_logged=True,
+                    )
 
             soup = BeautifulSoup(page_content, 'html.parser')
 
@@ -88,35 +84,24 @@ class RedditService(BaseService):
                         is_logged=True,
                     )
             elif media_type == 'video':
-                with yt_dlp.YoutubeDL(self.yt_dlp_opts) as ydl:
-                    loop = asyncio.get_event_loop()
+                info_dict = await ytdlp_runner.extract(self.yt_dlp_opts, url)
 
-                    info_dict = await loop.run_in_executor(
-                        self._download_executor,
-                        lambda: ydl.extract_info(url, download=False)
+                if not info_dict:
+                    raise BotError(
+                        code=ErrorCode.DOWNLOAD_FAILED,
+                        message="Failed to get video info",
+                        url=url,
+                        critical=True,
+                        is_logged=True
                     )
 
-                    if not info_dict:
-                        raise BotError(
-                            code=ErrorCode.DOWNLOAD_FAILED,
-                            message="Failed to get video info",
-                            url=url,
-                            critical=True,
-                            is_logged=True
-                        )
-
-                    await loop.run_in_executor(
-                        self._download_executor,
-                        lambda: ydl.download([url])
+                return [
+                    MediaContent(
+                        type=MediaType.VIDEO,
+                        path=Path(info_dict["filepath"]),
+                        title=title,
                     )
-
-                    return [
-                        MediaContent(
-                            type=MediaType.VIDEO,
-                            path=Path(ydl.prepare_filename(info_dict)),
-                            title=title,
-                        )
-                    ]
+                ]
             elif media_type == 'gallery':
                 carousel = soup.select_one('gallery-carousel')
                 for li in carousel.select('li'):
@@ -161,26 +146,15 @@ class RedditService(BaseService):
 
     async def _download_photo(self, url: str, filename: str) -> None:
         retries = 3
+        session = session_manager.get_session("reddit", headers=self.headers)
         for attempt in range(retries):
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, headers=self.headers) as response:
-                        if response.status == 200:
-                            async with aiofiles.open(filename, "wb") as f:
-                                while True:
-                                    chunk = await response.content.read(1024)
-                                    if not chunk:
-                                        break
-                                    await f.write(chunk)
-                            break
-                        else:
-                            raise BotError(
-                                code=ErrorCode.DOWNLOAD_FAILED,
-                                message=f"Failed to download Reddit image: {response.status}",
-                                url=url,
-                                critical=False,
-                                is_logged=True,
-                            )
+                await download_file(session, url, filename)
+                break
+            except BotError as e:
+                if e.code == ErrorCode.LARGE_FILE or attempt == retries - 1:
+                    raise
+                await asyncio.sleep(0.5)
             except Exception:
                 if attempt < retries - 1:
                     await asyncio.sleep(0.5)
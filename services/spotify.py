@@ -1,31 +1,30 @@
-import asyncio
 import os
 import re
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 
-import aiofiles
-import aiohttp
-import yt_dlp
 from aiofiles import os as aios
 from yt_dlp.utils import sanitize_filename
 
+from managers.metadata_cache import metadata_cache
+from managers.artwork_cache import artwork_cache
+from managers.session_manager import session_manager
+from managers.ytdlp_runner import ytdlp_runner
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
-from utils import (
-    get_access_token,
-    get_spotify_author,
-    random_cookie_file,
-    search_music,
-    update_metadata,
-)
+from services.manifest import SPOTIFY
+from utils import random_cookie_file
+from utils.audio_pipeline import audio_postprocessors, finalize_audio, preferred_audio_format
 from utils.error_handler import BotError, ErrorCode
+from utils.get_spotify_author import get_spotify_metadata, spotify_track_metadata
+from utils.music_search_engine import require_match
+from utils.spotify_login import spotify_api_get
 
 
 class SpotifyService(BaseService):
     name = "Spotify"
-    _download_executor = ThreadPoolExecutor(max_workers=10)
+    hosts = SPOTIFY.hosts
+    url_pattern = SPOTIFY.url_pattern
 
     def __init__(self, output_path: str = "other/downloadsTemp") -> None:
         super().__init__()
@@ -34,26 +33,18 @@ class SpotifyService(BaseService):
 
     def _get_audio_options(self):
         return {
-            "format": "bestaudio",
+            "format": preferred_audio_format(),
             "outtmpl": f"{self.output_path}/{sanitize_filename('%(title)s')}",
             "cookiefile": random_cookie_file(),
-            "postprocessors": [
-                {
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                }
-            ],
+            "postprocessors": audio_postprocessors(),
         }
 
-    def is_supported(self, url: str) -> bool:
-        return bool(re.match(r"https?://open\.spotify\.com/(track|playlist)/([\w-]+)", url))
-
     def is_playlist(self, url: str) -> bool:
         return bool(re.match(r"https?://open\.spotify\.com/playlist/([\w-]+)", url))
 
     async def download(self, url: str) -> List[MediaContent]:
-        permofer, title, cover_url = await get_spotify_author(url)
-        if not permofer or not title:
+        metadata = await get_spotify_metadata(url)
+        if metadata is None or not metadata.artist or not metadata.title:
             raise BotError(
                 code=ErrorCode.INTERNAL_ERROR,
                 message="Failed to get permofer and title from Spotify",
@@ -61,84 +52,58 @@ class SpotifyService(BaseService):
                 critical=True,
                 is_logged=True
             )
+        permofer, title, cover_url = metadata.artist, metadata.title, metadata.cover_url
 
-        video_link = await search_music(permofer, title)
+        match = await require_match(metadata, url)
         options = self._get_audio_options()
         try:
-            with yt_dlp.YoutubeDL(options) as ydl:
-                loop = asyncio.get_event_loop()
-
-                info_dict = await loop.run_in_executor(
-                    self._download_executor,
-                    lambda: ydl.extract_info(video_link, download=False)
-                )
-                if not info_dict:
-                    raise BotError(
-                        code=ErrorCode.DOWNLOAD_FAILED,
-                        message="Failed to get audio info",
-                        url=url,
-                        is_logged=True
-                    )
-
-                await loop.run_in_executor(
-                    self._download_executor,
-                    lambda: ydl.download([video_link])
+            info_dict = await ytdlp_runner.extract(options, match.url)
+            if not info_dict:
+                raise BotError(
+                    code=ErrorCode.DOWNLOAD_FAILED,
+                    message="Failed to get audio info",
+                    url=url,
+                    is_logged=True
                 )
 
-                base_path = os.path.join(
-                    self.output_path,
-                    f"{sanitize_filename(info_dict['title'])}"
-                )
-                audio_path = f"{base_path}.mp3"
-                cover_path = f"{base_path}.jpg"
-
-                if cover_url is None:
-                    cover_url = info_dict.get("thumbnail", None)
-
-                if cover_url:
-                    try:
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(cover_url) as response:
-                                response.raise_for_status()
-                                cover_path = f"{base_path}.jpg"
-                                async with aiofiles.open(cover_path, 'wb') as f:
-                                    async for chunk in response.content.iter_chunked(1024):
-                                        await f.write(chunk)
-
-                        if not await aios.path.exists(cover_path):
-                            cover_path = None
-
-                    except Exception:
-                        cover_path = None
-
-                assert cover_path, "Cover URL is not available"
-
-                await loop.run_in_executor(
-                    self._download_executor,
-                    lambda: update_metadata(
-                        audio_path,
-                        title=title,
-                        artist=permofer,
-                        cover_file=cover_path
-                    )
-                )
+            base_path = os.path.join(
+                self.output_path,
+                f"{sanitize_filename(info_dict['title'])}"
+            )
+            if cover_url is None:
+                cover_url = info_dict.get("thumbnail", None)
+
+            artwork = None
+            if cover_url:
+                artwork = await artwork_cache.fetch(cover_url, session_manager.get_session("spotify"))
+
+            assert artwork, "Cover URL is not available"
+
+            audio_path = await ytdlp_runner.run(
+                finalize_audio,
+                info_dict,
+                base_path,
+                title=title,
+                artist=permofer,
+                cover_file=str(artwork.embed) if artwork else None
+            )
 
-                if await aios.path.exists(audio_path):
-                    return [MediaContent(
-                        type=MediaType.AUDIO,
-                        path=Path(audio_path),
-                        duration=info_dict.get("duration", None),
-                        title=title,
-                        performer=permofer,
-                        cover=Path(cover_path) if cover_path else None
-                    )]
-                else:
-                    raise BotError(
-                        code=ErrorCode.DOWNLOAD_FAILED,
-                        message="Audio file not found after download",
-                        url=url,
-                        is_logged=True
-                    )
+            if await aios.path.exists(audio_path):
+                return [MediaContent(
+                    type=MediaType.AUDIO,
+                    path=Path(audio_path),
+                    duration=info_dict.get("duration", None),
+                    title=title,
+                    performer=permofer,
+                    cover=artwork.thumbnail if artwork else None
+                )]
+            else:
+                raise BotError(
+                    code=ErrorCode.DOWNLOAD_FAILED,
+                    message="Audio file not found after download",
+                    url=url,
+                    is_logged=True
+                )
 
         except BotError as e:
             raise e
@@ -166,22 +131,21 @@ class SpotifyService(BaseService):
             )
 
         try:
-            async with aiohttp.ClientSession() as session:
-                token = await get_access_token(session)
-                if not token:
-                    return []
-
-                headers = {"Authorization": f"Bearer {token}"}
-                params = {"offset": offset}
-                playlist_id = match.group(1)
-                playlist_url = (f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks?additional_types=track")
-
-                async with session.get(playlist_url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-
-                        for track in data["items"]:
-                            tracks.append(track["track"]["external_urls"]["spotify"])
+            session = session_manager.get_session("spotify_api")
+            params = {"offset": offset}
+            playlist_id = match.group(1)
+            playlist_url = (f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks?additional_types=track")
+
+            status, data = await spotify_api_get(session, playlist_url, params=params)
+            if status == 200:
+                warm = []
+                for item in data["items"]:
+                    track = item["track"]
+                    tracks.append(track["external_urls"]["spotify"])
+                    if track.get("id"):
+                        warm.append((f"spotify:{track['id']}", spotify_track_metadata(track)))
+                # The page already holds every track's metadata, spare a lookup per track
+                await metadata_cache.warm(warm)
 
         except Exception as e:
             raise BotError(
@@ -1,12 +1,11 @@
 import logging
-import re
 from pathlib import Path
 from typing import List
-import yt_dlp
-import asyncio
 
+from managers.ytdlp_runner import ytdlp_runner
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
+from services.manifest import TIKTOK
 from utils import truncate_string
 from utils.error_handler import BotError, ErrorCode
 
@@ -15,6 +14,8 @@ logger = logging.getLogger(__name__)
 
 class TikTokService(BaseService):
     name = "Tiktok"
+    hosts = TIKTOK.hosts
+    url_pattern = TIKTOK.url_pattern
 
     def __init__(self, output_path: str = "other/downloadsTemp") -> None:
         self.output_path = output_path
@@ -23,23 +24,14 @@ class TikTokService(BaseService):
             "outtmpl": f"{output_path}/%(title)s.%(ext)s",
         }
 
-    def is_supported(self, url: str) -> bool:
-        return bool(
-            re.match(
-                r"https?://(?:www\.)?(?:tiktok\.com/.*|(vm|vt)\.tiktok\.com/.+)", url
-            )
-        )
-
     def is_playlist(self, url: str) -> bool:
         return False
 
     async def download(self, url: str) -> List[MediaContent]:
         result = []
         try:
-            with yt_dlp.YoutubeDL(self.yt_dlp_video_options) as ydl:
-                info_dict = await asyncio.to_thread(ydl.extract_info, url, download=False)
-                filename = ydl.prepare_filename(info_dict)
-                await asyncio.to_thread(ydl.download, [url])
+            info_dict = await ytdlp_runner.extract(self.yt_dlp_video_options, url)
+            filename = info_dict["filepath"]
 
             result.append(
                 MediaContent(
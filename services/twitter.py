@@ -5,14 +5,16 @@ import re
 from pathlib import Path
 from typing import Any, Dict, List
 
-import aiofiles
 import aiohttp
 from fake_useragent import UserAgent
 
+from managers.session_manager import session_manager
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
+from services.manifest import TWITTER
 from utils import truncate_string
 from utils.error_handler import BotError, ErrorCode
+from utils.file_downloader import download_file
 
 ua = UserAgent()
 
@@ -21,6 +23,8 @@ logger = logging.getLogger(__name__)
 
 class TwitterService(BaseService):
     name = "Twitter"
+    hosts = TWITTER.hosts
+    url_pattern = TWITTER.url_pattern
 
     def __init__(self, output_path: str = "other/downloadsTemp"):
         self.output_path = output_path
@@ -29,9 +33,6 @@ class TwitterService(BaseService):
         self.user_agent = ua.random
         self.guest_token = None
 
-    def is_supported(self, url: str) -> bool:
-        return bool(re.match(r"https://(?:twitter|x)\.com/\w+/status/\d+", url))
-
     def is_playlist(self, url: str) -> bool:
         return False
 
@@ -144,28 +145,24 @@ class TwitterService(BaseService):
     async def _get_guest_token(self) -> int:
         guest_token_url = "https://api.twitter.com/1.1/guest/activate.json"
 
-        headers = {"Authorization": self.auth}
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(guest_token_url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get("guest_token")
-                else:
-                    raise BotError(
-                        code=ErrorCode.INTERNAL_ERROR,
-                        message=f"Failed to get guest token. Status code: {response.status}",
-                        critical=True,
-                        is_logged=True,
-                    )
+        session = self._get_session()
+        async with session.post(guest_token_url) as response:
+            if response.status == 200:
+                data = await response.json()
+                return data.get("guest_token")
+            else:
+                raise BotError(
+                    code=ErrorCode.INTERNAL_ERROR,
+                    message=f"Failed to get guest token. Status code: {response.status}",
+                    critical=True,
+                    is_logged=True,
+                )
 
     async def _get_tweet_info(self, tweet_id: int) -> Dict[str, Any]:
         if not self.guest_token:
             self.guest_token = await self._get_guest_token()
         headers = {
-            "Authorization": self.auth,
             "Content-Type": "application/json",
-            "User-Agent": self.user_agent,
             "X-Guest-Token": await self._get_guest_token(),
         }
 
@@ -177,34 +174,29 @@ class TwitterService(BaseService):
         tweet_info_url = (
             "https://api.x.com/graphql/nYHwgVXy3Hse2O5okbpFiQ/TweetResultByRestId"
         )
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                tweet_info_url, headers=headers, params=params
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    raise BotError(
-                        code=ErrorCode.DOWNLOAD_FAILED,
-                        message=f"Failed to get tweet info: response status {response.status}",
-                        url=str(tweet_id),
-                        critical=True,
-                    )
+        session = self._get_session()
+        async with session.get(
+            tweet_info_url, headers=headers, params=params
+        ) as response:
+            if response.status == 200:
+                return await response.json()
+            else:
+                raise BotError(
+                    code=ErrorCode.DOWNLOAD_FAILED,
+                    message=f"Failed to get tweet info: response status {response.status}",
+                    url=str(tweet_id),
+                    critical=True,
+                )
 
-    async def _download_file(self, url: str, filename: str, max_size: int = 0):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if max_size and "Content-Length" in response.headers:
-                    if int(response.headers["Content-Length"]) > max_size:
-                        return BotError(
-                            code=ErrorCode.SIZE_CHECK_FAIL,
-                            url=url,
-                            critical=False,
-                        )
+    async def _download_file(self, url: str, filename: str):
+        session = session_manager.get_session("twitter_media")
+        await download_file(session, url, filename)
 
-                async with aiofiles.open(filename, "wb") as f:
-                    async for chunk in response.content.iter_chunked(1024 * 8):
-                        await f.write(chunk)
+    def _get_session(self) -> aiohttp.ClientSession:
+        return session_manager.get_session(
+            "twitter",
+            headers={"Authorization": self.auth, "User-Agent": self.user_agent},
+        )
 
     def _sanitize_filename(self, filename: str) -> str:
         return re.sub(r'[<>:"/\\|?*\x00-\x1F]', "_", filename)
@@ -4,16 +4,18 @@ import re
 from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
-import aiofiles
-import aiohttp
-import yt_dlp
 from aiofiles import os as aios
 from yt_dlp.utils import sanitize_filename
 from ytmusicapi import YTMusic
 
+from managers.artwork_cache import artwork_cache
+from managers.session_manager import session_manager
+from managers.ytdlp_runner import ytdlp_runner
 from models.media_models import MediaContent, MediaType
 from services.base_service import BaseService
-from utils import random_cookie_file, update_metadata
+from services.manifest import YTMUSIC
+from utils import random_cookie_file
+from utils.audio_pipeline import audio_postprocessors, finalize_audio, preferred_audio_format
 from utils.error_handler import BotError, ErrorCode
 from pathlib import Path
 
@@ -21,7 +23,8 @@ _search_executor = ThreadPoolExecutor(max_workers=5)
 
 class YtMusicService(BaseService):
     name = "YTMusic"
-    _download_executor = ThreadPoolExecutor(max_workers=10)
+    hosts = YTMUSIC.hosts
+    url_pattern = YTMUSIC.url_pattern
 
     def __init__(self, output_path: str = "other/downloadsTemp") -> None:
         super().__init__()
@@ -36,26 +39,13 @@ class YtMusicService(BaseService):
 
     def _get_audio_options(self):
         return {
-            "format": "bestaudio",
+            "format": preferred_audio_format(),
             "outtmpl": f"{self.output_path}/{sanitize_filename('%(title)s')}",
             "cookiefile": random_cookie_file(),
             "noplaylist": True,
-            "postprocessors": [
-                {
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                }
-            ],
+            "postprocessors": audio_postprocessors(),
         }
 
-    def is_supported(self, url: str) -> bool:
-        return bool(
-            re.match(
-                r"https:\/\/music\.youtube\.com\/(watch\?v=[\w-]+(&[\w=-]+)*|playlist\?list=[\w-]+(&[\w=-]+)*)",
-                url,
-            )
-        )
-
     def is_playlist(self, url: str) -> bool:
         return bool(re.match(r"https:\/\/music\.youtube\.com\/playlist\?list=[\w-]+(&[\w=-]+)*", url))
 
@@ -65,68 +55,55 @@ class YtMusicService(BaseService):
     async def download(self, url: str) -> List[MediaContent]:
         options = self._get_audio_options()
         try:
-            with yt_dlp.YoutubeDL(options) as ydl:
-                loop = asyncio.get_event_loop()
-
-                # Получаем информацию и сразу скачиваем
-                info_dict = await loop.run_in_executor(
-                    self._download_executor,
-                    lambda: ydl.extract_info(url, download=True)
+            # Получаем информацию и сразу скачиваем
+            info_dict = await ytdlp_runner.extract(options, url)
+            if not info_dict:
+                raise BotError(
+                    code=ErrorCode.DOWNLOAD_FAILED,
+                    message="Failed to get audio info",
+                    url=url,
                 )
-                if not info_dict:
-                    raise BotError(
-                        code=ErrorCode.DOWNLOAD_FAILED,
-                        message="Failed to get audio info",
-                        url=url,
-                    )
 
-                base_path = os.path.join(
-                    self.output_path,
-                    f"{sanitize_filename(info_dict['title'])}"
-                )
-                audio_path = f"{base_path}.mp3"
-                cover_path = f"{base_path}.jpg"
-
-                # Скачивание cover изображения
-                cover_url = info_dict.get("thumbnail", None)
-                if cover_url:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(cover_url) as response:
-                            response.raise_for_status()
-                            async with aiofiles.open(cover_path, 'wb') as f:
-                                async for chunk in response.content.iter_chunked(1024):
-                                    await f.write(chunk)
-
-                # Обновление метаданных
-                await loop.run_in_executor(
-                    self._download_executor,
-                    lambda: update_metadata(
-                        audio_path,
+            base_path = os.path.join(
+                self.output_path,
+                f"{sanitize_filename(info_dict['title'])}"
+            )
+
+            # Скачивание cover изображения
+            cover_url = info_dict.get("thumbnail", None)
+            artwork = None
+            if cover_url:
+                artwork = await artwork_cache.fetch(cover_url, session_manager.get_session("ytmusic"))
+
+            # Обновление метаданных
+            audio_path = await ytdlp_runner.run(
+                finalize_audio,
+                info_dict,
+                base_path,
+                title=info_dict.get("title", "audio"),
+                artist=info_dict.get("uploader", "unknown"),
+                cover_file=str(artwork.embed) if artwork else None
+            )
+
+            if await aios.path.exists(audio_path):
+                return [
+                    MediaContent(
+                        type=MediaType.AUDIO,
+                        path=Path(audio_path),
+                        duration=info_dict.get("duration", 0),
                         title=info_dict.get("title", "audio"),
-                        artist=info_dict.get("uploader", "unknown"),
-                        cover_file=cover_path
+                        cover=artwork.thumbnail if artwork else None
                     )
+                ]
+            else:
+                raise BotError(
+                    ErrorCode.DOWNLOAD_FAILED,
+                    message="Failed to download audio",
+                    url=url,
+                    is_logged=True,
+                    critical=True
                 )
 
-                if await aios.path.exists(audio_path):
-                    return [
-                        MediaContent(
-                            type=MediaType.AUDIO,
-                            path=Path(audio_path),
-                            duration=info_dict.get("duration", 0),
-                            title=info_dict.get("title", "audio"),
-                            cover=Path(cover_path)
-                        )
-                    ]
-                else:
-                    raise BotError(
-                        ErrorCode.DOWNLOAD_FAILED,
-                        message="Failed to download audio",
-                        url=url,
-                        is_logged=True,
-                        critical=True
-                    )
-
         except BotError as e:
             raise e
 
@@ -1,5 +1,5 @@
 # Working with files
-from .delete_files import delete_files
+from .delete_files import delete_files, share_files
 from .update_metadata import update_metadata
 from .is_image_or_video import is_image_or_video
 
@@ -25,6 +25,7 @@ from .proxy import load_proxies
 
 __all__ = [
     "delete_files",
+    "share_files",
     "get_applemusic_author",
     "get_spotify_author",
     "translate_text",
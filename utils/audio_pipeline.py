@@ -0,0 +1,110 @@
+import logging
+import os
+import subprocess
+from typing import List, Optional
+
+from config.settings import AUDIO_REMUX
+from utils.update_metadata import update_metadata
+
+logger = logging.getLogger(__name__)
+
+# Output extension per source codec that Telegram plays natively and is only remuxed
+_COPY_CODECS = {
+    "mp4a": "m4a",
+    "aac": "m4a",
+    "mp3": "mp3",
+}
+
+
+def audio_postprocessors() -> List[dict]:
+    """yt-dlp postprocessors for music downloads: none when remuxing, mp3 extraction otherwise."""
+    if AUDIO_REMUX:
+        return []
+    return [{"key": "FFmpegExtractAudio", "preferredcodec": "mp3"}]
+
+
+def preferred_audio_format() -> str:
+    """yt-dlp format for music downloads, preferring AAC streams that can be remuxed."""
+    if AUDIO_REMUX:
+        return "bestaudio[acodec^=mp4a]/bestaudio"
+    return "bestaudio"
+
+
+def finalize_audio(info_dict: dict, base_path: str, title: str, artist: str, cover_file: Optional[str]) -> str:
+    """
+    Turns a finished yt-dlp download into the audio file that is sent, with tags and cover.
+
+    With AUDIO_REMUX the source stream is copied into m4a/mp3 in one ffmpeg pass that also
+    writes the tags and cover, and only codecs Telegram can't play are transcoded to mp3.
+    Otherwise yt-dlp already extracted an mp3 and its tags are updated with mutagen.
+    Blocking, run it in the download executor.
+
+    :param info_dict: yt-dlp info of the downloaded media.
+    :param base_path: Output path without extension.
+    :param title: Track title.
+    :param artist: Track artist.
+    :param cover_file: Path to the cover image (optional).
+    :return: Path of the audio file to send.
+    """
+    if cover_file and not os.path.exists(cover_file):
+        cover_file = None
+
+    if not AUDIO_REMUX:
+        audio_path = f"{base_path}.mp3"
+        update_metadata(audio_path, title=title, artist=artist, cover_file=cover_file)
+        return audio_path
+
+    requested_downloads = info_dict.get("requested_downloads") or [{}]
+    source = requested_downloads[0].get("filepath") or base_path
+    acodec = (info_dict.get("acodec") or "").split(".")[0].lower()
+    extension = _COPY_CODECS.get(acodec)
+
+    if extension:
+        audio_path = f"{base_path}.{extension}"
+        try:
+            _run_ffmpeg(source, audio_path, title, artist, cover_file, transcode=False)
+            _remove(source, audio_path)
+            return audio_path
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Remux of {source} failed, transcoding: {e.stderr}")
+
+    audio_path = f"{base_path}.mp3"
+    _run_ffmpeg(source, audio_path, title, artist, cover_file, transcode=True)
+    _remove(source, audio_path)
+    return audio_path
+
+
+def _run_ffmpeg(
+    source: str, output: str, title: str, artist: str, cover_file: Optional[str], transcode: bool
+) -> None:
+    # Never read and write the same file
+    target = f"{output}.tmp{os.path.splitext(output)[1]}" if output == source else output
+
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-i", source]
+    if cover_file:
+        command += ["-i", cover_file]
+    command += ["-map", "0:a:0"]
+    if cover_file:
+        command += ["-map", "1:v:0", "-c:v", "mjpeg", "-disposition:v:0", "attached_pic"]
+
+    if transcode:
+        command += ["-c:a", "libmp3lame", "-q:a", "5"]
+    else:
+        command += ["-c:a", "copy"]
+
+    if output.endswith(".mp3"):
+        command += ["-id3v2_version", "3"]
+    else:
+        command += ["-movflags", "+faststart"]
+
+    command += ["-metadata", f"title={title}", "-metadata", f"artist={artist}", target]
+    subprocess.run(command, check=True, capture_output=True, text=True)
+
+    if target != output:
+        os.replace(target, output)
+    logger.info(f"{'Transcoded' if transcode else 'Remuxed'} {source} -> {output}")
+
+
+def _remove(source: str, output: str) -> None:
+    if source != output and os.path.exists(source):
+        os.remove(source)
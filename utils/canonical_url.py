@@ -0,0 +1,59 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track the share and never change the media
+_TRACKING_PARAMS = {
+    "si",
+    "feature",
+    "igsh",
+    "igshid",
+    "context",
+    "ref_src",
+    "ref_url",
+    "share_id",
+    "is_from_webapp",
+    "sender_device",
+    "sender_web_id",
+    "pp",
+}
+
+_YOUTUBE_ID = re.compile(r"^/(?:shorts/|embed/|live/)?([\w-]{11})$")
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalizes a media URL so that different share links of the same media map to one key.
+
+    Lowercases the host, drops "www."/"m." prefixes, fragments, trailing slashes and
+    tracking query parameters, and rewrites YouTube short forms to a watch URL.
+
+    :param url: URL as sent by the user.
+    :return: Canonical URL.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+
+    path = parts.path.rstrip("/") or "/"
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in _TRACKING_PARAMS and not key.startswith("utm_")
+    ]
+
+    if host in ("youtu.be", "youtube.com"):
+        short_form = host == "youtu.be" or path.startswith(("/shorts/", "/embed/", "/live/"))
+        match = _YOUTUBE_ID.match(path) if short_form else None
+        if match:
+            query = [("v", match.group(1))] + [(k, v) for k, v in query if k == "list"]
+            path = "/watch"
+        elif path == "/watch":
+            query = [(k, v) for k, v in query if k in ("v", "list")]
+        host = "youtube.com"
+    elif host == "open.spotify.com":
+        path = re.sub(r"^/intl-[\w-]+", "", path)
+        query = []
+
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
@@ -1,14 +1,38 @@
 import logging
+import os
+from typing import Dict
 
 import aiofiles.os
 
 logger = logging.getLogger(__name__)
 
+# How many senders still have to call delete_files before a shared file is removed
+_file_holders: Dict[str, int] = {}
+
+
+def share_files(files, holders: int) -> None:
+    """
+    Marks files as used by several senders.
+
+    delete_files will only remove a shared file on the last of `holders` calls.
+
+    :param files: List of filenames shared between senders.
+    :param holders: Number of senders that will call delete_files for them.
+    """
+    if holders <= 1:
+        return
+
+    for filename in files:
+        if filename:
+            _file_holders[os.fspath(filename)] = holders
+
 
 async def delete_files(files=None):
     """
     Asynchronously deletes multiple files.
 
+    Files marked with share_files are kept until their last holder releases them.
+
     :param files: List of filenames to delete. Defaults to None.
     :return: List of successfully deleted files.
     """
@@ -19,6 +43,14 @@ async def delete_files(files=None):
 
     for filename in files:
         try:
+            key = os.fspath(filename)
+            holders = _file_holders.get(key)
+            if holders is not None:
+                if holders > 1:
+                    _file_holders[key] = holders - 1
+                    continue
+                del _file_holders[key]
+
             if await aiofiles.os.path.exists(filename):
                 await aiofiles.os.remove(filename)
                 deleted_files.append(filename)
@@ -19,6 +19,8 @@ class ErrorCode(Enum):
     DOWNLOAD_FAILED = "E004"
     DOWNLOAD_CANCELLED = "E005"
     PLAYLIST_INFO_ERROR = "E006"
+    QUEUE_FULL = "E007"
+    NO_CONFIDENT_MATCH = "E008"
     INTERNAL_ERROR = "E500"
 
 @dataclass
@@ -45,6 +47,10 @@ async def handle_download_error(message: types.Message, error: BotError) -> None
             await message.answer(_("Download canceled."))
         case ErrorCode.PLAYLIST_INFO_ERROR:
             await message.answer(_("Get playlist items error"))
+        case ErrorCode.QUEUE_FULL:
+            await message.answer(_("I'm too busy right now, please send the link again in a minute 🧡"))
+        case ErrorCode.NO_CONFIDENT_MATCH:
+            await message.answer(_("I couldn't find this exact track, only other versions of it, so I didn't download anything 🎧"))
         case ErrorCode.INTERNAL_ERROR:
             await message.answer(_("Sorry, there was an error. Try again later 🧡"))
     if error.critical:
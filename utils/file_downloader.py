@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import aiofiles
+import aiohttp
+
+from config.settings import DOWNLOAD_SEGMENT_MIN_SIZE, DOWNLOAD_SEGMENTS
+from utils.error_handler import BotError, ErrorCode
+from utils.size_policy import max_file_size
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 64 * 1024
+# Write buffer starts small so small files hit the disk once, then doubles per flush
+MIN_BUFFER = 256 * 1024
+MAX_BUFFER = 4 * 1024 * 1024
+
+# Totals over every download since startup, shown in /stats
+totals: Dict[str, float] = {"files": 0, "bytes": 0, "seconds": 0.0, "segmented": 0}
+
+
+@dataclass
+class DownloadStats:
+    url: str
+    size: int
+    seconds: float
+    segments: int
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second."""
+        return self.size / self.seconds if self.seconds > 0 else 0.0
+
+
+class _RangeNotHonored(Exception):
+    """The server answered a Range request with the whole file."""
+
+
+async def download_file(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: Union[str, Path],
+    headers: Optional[Dict[str, str]] = None,
+    segments: int = DOWNLOAD_SEGMENTS,
+    max_size: Optional[int] = None,
+) -> DownloadStats:
+    """
+    Downloads a URL to a file with large buffered writes.
+
+    When segments > 1 the size and Range support are probed with HEAD first, and large
+    files are fetched as parallel Range segments into a preallocated file. The final
+    size is checked against Content-Length. Files larger than max_size are rejected from
+    HEAD/Content-Length, or aborted mid-transfer once the streamed bytes cross the limit.
+    Partial files are removed on failure.
+
+    Args:
+        session (aiohttp.ClientSession): Pooled session of the calling service.
+        url (str): File URL.
+        path (Union[str, Path]): Output file.
+        headers (Optional[Dict[str, str]]): Extra request headers.
+        segments (int): Maximum number of parallel Range requests, 1 disables probing.
+        max_size (Optional[int]): Size limit in bytes, the sendable size by default, 0 for no limit.
+
+    Returns:
+        DownloadStats: Size, time and segment count of the download.
+
+    Raises:
+        BotError: DOWNLOAD_FAILED on HTTP errors or a size mismatch, LARGE_FILE over max_size.
+    """
+    if max_size is None:
+        max_size = max_file_size()
+    started = time.monotonic()
+    used_segments = 1
+
+    try:
+        size, ranges = (None, False)
+        if segments > 1:
+            size, ranges = await _probe(session, url, headers)
+            _check_size(url, size, max_size)
+
+        if ranges and size and size >= DOWNLOAD_SEGMENT_MIN_SIZE:
+            used_segments = min(segments, max(2, size // DOWNLOAD_SEGMENT_MIN_SIZE))
+            try:
+                await _download_segments(session, url, path, headers, size, used_segments)
+            except _RangeNotHonored:
+                used_segments = 1
+                size = await _download_stream(session, url, path, headers, max_size)
+        else:
+            size = await _download_stream(session, url, path, headers, max_size)
+    except BaseException:
+        await asyncio.get_running_loop().run_in_executor(None, _remove, path)
+        raise
+
+    stats = DownloadStats(url=url, size=size, seconds=time.monotonic() - started, segments=used_segments)
+    totals["files"] += 1
+    totals["bytes"] += stats.size
+    totals["seconds"] += stats.seconds
+    if used_segments > 1:
+        totals["segmented"] += 1
+    logger.info(
+        f"Downloaded {stats.size / 1024:.0f} KB in {stats.seconds:.2f}s "
+        f"({stats.throughput / (1024 * 1024):.2f} MB/s, {stats.segments} segments): {path}"
+    )
+    return stats
+
+
+async def _probe(
+    session: aiohttp.ClientSession, url: str, headers: Optional[Dict[str, str]]
+) -> Tuple[Optional[int], bool]:
+    """Returns Content-Length and whether byte ranges are supported, from a HEAD request."""
+    try:
+        async with session.head(url, headers=headers, allow_redirects=True) as response:
+            if response.status != 200:
+                return None, False
+            length = response.headers.get("Content-Length")
+            encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+            ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+            size = int(length) if length and length.isdigit() and not encoded else None
+            return size, ranges and size is not None
+    except aiohttp.ClientError as e:
+        logger.debug(f"HEAD failed for {url}: {e}")
+        return None, False
+
+
+async def _download_stream(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: Union[str, Path],
+    headers: Optional[Dict[str, str]],
+    max_size: int,
+) -> int:
+    async with session.get(url, headers=headers) as response:
+        if response.status != 200:
+            raise BotError(
+                code=ErrorCode.DOWNLOAD_FAILED,
+                message=f"HTTP {response.status} while downloading {url}",
+                url=url,
+                critical=False,
+                is_logged=True,
+            )
+
+        expected = None
+        if "Content-Encoding" not in response.headers and response.content_length is not None:
+            expected = response.content_length
+            _check_size(url, expected, max_size)
+            await asyncio.get_running_loop().run_in_executor(None, _preallocate, path, expected)
+            mode = "r+b"
+        else:
+            mode = "wb"
+
+        async with aiofiles.open(path, mode) as f:
+            written = await _write_body(response, f, url, max_size)
+
+    if expected is not None and written != expected:
+        raise BotError(
+            code=ErrorCode.DOWNLOAD_FAILED,
+            message=f"Incomplete download of {url}: {written} of {expected} bytes",
+            url=url,
+            critical=False,
+            is_logged=True,
+        )
+    return written
+
+
+async def _download_segments(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: Union[str, Path],
+    headers: Optional[Dict[str, str]],
+    size: int,
+    segments: int,
+) -> None:
+    await asyncio.get_running_loop().run_in_executor(None, _preallocate, path, size)
+
+    part = math.ceil(size / segments)
+    bounds = [(start, min(start + part, size) - 1) for start in range(0, size, part)]
+    tasks = [
+        asyncio.create_task(_download_range(session, url, path, headers, start, end))
+        for start, end in bounds
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _download_range(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: Union[str, Path],
+    headers: Optional[Dict[str, str]],
+    start: int,
+    end: int,
+) -> None:
+    range_headers = dict(headers or {})
+    range_headers["Range"] = f"bytes={start}-{end}"
+
+    async with session.get(url, headers=range_headers) as response:
+        if response.status == 200:
+            raise _RangeNotHonored()
+        if response.status != 206:
+            raise BotError(
+                code=ErrorCode.DOWNLOAD_FAILED,
+                message=f"HTTP {response.status} for bytes {start}-{end} of {url}",
+                url=url,
+                critical=False,
+                is_logged=True,
+            )
+
+        async with aiofiles.open(path, "r+b") as f:
+            await f.seek(start)
+            written = await _write_body(response, f, url)
+
+    if written != end - start + 1:
+        raise BotError(
+            code=ErrorCode.DOWNLOAD_FAILED,
+            message=f"Incomplete segment {start}-{end} of {url}: {written} bytes",
+            url=url,
+            critical=False,
+            is_logged=True,
+        )
+
+
+async def _write_body(response: aiohttp.ClientResponse, f, url: str, max_size: int = 0) -> int:
+    """
+    Streams the response body into f, flushing a growing buffer instead of every chunk.
+
+    Raises LARGE_FILE as soon as more than max_size bytes were received.
+    """
+    buffer = bytearray()
+    limit = MIN_BUFFER
+    written = 0
+
+    async for chunk in response.content.iter_chunked(READ_CHUNK):
+        buffer += chunk
+        if max_size and written + len(buffer) > max_size:
+            _check_size(url, written + len(buffer), max_size)
+        if len(buffer) >= limit:
+            await f.write(bytes(buffer))
+            written += len(buffer)
+            buffer.clear()
+            limit = min(limit * 2, MAX_BUFFER)
+
+    if buffer:
+        await f.write(bytes(buffer))
+        written += len(buffer)
+    return written
+
+
+def _check_size(url: str, size: Optional[int], max_size: int) -> None:
+    if max_size and size and size > max_size:
+        raise BotError(
+            code=ErrorCode.LARGE_FILE,
+            message=f"File size {size} exceeds {max_size} bytes: {url}",
+            url=url,
+            critical=False,
+            is_logged=False,
+        )
+
+
+def _preallocate(path: Union[str, Path], size: int) -> None:
+    with open(path, "wb") as f:
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+        except (AttributeError, OSError):
+            f.truncate(size)
+
+
+def _remove(path: Union[str, Path]) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,22 +1,41 @@
 import logging
 import re
+from typing import Optional
 
-import aiohttp
-from .spotify_login import get_access_token
+from managers.metadata_cache import metadata_cache
+from managers.session_manager import session_manager
+from models.media_models import TrackMetadata
+
+from .spotify_login import spotify_api_get
 
 logger = logging.getLogger(__name__)
 
 
-async def get_track_info(track_id: str):
+def spotify_track_metadata(track: dict) -> TrackMetadata:
+    """Метаданные из объекта трека Spotify Web API"""
+    images = track.get("album", {}).get("images") or [{}]
+    duration_ms = track.get("duration_ms")
+    return TrackMetadata(
+        artist=", ".join(artist["name"] for artist in track["artists"]),
+        title=track["name"],
+        cover_url=images[0].get("url"),
+        duration=duration_ms / 1000 if duration_ms else None,
+        isrc=track.get("external_ids", {}).get("isrc"),
+    )
+
+
+async def get_track_info(track_id: str) -> Optional[TrackMetadata]:
     """Получение данных о треке по его ID"""
     url = f"https://api.spotify.com/v1/tracks/{track_id}"
 
-    async with aiohttp.ClientSession() as session:
-        token = await get_access_token(session)
-        headers = {"Authorization": f"Bearer {token}"}
-
-        async with session.get(url, headers=headers) as response:
-            return await response.json()
+    session = session_manager.get_session("spotify_api")
+    status, data = await spotify_api_get(session, url)
+    if status in (400, 404):
+        # Dead or malformed ID, cached as missing
+        return None
+    if status != 200 or not data:
+        raise RuntimeError(f"Spotify API returned {status} for track {track_id}")
+    return spotify_track_metadata(data)
 
 
 def extract_track_id(url: str) -> str | None:
@@ -24,20 +43,22 @@ def extract_track_id(url: str) -> str | None:
     return match.group(1) if match else None
 
 
-async def get_spotify_author(url: str):
+async def get_spotify_metadata(url: str) -> Optional[TrackMetadata]:
+    """Cached metadata of a Spotify track URL, None if it can't be resolved."""
     track_id = extract_track_id(url)
     if not track_id:
         logger.error("Invalid Spotify URL")
-        return None, None, None
+        return None
 
     try:
-        track_info = await get_track_info(track_id)
-
-        artist = ", ".join(artist["name"] for artist in track_info["artists"])
-        title = track_info["name"]
-        cover_url = track_info["album"]["images"][0]["url"]
-
-        return artist, title, cover_url
+        return await metadata_cache.lookup(f"spotify:{track_id}", lambda: get_track_info(track_id))
     except Exception as e:
         logger.error(f"Error fetching track: {e}")
+        return None
+
+
+async def get_spotify_author(url: str):
+    metadata = await get_spotify_metadata(url)
+    if metadata is None:
         return None, None, None
+    return metadata.artist, metadata.title, metadata.cover_url
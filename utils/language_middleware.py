@@ -4,14 +4,19 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.i18n import I18n, FSMI18nMiddleware
 from typing import Callable, Dict, Any
 
-from database.database_manager import SQLiteDatabaseManager
+from config.settings import LOCALE_CACHE_MAX_ENTRIES, LOCALE_CACHE_TTL
+from functions.db import db_get_lang
+from utils.ttl_cache import TTLCache
+
+# Chat languages, bounded so one-off chats don't accumulate over the life of the process
+locale_cache: TTLCache[int, str] = TTLCache(LOCALE_CACHE_MAX_ENTRIES, LOCALE_CACHE_TTL)
 
 
 class CustomI18nMiddleware(BaseMiddleware):
     def __init__(self, i18n: I18n):
         self.i18n = i18n
         self.fsm_i18n = FSMI18nMiddleware(i18n)
-        self._cache: Dict[int, str] = {}
+        self._cache = locale_cache
 
     async def __call__(self, handler: Callable, event: TelegramObject, data: Dict[str, Any]):
         chat_id = None
@@ -35,12 +40,7 @@ class CustomI18nMiddleware(BaseMiddleware):
         return await handler(event, data)
 
     async def _get_chat_language(self, chat_id: int) -> str:
-        async with SQLiteDatabaseManager() as cursor:
-            await cursor.execute(
-                "SELECT lang FROM chat_settings WHERE chat_id = ?", (chat_id,)
-            )
-            result = await cursor.fetchone()
-            return result[0] if result else "en"
+        return await db_get_lang(chat_id)
 
     def clear_cache(self, chat_id: int):
         self._cache.pop(chat_id, None)
\ No newline at end of file
@@ -0,0 +1,29 @@
+import os
+from pathlib import Path
+from typing import Union
+
+from config.settings import LOCAL_SERVER, LOCAL_SERVER_FILE_UPLOAD, LOCAL_SERVER_PATH_MAP
+
+
+def local_upload_enabled() -> bool:
+    """Files are handed to a co-located local Bot API server by path instead of uploaded."""
+    return bool(LOCAL_SERVER and LOCAL_SERVER_FILE_UPLOAD)
+
+
+def local_file_uri(path: Union[str, Path]) -> str:
+    """
+    Builds the file:// URI under which the local Bot API server sees a downloaded file.
+
+    LOCAL_SERVER_PATH_MAP ("/bot/prefix=/server/prefix") rewrites the path when the shared
+    volume is mounted at different places in the two containers.
+
+    :param path: Path of the file on the bot side.
+    :return: file:// URI with the absolute path on the server side.
+    """
+    absolute = os.path.abspath(path)
+    if LOCAL_SERVER_PATH_MAP:
+        bot_prefix, server_prefix = LOCAL_SERVER_PATH_MAP.split("=", 1)
+        if absolute.startswith(bot_prefix):
+            absolute = server_prefix + absolute[len(bot_prefix):]
+    # The server reads the path verbatim, so it is not percent-encoded
+    return f"file://{absolute}"
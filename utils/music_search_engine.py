@@ -1,37 +1,260 @@
 import logging
 import asyncio
-from typing import Optional
+import re
+import threading
+import time
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor
 
-from ytmusicapi import YTMusic
+from config.settings import (
+    MUSIC_MATCH_MIN_CONFIDENCE,
+    MUSIC_SEARCH_CACHE_MAX_ENTRIES,
+    MUSIC_SEARCH_CACHE_TTL,
+    MUSIC_SEARCH_WORKERS,
+)
+from models.media_models import MusicMatch, TrackMetadata
+from utils.error_handler import BotError, ErrorCode
+from utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 
-_search_executor = ThreadPoolExecutor(max_workers=5)
+_search_executor = ThreadPoolExecutor(max_workers=MUSIC_SEARCH_WORKERS)
+# One long-lived client per executor thread, so the pool never holds more than MUSIC_SEARCH_WORKERS
+_clients = threading.local()
 
-async def search_music(artist: str, title: str) -> Optional[str]:
+# Normalized (artist, title, ISRC, duration) -> confident match
+SearchKey = Tuple[str, str, Optional[str], Optional[int]]
+search_cache: TTLCache[SearchKey, MusicMatch] = TTLCache(MUSIC_SEARCH_CACHE_MAX_ENTRIES, MUSIC_SEARCH_CACHE_TTL)
+_searching: Dict[SearchKey, asyncio.Task] = {}
+totals = {"searches": 0, "errors": 0, "seconds": 0.0, "matches": 0, "uncertain": 0}
+
+# Words that mark another recording of a song, unless the requested title has them too
+VERSION_MARKERS = re.compile(
+    r"\b(live|cover|remix|extended|karaoke|instrumental|acoustic|sped up|slowed|nightcore|8d)\b"
+)
+# "(feat. X)", "[Remastered]", " - 2011 Remaster" and similar decorations
+TITLE_EXTRAS = re.compile(r"\s*[(\[].*?[)\]]|\s+-\s+.*$|\s+feat\..*$")
+# Seconds of duration difference that still count as the same recording, and where the score hits 0
+DURATION_TOLERANCE = 2
+DURATION_LIMIT = 30
+# Longest track accepted when the requested duration is unknown
+MAX_UNKNOWN_DURATION = 600
+
+
+def _create_client():
+    # Imported lazily, ytmusicapi is only needed by the music services
+    from ytmusicapi import YTMusic
+
+    return YTMusic()
+
+
+def _search(query: str) -> list:
+    client = getattr(_clients, "client", None)
+    if client is None:
+        client = _clients.client = _create_client()
+    return client.search(query, limit=10, filter="songs")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def _cache_key(metadata: TrackMetadata) -> SearchKey:
+    # ISRC and duration change the scores, a match is only reused for the same request
+    duration = round(metadata.duration) if metadata.duration else None
+    return (_normalize(metadata.artist), _normalize(metadata.title), metadata.isrc, duration)
+
+
+def _similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def score_candidate(metadata: TrackMetadata, candidate: dict) -> float:
+    """
+    Scores how likely a YouTube Music song result is the requested track.
+
+    :param metadata: Requested track.
+    :param candidate: Song result of YTMusic.search.
+    :return: Confidence between 0 and 1.
+    """
+    title = _normalize(metadata.title)
+    candidate_title = _normalize(candidate.get("title") or "")
+    title_score = max(
+        _similarity(title, candidate_title),
+        _similarity(TITLE_EXTRAS.sub("", title), TITLE_EXTRAS.sub("", candidate_title)),
+    )
+
+    artists = [_normalize(name) for name in metadata.artist.split(",")]
+    candidate_artists = [_normalize(artist.get("name") or "") for artist in candidate.get("artists") or []]
+    artist_score = max(
+        (_similarity(artist, other) for artist in artists for other in candidate_artists),
+        default=0.0,
+    )
+
+    duration = candidate.get("duration_seconds")
+    if metadata.duration and duration:
+        delta = abs(metadata.duration - duration)
+        duration_score = max(0.0, 1 - max(0.0, delta - DURATION_TOLERANCE) / (DURATION_LIMIT - DURATION_TOLERANCE))
+        score = 0.45 * duration_score + 0.3 * title_score + 0.25 * artist_score
+    else:
+        if duration and duration > MAX_UNKNOWN_DURATION:
+            return 0.0
+        # Without a duration to compare, even a perfect name match stays below certainty
+        score = 0.9 * (0.55 * title_score + 0.45 * artist_score)
+
+    if artist_score < 0.5:
+        # Same song by someone else, most likely a cover
+        score *= 0.7
+    other_versions = set(VERSION_MARKERS.findall(candidate_title)) - set(VERSION_MARKERS.findall(title))
+    return score * 0.5 ** len(other_versions)
+
+
+def _best_match(metadata: TrackMetadata, results: List[dict], by_isrc: bool = False) -> Optional[MusicMatch]:
+    best: Optional[MusicMatch] = None
+    for candidate in results:
+        if not candidate.get("videoId"):
+            continue
+
+        confidence = score_candidate(metadata, candidate)
+        if by_isrc and candidate is results[0] and confidence > 0:
+            # YouTube Music finds recordings by their ISRC, its top hit is the recording itself
+            # unless the duration disagrees
+            duration = candidate.get("duration_seconds")
+            if not metadata.duration or not duration or abs(metadata.duration - duration) <= DURATION_TOLERANCE:
+                confidence = max(confidence, 0.95)
+
+        if best is None or confidence > best.confidence:
+            best = MusicMatch(
+                url=f"https://music.youtube.com/watch?v={candidate['videoId']}",
+                confidence=confidence,
+                title=candidate.get("title") or "",
+                artist=", ".join(artist.get("name") or "" for artist in candidate.get("artists") or []),
+                duration=candidate.get("duration_seconds"),
+            )
+    return best
+
+
+async def _run_search(query: str) -> list:
+    started = time.monotonic()
+    totals["searches"] += 1
     try:
-        yt = await asyncio.get_event_loop().run_in_executor(
-            _search_executor,
-            YTMusic
-        )
+        return await asyncio.get_running_loop().run_in_executor(_search_executor, _search, query)
+    except Exception:
+        totals["errors"] += 1
+        raise
+    finally:
+        totals["seconds"] += time.monotonic() - started
 
-        search_results = await asyncio.get_event_loop().run_in_executor(
-            _search_executor,
-            lambda: yt.search(f"{artist} - {title}", limit=10, filter="songs")
-        )
 
-        for track in search_results:
-            if not track.get('duration'):
-                continue
+async def _find(metadata: TrackMetadata) -> Optional[MusicMatch]:
+    best = None
+    if metadata.isrc:
+        best = _best_match(metadata, await _run_search(metadata.isrc), by_isrc=True)
+        if best and best.confidence >= MUSIC_MATCH_MIN_CONFIDENCE:
+            return best
 
-            if track['duration_seconds'] <= 600:
-                return f"https://music.youtube.com/watch?v={track['videoId']}"
+    by_name = _best_match(metadata, await _run_search(f"{metadata.artist} - {metadata.title}"))
+    if best is None or (by_name and by_name.confidence > best.confidence):
+        best = by_name
+    return best
 
-        logger.warning("No tracks under 600 seconds found")
-        return None
+
+async def match_music(metadata: TrackMetadata) -> Optional[MusicMatch]:
+    """
+    Finds the YouTube Music recording of a track.
+
+    Candidates are scored by duration, title and artist similarity, and are searched by
+    ISRC first when the track has one. Confident matches are cached by normalized artist,
+    title, ISRC and duration, uncertain ones are searched again next time. Concurrent
+    searches for the same track share one request.
+
+    :param metadata: Requested track, duration and ISRC are optional.
+    :return: Best match with its confidence, None if the search found nothing.
+    :raises BotError: DOWNLOAD_FAILED if the search itself failed.
+    """
+    key = _cache_key(metadata)
+    match = search_cache.get(key)
+    if match is not None:
+        return match
+
+    try:
+        task = _searching.get(key)
+        if task is None:
+            task = asyncio.create_task(_find(metadata))
+            _searching[key] = task
+            task.add_done_callback(lambda _task: _searching.pop(key, None))
+        match = await asyncio.shield(task)
 
     except Exception as e:
-        logger.error(f"Music search error: {str(e)}", exc_info=True)
+        # A failed search says nothing about the track, it is reported as retryable
+        raise BotError(
+            code=ErrorCode.DOWNLOAD_FAILED,
+            message=f"Music search error: {str(e)}",
+            critical=False,
+            is_logged=True,
+        ) from e
+
+    if match is None:
+        logger.warning(f"No YouTube Music results for {metadata.artist} - {metadata.title}")
         return None
+
+    totals["matches"] += 1
+    if match.confidence < MUSIC_MATCH_MIN_CONFIDENCE:
+        totals["uncertain"] += 1
+    else:
+        search_cache[key] = match
+    return match
+
+
+async def search_music(artist: str, title: str) -> Optional[str]:
+    """
+    Finds the YouTube Music link of a track by its artist and title.
+
+    :param artist: Track artist.
+    :param title: Track title.
+    :return: YouTube Music watch URL of the best match, None if nothing was found.
+    :raises BotError: DOWNLOAD_FAILED if the search itself failed.
+    """
+    match = await match_music(TrackMetadata(artist=artist, title=title))
+    return match.url if match else None
+
+
+async def require_match(metadata: TrackMetadata, url: str) -> MusicMatch:
+    """
+    Finds the YouTube Music recording of a track, refusing uncertain matches.
+
+    :param metadata: Requested track.
+    :param url: Link the user sent, for the error report.
+    :return: Match with a confidence of at least MUSIC_MATCH_MIN_CONFIDENCE.
+    :raises BotError: NO_CONFIDENT_MATCH if nothing or only an uncertain match was found,
+        DOWNLOAD_FAILED if the search itself failed.
+    """
+    match = await match_music(metadata)
+    if match is None or match.confidence < MUSIC_MATCH_MIN_CONFIDENCE:
+        found = f"{match.artist} - {match.title} ({match.confidence:.2f})" if match else "nothing"
+        raise BotError(
+            code=ErrorCode.NO_CONFIDENT_MATCH,
+            message=f"No confident match for {metadata.artist} - {metadata.title}, best was {found}",
+            url=url,
+            critical=False,
+            is_logged=True,
+        )
+    return match
+
+
+def search_stats() -> Dict[str, float]:
+    cache = search_cache.stats()
+    return {
+        "hits": cache["hits"],
+        "misses": cache["misses"],
+        "hit_rate": cache["hit_rate"],
+        "cached": cache["size"],
+        "searches": totals["searches"],
+        "errors": totals["errors"],
+        "average_seconds": totals["seconds"] / totals["searches"] if totals["searches"] else 0.0,
+        "matches": totals["matches"],
+        "uncertain": totals["uncertain"],
+    }
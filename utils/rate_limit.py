@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Waiters are served
+    in arrival order. pause() stops the bucket for everyone, which is how a flood-control
+    RetryAfter from Telegram is applied to all senders at once instead of to one request.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        """
+        Waits until enough tokens are available and takes them.
+
+        :param cost: Tokens to take, capped at the capacity so a large request can't wait forever.
+        """
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    return
+                await asyncio.sleep((cost - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stops handing out tokens for the given time and drops the saved burst, so only
+        one call goes through right when the pause ends.
+
+        :param seconds: Pause length, usually TelegramRetryAfter.retry_after.
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = min(1.0, self.capacity)
+        self._updated = self._paused_until
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    @property
+    def idle(self) -> bool:
+        """True when the bucket is full and not paused, i.e. it holds no state worth keeping."""
+        now = time.monotonic()
+        if now < self._paused_until or self._lock.locked():
+            return False
+        self._refill(now)
+        return self._tokens >= self.capacity
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
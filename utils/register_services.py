@@ -1,13 +1,20 @@
-import importlib.util
-import inspect
+import asyncio
+import importlib
 import logging
-import os
+import time
+from typing import Dict, Optional
 
-from services import base_service
+from services.manifest import SERVICE_MANIFEST, ServiceSpec
+from utils.url_router import Route, UrlRouter
 
 logger = logging.getLogger(__name__)
 
 SERVICES = {}
+router = UrlRouter()
+
+# Seconds spent importing and instantiating each service module
+import_times: Dict[str, float] = {}
+_load_locks: Dict[str, asyncio.Lock] = {}
 
 def register_service(name, handler):
     if name in SERVICES:
@@ -17,24 +24,66 @@ def register_service(name, handler):
         logger.info(f"{name} registered")
 
 
-def get_service_handler(url):
-    for name, handler in SERVICES.items():
-        if handler.is_supported(url):
-            return handler
-    raise ValueError("Сервис не поддерживается")
+async def load_service(spec: ServiceSpec):
+    """
+    Returns the service instance for a manifest entry, importing its module on first use.
+
+    The import runs in a thread so a cold yt_dlp import does not block the event loop.
+    """
+    handler = SERVICES.get(spec.name)
+    if handler is not None:
+        return handler
+
+    lock = _load_locks.setdefault(spec.name, asyncio.Lock())
+    async with lock:
+        handler = SERVICES.get(spec.name)
+        if handler is None:
+            handler = await asyncio.get_running_loop().run_in_executor(None, _instantiate, spec)
+            register_service(spec.name, handler)
+    return handler
+
+
+async def route_url(url: str) -> Optional[Route]:
+    found = router.lookup(url)
+    if found is None:
+        return None
+    spec, match = found
+    return Route(service=await load_service(spec), match=match, url=url)
+
+
+async def get_service_handler(url):
+    route = await route_url(url)
+    if route is None:
+        raise ValueError("Сервис не поддерживается")
+    return route.service
 
 
 def initialize_services():
-    for filename in os.listdir('./services'):
-        if filename.endswith('.py') and filename != '__init__.py':
-            module_name = filename[:-3]
-            module_path = os.path.join('./services', filename)
-
-            spec = importlib.util.spec_from_file_location(module_name, module_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-
-            for name, obj in inspect.getmembers(module, inspect.isclass):
-                if issubclass(obj, base_service.BaseService) and obj is not base_service.BaseService:
-                    handler = obj()
-                    register_service(name, handler)
+    """Registers every service of the manifest in the router without importing it."""
+    for spec in SERVICE_MANIFEST:
+        router.add(spec)
+    logger.info(f"{len(SERVICE_MANIFEST)} services routed, modules load on first use")
+
+
+async def warm_up_services():
+    """Imports the remaining services one by one in the background and logs the import times."""
+    for spec in SERVICE_MANIFEST:
+        try:
+            await load_service(spec)
+        except Exception as e:
+            logger.error(f"Failed to warm up {spec.name}: {e}")
+
+    report = ", ".join(
+        f"{module}: {seconds:.2f}s"
+        for module, seconds in sorted(import_times.items(), key=lambda item: item[1], reverse=True)
+    )
+    logger.info(f"Services warmed up in {sum(import_times.values()):.2f}s ({report})")
+
+
+def _instantiate(spec: ServiceSpec):
+    started = time.perf_counter()
+    module = importlib.import_module(spec.module)
+    handler = getattr(module, spec.class_name)()
+    import_times[spec.module] = time.perf_counter() - started
+    logger.info(f"Loaded {spec.module} in {import_times[spec.module]:.2f}s")
+    return handler
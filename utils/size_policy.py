@@ -0,0 +1,19 @@
+from config.settings import LOCAL_SERVER
+
+MB = 1024 * 1024
+
+
+def max_file_size() -> int:
+    """
+    Largest file in bytes the bot can send.
+
+    The public Bot API accepts uploads up to 50 MB. With a local Bot API server
+    (LOCAL_SERVER) the bot allows up to 100 MB.
+
+    :return: Limit in bytes.
+    """
+    return (100 if LOCAL_SERVER else 50) * MB
+
+
+def max_file_size_mb() -> int:
+    return max_file_size() // MB
@@ -1,24 +1,125 @@
-import aiohttp
+import asyncio
 import base64
+import logging
+import time
+from typing import Any, Optional, Tuple
+
+import aiohttp
+
 from config.secrets import SPOTIFY_CLIENT_ID, SPOTIFY_SECRET
+from config.settings import SPOTIFY_TOKEN_REFRESH_MARGIN
 
 TOKEN_URL = "https://accounts.spotify.com/api/token"
 
+logger = logging.getLogger(__name__)
+
+
+class SpotifyToken:
+    """
+    Client Credentials access token shared by every Spotify API call.
+
+    The token is kept until it expires. Once less than `refresh_margin` seconds are left
+    it is refreshed in the background while callers keep using the current one. Callers
+    that need a token while none is valid wait for a single shared refresh.
+    """
+
+    def __init__(self, refresh_margin: float = SPOTIFY_TOKEN_REFRESH_MARGIN) -> None:
+        self.refresh_margin = refresh_margin
+        self.refreshes = 0
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+
+    async def get(self, session: aiohttp.ClientSession) -> Optional[str]:
+        """
+        Returns a valid access token.
+
+        :param session: Session the token request is sent with.
+        :return: Access token, None if Spotify refused to issue one.
+        """
+        now = time.monotonic()
+        if self._token and now < self._expires_at:
+            if now >= self._expires_at - self.refresh_margin:
+                self._refresh(session)
+            return self._token
+
+        return await asyncio.shield(self._refresh(session))
+
+    def invalidate(self, token: Optional[str]) -> None:
+        """
+        Forgets a token the API rejected.
+
+        :param token: The rejected token. A newer token that replaced it in the meantime is kept.
+        """
+        if token is not None and token == self._token:
+            self._token = None
+            self._expires_at = 0.0
 
-async def get_access_token(session: aiohttp.ClientSession):
+    def _refresh(self, session: aiohttp.ClientSession) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._request(session))
+        return self._refreshing
+
+    async def _request(self, session: aiohttp.ClientSession) -> Optional[str]:
+        auth_header = base64.b64encode(
+            f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_SECRET}".encode()
+        ).decode()
+        headers = {
+            "Authorization": f"Basic {auth_header}",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        data = {"grant_type": "client_credentials"}
+
+        requested_at = time.monotonic()
+        try:
+            async with session.post(TOKEN_URL, headers=headers, data=data) as response:
+                if response.status != 200:
+                    logger.error(f"Failed to get Spotify token: {response.status} {await response.text()}")
+                    return self._token if time.monotonic() < self._expires_at else None
+                result = await response.json()
+        except aiohttp.ClientError as e:
+            logger.error(f"Failed to get Spotify token: {e}")
+            return self._token if time.monotonic() < self._expires_at else None
+
+        self.refreshes += 1
+        self._token = result.get("access_token")
+        self._expires_at = requested_at + float(result.get("expires_in", 3600))
+        return self._token
+
+
+spotify_token = SpotifyToken()
+
+
+async def get_access_token(session: aiohttp.ClientSession) -> Optional[str]:
     """Получение токена доступа через Client Credentials Flow"""
-    auth_header = base64.b64encode(
-        f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_SECRET}".encode()
-    ).decode()
-    headers = {
-        "Authorization": f"Basic {auth_header}",
-        "Content-Type": "application/x-www-form-urlencoded",
-    }
-    data = {"grant_type": "client_credentials"}
-
-    async with session.post(TOKEN_URL, headers=headers, data=data) as response:
-        if response.status != 200:
-            print(f"Failed to get token: {response.status} {await response.text()}")
-            return None
-        result = await response.json()
-        return result.get("access_token")
+    return await spotify_token.get(session)
+
+
+async def spotify_api_get(
+    session: aiohttp.ClientSession, url: str, params: Optional[dict] = None
+) -> Tuple[int, Optional[Any]]:
+    """
+    GET request to the Spotify Web API with the shared token.
+
+    A 401 means the token was revoked or expired early, it is refreshed and the request
+    is sent once more.
+
+    :param session: Session to send the request with.
+    :param url: Full API URL.
+    :param params: Query parameters.
+    :return: HTTP status and the decoded JSON body, None when the body is not JSON.
+    """
+    for attempt in range(2):
+        token = await spotify_token.get(session)
+        if not token:
+            return 401, None
+
+        headers = {"Authorization": f"Bearer {token}"}
+        async with session.get(url, headers=headers, params=params) as response:
+            if response.status == 401 and not attempt:
+                spotify_token.invalidate(token)
+                continue
+            try:
+                return response.status, await response.json()
+            except (aiohttp.ContentTypeError, ValueError):
+                return response.status, None
@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Dict-like LRU cache whose entries also expire after `ttl` seconds.
+
+    Size is capped at `maxsize`: inserting into a full cache drops the least recently
+    used entry. Expired entries are removed when they are read or by purge().
+
+    Entries whose value satisfies the optional `keep` predicate, e.g. a task that is
+    still running, never expire and are never dropped, even if that takes the cache
+    over `maxsize`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, keep: Optional[Callable[[V], bool]] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.keep = keep
+        self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """
+        Returns the value and marks it as recently used.
+
+        :param key: Cache key.
+        :param default: Returned on a miss or when the entry expired.
+        :return: Cached value or default.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires, value = entry
+        if expires <= time.monotonic() and not self._kept(value):
+            del self._data[key]
+            self.expired += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        if key in self._data:
+            self._data.move_to_end(key)
+        elif len(self._data) >= self.maxsize:
+            self._make_room()
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def __contains__(self, key: K) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and (entry[0] > time.monotonic() or self._kept(entry[1]))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def peek(self, key: K) -> Optional[V]:
+        """Returns the value without touching its LRU position or the hit counters."""
+        entry = self._data.get(key)
+        return None if entry is None else entry[1]
+
+    def purge(self) -> int:
+        """
+        Removes every expired entry.
+
+        :return: Number of removed entries.
+        """
+        now = time.monotonic()
+        stale = [key for key, (expires, value) in self._data.items() if expires <= now and not self._kept(value)]
+        for key in stale:
+            del self._data[key]
+        self.expired += len(stale)
+        return len(stale)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+    def _kept(self, value: V) -> bool:
+        return self.keep is not None and self.keep(value)
+
+    def _make_room(self) -> None:
+        # Kept entries are skipped, if every entry is kept the cache grows instead
+        for _ in range(len(self._data)):
+            key, (expires, value) = next(iter(self._data.items()))
+            if self._kept(value):
+                self._data.move_to_end(key)
+                continue
+            del self._data[key]
+            if expires <= time.monotonic():
+                self.expired += 1
+            else:
+                self.evicted += 1
+            return
@@ -0,0 +1,58 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+@dataclass(frozen=True)
+class Route:
+    """A URL resolved to the service that handles it."""
+
+    service: object
+    match: re.Match
+    url: str
+
+
+def normalize_host(host: str) -> str:
+    host = host.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host
+
+
+class UrlRouter:
+    """
+    Routes URLs to services through a hostname index.
+
+    The URL is parsed once, its host selects the few entries registered for it, and
+    only their precompiled patterns are tried. Entries are service manifest specs or
+    anything else that declares `hosts` and `url_pattern`.
+    """
+
+    def __init__(self) -> None:
+        self._by_host: Dict[str, List[Any]] = {}
+
+    def add(self, entry) -> None:
+        for host in entry.hosts:
+            self._by_host.setdefault(normalize_host(host), []).append(entry)
+
+    def lookup(self, url: str) -> Optional[Tuple[Any, re.Match]]:
+        """
+        Finds the entry for a URL.
+
+        :param url: URL or message text starting with a URL.
+        :return: The entry and its pattern match, or None if no entry supports the URL.
+        """
+        try:
+            host = urlsplit(url).hostname
+        except ValueError:
+            return None
+        if not host:
+            return None
+
+        for entry in self._by_host.get(normalize_host(host), ()):
+            match = entry.url_pattern.match(url)
+            if match:
+                return entry, match
+        return None
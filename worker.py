@@ -0,0 +1,176 @@
+import asyncio
+import datetime
+import logging
+import os
+import signal
+import socket
+
+from aiogram import types
+from aiogram.utils.i18n import I18n
+
+from config.settings import JOB_LEASE_SECONDS, JOB_POLL_INTERVAL, JOB_RETENTION, JOB_WORKER_CONCURRENCY
+from database.database_manager import (
+    create_table_media_cache,
+    create_table_settings,
+    create_table_track_metadata,
+    database,
+)
+from functions.db import db_get_lang
+from handlers.user.url import download_wrapper, handle_playlist_download, handle_single_download
+from loader import bot
+from managers.job_queue import Job, job_queue
+from managers.send_scheduler import send_scheduler
+from managers.session_manager import session_manager
+from managers.ytdlp_runner import ytdlp_runner
+from utils.error_handler import BotError, ErrorCode, handle_download_error
+from utils.register_services import get_service_handler, initialize_services
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(filename)s - %(funcName)s - %(lineno)d - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+i18n = I18n(path="locales", default_locale="en", domain="messages")
+
+# Failures that may pass on a later attempt, the others are reported to the user at once
+RETRYABLE_ERRORS = {ErrorCode.DOWNLOAD_FAILED, ErrorCode.QUEUE_FULL, ErrorCode.INTERNAL_ERROR}
+# Longest time a cancelled job keeps running
+CANCEL_CHECK_INTERVAL = 5
+
+
+class JobFailed(Exception):
+    """A job that must not be retried, the user has already been told."""
+
+
+class Worker:
+    """
+    Download worker for JOB_QUEUE mode.
+
+    Claims jobs enqueued by the bot frontend, downloads them with the same code path as
+    the bot and delivers the media straight to the chat. Each of the `concurrency` slots
+    handles one job at a time and renews its lease while working.
+    """
+
+    def __init__(self, concurrency: int = JOB_WORKER_CONCURRENCY) -> None:
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.processed = 0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Processes jobs until stop is set, then lets the running ones finish."""
+        purged = await job_queue.purge(JOB_RETENTION)
+        logger.info(f"Worker {self.name} started with {self.concurrency} slots, purged {purged} old jobs")
+
+        slots = [asyncio.create_task(self._slot(stop)) for _ in range(self.concurrency)]
+        await asyncio.gather(*slots)
+        logger.info(f"Worker {self.name} stopped after {self.processed} jobs")
+
+    async def _slot(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            job = await job_queue.claim(self.name)
+            if job is None:
+                try:
+                    await asyncio.wait_for(stop.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._process(job)
+
+    async def _process(self, job: Job) -> None:
+        logger.info(f"Job {job.job_id} attempt {job.attempts}: {job.url}")
+        delivery = asyncio.create_task(self._deliver(job))
+        renewer = asyncio.create_task(self._renew(job, delivery))
+        try:
+            await delivery
+            await job_queue.complete(job.job_id)
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            logger.info(f"Job {job.job_id} stopped, it was cancelled or lost its lease")
+        except Exception as e:
+            error = f"{e.code.value}: {e.message}" if isinstance(e, BotError) else str(e)
+            logger.error(f"Job {job.job_id} failed: {error}")
+            await job_queue.fail(job.job_id, error, retry=not isinstance(e, JobFailed))
+        finally:
+            renewer.cancel()
+            self.processed += 1
+
+    async def _renew(self, job: Job, delivery: asyncio.Task) -> None:
+        # Renewed more often than the lease needs, so /cancel stops the job quickly
+        while True:
+            await asyncio.sleep(min(JOB_LEASE_SECONDS / 3, CANCEL_CHECK_INTERVAL))
+            if not await job_queue.renew(job.job_id, self.name):
+                logger.warning(f"Job {job.job_id} was cancelled or lost its lease")
+                delivery.cancel()
+                return
+
+    async def _deliver(self, job: Job) -> None:
+        # Stand-in for the user's message, replies and media are sent to its chat
+        message = types.Message(
+            message_id=job.message_id,
+            date=datetime.datetime.now(),
+            chat=types.Chat(id=job.chat_id, type=job.chat_type),
+            from_user=types.User(id=job.user_id, is_bot=False, first_name=""),
+        ).as_(bot)
+
+        service = await get_service_handler(job.url)
+        is_playlist = not job.format_choice and service.is_playlist(job.url)
+        if job.format_choice:
+            coro = handle_single_download(
+                service, job.url, message, format_choice=f"{job.format_choice}:{job.user_id}", raise_errors=True
+            )
+        elif is_playlist:
+            coro = handle_playlist_download(service, job.url, message, raise_errors=True)
+        else:
+            coro = handle_single_download(service, job.url, message, raise_errors=True)
+
+        with i18n.context(), i18n.use_locale(await db_get_lang(job.chat_id)):
+            try:
+                await download_wrapper(job.user_id, service.name, message, coro, raise_errors=True)
+            except Exception as e:
+                if not isinstance(e, BotError):
+                    e = BotError(
+                        code=ErrorCode.DOWNLOAD_FAILED,
+                        message=f"Worker: {str(e)}",
+                        url=job.url,
+                        critical=True,
+                        is_logged=True
+                    )
+                # A playlist may be partly delivered already, retrying would send its tracks again
+                if not is_playlist and e.code in RETRYABLE_ERRORS and job.attempts < job_queue.max_attempts:
+                    raise e
+                await handle_download_error(message, e)
+                raise JobFailed(f"{e.code.value}: {e.message}") from e
+
+
+async def main():
+    await database.connect()
+    await create_table_settings()
+    await create_table_media_cache()
+    await create_table_track_metadata()
+    await job_queue.connect()
+    await session_manager.start()
+    initialize_services()
+    bot.session.middleware(send_scheduler)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        await Worker().run(stop)
+    finally:
+        await session_manager.close()
+        ytdlp_runner.shutdown()
+        await job_queue.close()
+        await database.close()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())